@@ -0,0 +1,58 @@
+"""
+Measures how long it takes to import chat_transformer's entrypoints in a fresh
+interpreter, and which heavy optional dependencies each one pulls in.
+
+    python benchmarks/import_time.py [--runs N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGETS = [
+    'chat_transformer.cli',
+    'chat_transformer.client',
+    'chat_transformer.outputs.udp',
+    'chat_transformer.outputs.osc',
+    'chat_transformer.outputs.http',
+]
+
+HEAVY_MODULES = ['irc', 'aiohttp', 'jwt', 'pythonosc', 'numpy']
+
+SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in {heavy!r} if name in sys.modules))
+'''
+
+
+def measure(target, runs):
+    timings = []
+    loaded = ''
+
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT.format(target=target, heavy=HEAVY_MODULES)]
+        ).decode('utf-8').splitlines()
+        timings.append(float(output[0]) * 1000)
+        loaded = output[1] if len(output) > 1 else ''
+
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print('{:<35} {:>10}  {}'.format('module', 'median ms', 'heavy dependencies imported'))
+    for target in TARGETS:
+        median, loaded = measure(target, args.runs)
+        print('{:<35} {:>10.1f}  {}'.format(target, median, loaded or '-'))
+
+
+if __name__ == '__main__':
+    main()
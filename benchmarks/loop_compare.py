@@ -0,0 +1,151 @@
+"""
+Compares the default asyncio event loop with uvloop on the end-to-end path:
+chat lines are written to a Unix socket input, parsed and applied to commands,
+and sent out by the OSC output over UDP to a local receiver that counts them.
+
+    python benchmarks/loop_compare.py [--messages N] [--runs N]
+
+Each loop is measured in its own interpreter, since uvloop is installed as the
+global event loop policy.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_transformer.client import TransformerClient  # noqa: E402
+from chat_transformer.utils import EVENT_LOOPS, create_event_loop  # noqa: E402
+
+COMMANDS = 100
+CHUNK = 100
+# Maximum number of lines written but not yet received as datagrams, so that the
+# receiver's socket buffer never overflows
+WINDOW = 1000
+
+
+class Receiver(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.received = 0
+        self.waiting = None
+
+    def wait_for(self, count):
+        """
+        Returns a future that completes once `count` datagrams have been received
+        """
+        self.waiting = (count, asyncio.Future())
+        if self.received >= count:
+            self.waiting[1].set_result(None)
+        return self.waiting[1]
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        if self.waiting is not None and self.received >= self.waiting[0] and not self.waiting[1].done():
+            self.waiting[1].set_result(None)
+
+
+async def run_once(loop, messages, directory):
+    commands_file = os.path.join(directory, 'commands.json')
+    with open(commands_file, 'w') as commands:
+        json.dump({
+            'param{}'.format(i): {
+                'min': 0.0, 'max': 1.0, 'initial': 0.5,
+                'allowed_actions': ['set'],
+                'outputs': {'osc': {'address': '/param/{}'.format(i)}},
+            }
+            for i in range(COMMANDS)
+        }, commands)
+
+    receiver = Receiver()
+    transport, _ = await loop.create_datagram_endpoint(lambda: receiver, local_addr=('127.0.0.1', 0))
+    transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    port = transport.get_extra_info('sockname')[1]
+
+    socket_path = os.path.join(directory, 'input.sock')
+    client = TransformerClient(
+        commands_file=commands_file,
+        loop=loop,
+        irc_engine='lean',
+        output_data={'osc': {'port': port}},
+        input_data={'unix': {'path': socket_path}},
+    )
+    await client.outputs['osc'].connect()
+    await client.inputs['unix'].start(client.handle_messages)
+
+    # Every line sets a new value, so each one produces exactly one OSC message
+    lines = [
+        'param{} set 0.{}\n'.format(i % COMMANDS, 1 + (i // COMMANDS) % 8).encode('utf-8')
+        for i in range(messages)
+    ]
+
+    _, writer = await asyncio.open_unix_connection(socket_path)
+    started = time.perf_counter()
+
+    for offset in range(0, messages, CHUNK):
+        if offset > WINDOW:
+            await receiver.wait_for(offset - WINDOW)
+        writer.write(b''.join(lines[offset:offset + CHUNK]))
+        await writer.drain()
+
+    try:
+        await asyncio.wait_for(receiver.wait_for(messages), 10)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+
+    writer.close()
+    client.cleanup()
+    transport.close()
+    await asyncio.sleep(0)
+
+    return elapsed, receiver.received
+
+
+def worker(loop_name, messages, runs):
+    loop = create_event_loop(loop_name)
+    results = []
+
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            results.append(loop.run_until_complete(run_once(loop, messages, directory)))
+
+    loop.close()
+    print(json.dumps({
+        'loop': type(loop).__module__,
+        'elapsed': statistics.median(elapsed for elapsed, _ in results),
+        'received': min(received for _, received in results),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--worker', choices=EVENT_LOOPS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.messages, args.runs)
+        return
+
+    print('{:<10} {:<18} {:>10} {:>12} {:>10}'.format('loop', 'implementation', 'median s', 'messages/s', 'received'))
+    for loop_name in EVENT_LOOPS:
+        output = subprocess.check_output([
+            sys.executable, __file__, '--worker', loop_name,
+            '--messages', str(args.messages), '--runs', str(args.runs),
+        ])
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        print('{:<10} {:<18} {:>10.3f} {:>12.0f} {:>10}'.format(
+            loop_name, result['loop'], result['elapsed'], args.messages / result['elapsed'], result['received'],
+        ))
+
+
+if __name__ == '__main__':
+    main()
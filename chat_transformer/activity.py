@@ -0,0 +1,190 @@
+import math
+import numbers
+import time
+from collections import OrderedDict
+
+from .commands import Command
+
+METRICS = ('rate', 'change', 'users')
+
+
+def format_window(window):
+    return '{}m'.format(window // 60) if window % 60 == 0 else '{}s'.format(window)
+
+
+class CommandActivity:
+    """
+    Ring buffers of per-bucket message counts, net changes and user bitmaps for a
+    single command.  `stamps` holds the bucket number each slot was last used for,
+    so stale slots can be spotted (and reset) without ever sweeping the buffers
+    """
+    __slots__ = ('stamps', 'counts', 'changes', 'users')
+
+    def __init__(self, size):
+        self.stamps = [-1] * size
+        self.counts = [0] * size
+        self.changes = [0.0] * size
+        self.users = [0] * size
+
+
+class ActivityTracker:
+    """
+    Rolling activity stats for each command over several windows (by default 10s,
+    1m and 5m): messages per second, net change in value, and unique users.
+
+    Each command has fixed-size ring buffers of `resolution`-second buckets, covering
+    the longest window, and recording a message is O(1).  Unique users are estimated
+    by linear counting: each bucket has a `user_bits`-bit bitmap, with one bit set per
+    nickname, and a window's bitmaps are OR-ed together when it's read.  Estimates
+    are close for up to a few times `user_bits` users
+    """
+    def __init__(self, windows=(10, 60, 300), resolution=1.0, user_bits=1024, clock=time.monotonic):
+        self.windows = tuple(sorted(windows))
+        self.resolution = resolution
+        self.user_bits = user_bits
+        self.clock = clock
+
+        self.size = int(math.ceil(self.windows[-1] / resolution))
+        self.activity = {}
+
+    def record(self, name, nickname=None, previous=None, current=None):
+        """
+        Records a message for command `name`, which changed its value from `previous`
+        to `current`.  Net change is only tracked for number commands
+        """
+        activity = self.activity.get(name)
+
+        if activity is None:
+            activity = self.activity[name] = CommandActivity(self.size)
+
+        bucket = int(self.clock() / self.resolution)
+        slot = bucket % self.size
+
+        if activity.stamps[slot] != bucket:
+            activity.stamps[slot] = bucket
+            activity.counts[slot] = 0
+            activity.changes[slot] = 0.0
+            activity.users[slot] = 0
+
+        activity.counts[slot] += 1
+
+        if isinstance(current, numbers.Real) and isinstance(previous, numbers.Real):
+            activity.changes[slot] += current - previous
+
+        if nickname is not None:
+            activity.users[slot] |= 1 << (hash(nickname.lower()) % self.user_bits)
+
+    def check_window(self, window):
+        """
+        Raises ValueError if stats can't be given over `window` seconds, because it's
+        longer than the longest window kept
+        """
+        if not 0 < window <= self.windows[-1]:
+            raise ValueError('Activity window {}s must be more than 0, and at most {}s'.format(
+                window, self.windows[-1]
+            ))
+
+    def window(self, name, window):
+        """
+        `{'rate': ..., 'change': ..., 'users': ...}` for command `name` over the
+        last `window` seconds
+        """
+        activity = self.activity.get(name)
+
+        if activity is None:
+            return {'rate': 0.0, 'change': 0.0, 'users': 0}
+
+        bucket = int(self.clock() / self.resolution)
+        count, change, users = 0, 0.0, 0
+
+        for past in range(bucket - min(int(math.ceil(window / self.resolution)), self.size) + 1, bucket + 1):
+            slot = past % self.size
+
+            if activity.stamps[slot] == past:
+                count += activity.counts[slot]
+                change += activity.changes[slot]
+                users |= activity.users[slot]
+
+        return {
+            'rate': round(count / window, 3),
+            'change': round(change, 6),
+            'users': self.estimate_users(users),
+        }
+
+    def estimate_users(self, bitmap):
+        empty = self.user_bits - bin(bitmap).count('1')
+
+        if not empty:
+            # Saturated: the best estimate linear counting can give
+            empty = 0.5
+
+        return int(round(-self.user_bits * math.log(empty / self.user_bits)))
+
+    def metric(self, name, metric, window):
+        return self.window(name, window)[metric]
+
+    def summary(self, name):
+        """
+        Every window's stats for command `name`, keyed by window label (e.g. "1m")
+        """
+        return OrderedDict((format_window(window), self.window(name, window)) for window in self.windows)
+
+    def summary_msg(self, name):
+        """
+        One-line summary for chat, e.g. "VOLUME 10s: 1.2/s, +0.4, 3 users | 1m: ..."
+        """
+        return '{} {}'.format(name.upper(), ' | '.join(
+            '{}: {}/s, {:+g}, {} users'.format(label, stats['rate'], round(stats['change'], 3), stats['users'])
+            for label, stats in self.summary(name).items()
+        ))
+
+    def stats(self):
+        """
+        Summaries of every command with any recorded activity
+        """
+        return {name: self.summary(name) for name in self.activity}
+
+
+class StatCommand(Command):
+    """
+    Read-only command whose value is one of another command's activity stats (see
+    `ActivityTracker`), refreshed by the client and sent to its outputs like any
+    other command's value.  The only action is "get".
+
+    Stats have no upper bound, so replies leave the bounds out
+    """
+    __slots__ = ('command', 'metric', 'window')
+
+    def __init__(self, name=None, command=None, metric='rate', window=60, **kwargs):
+        if command is None:
+            raise ValueError('Activity stat "{}" needs the "command" it reports on'.format(name))
+
+        if metric not in METRICS:
+            raise ValueError('"{}" is not a valid activity metric. Choose one of: {}'.format(
+                metric, ', '.join(METRICS)
+            ))
+
+        self.command = command.lower()
+        self.metric = metric
+        self.window = window
+
+        kwargs['allowed_actions'] = ['get']
+        kwargs.setdefault('min', 0.0)
+        kwargs.setdefault('max', float('inf'))
+        super().__init__(name=name, **kwargs)
+
+    def compile_templates(self):
+        super().compile_templates()
+        self._range_template = '{} is at {{}}'.format(self.name.upper().replace('{', '{{').replace('}', '}}'))
+
+    def refresh(self, tracker):
+        """
+        Updates the value from `tracker`.  Returns whether it changed
+        """
+        value = float(tracker.metric(self.command, self.metric, self.window))
+
+        if value == self.current:
+            return False
+
+        self.current = value
+        return True
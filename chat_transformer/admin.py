@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+
+from .inputs.base import LineBufferProtocol
+from .utils import create_private_unix_server, remove_socket
+
+logger = logging.getLogger(__name__)
+
+
+def encode_response(response):
+    """
+    Responses are single lines of JSON.  Anything JSON can't represent (e.g. NumPy
+    values) is sent as a string, and vectors as lists
+    """
+    return json.dumps(response, default=str).encode('utf-8') + b'\n'
+
+
+class AdminProtocol(LineBufferProtocol):
+    """
+    Line-delimited JSON requests in, one line of JSON response out per request.
+    Requests longer than `max_line_length` bytes are dropped
+    """
+    max_line_length = 1024 * 1024
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        for line in self.read_lines(data).split(b'\n'):
+            if line.strip():
+                self.transport.write(encode_response(self.server.handle_request(line)))
+
+
+class AdminServer:
+    """
+    Local control socket for a running client: inspect and change command values,
+    force sends, pause outputs, and reload the commands file, without going through
+    IRC.  Listens on a Unix socket, only accessible to the user running the client,
+    and costs nothing while no requests are coming in.
+
+    Each request is a line of JSON with an `op`, and gets a line of JSON back with
+    `"ok": true` and the result, or `"ok": false` and an `error`:
+
+        {"op": "dump"}
+        {"op": "set", "values": {"volume": 0.5, "color": [1, 0.5, 0]}}
+        {"op": "send_all", "commands": ["volume"], "outputs": ["osc"], "force": true}
+        {"op": "pause", "output": "http"}
+        {"op": "resume", "output": "http"}
+        {"op": "reload"}
+        {"op": "activity"}
+    """
+    def __init__(self, client, path='chat_transformer-admin.sock', loop=None):
+        self.client = client
+        self.path = path
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.server = None
+
+    async def start(self):
+        """
+        Listens on `path`, only accessible to the current user (see
+        `create_private_unix_server`)
+        """
+        self.server = await create_private_unix_server(self.loop, lambda: AdminProtocol(self), self.path)
+        logger.info('Admin socket listening on {}'.format(self.path))
+
+    def handle_request(self, line):
+        try:
+            request = json.loads(line.decode('utf-8'))
+            op = request.pop('op')
+        except (ValueError, KeyError, AttributeError, TypeError):
+            return {'ok': False, 'error': 'Requests must be JSON objects with an "op"'}
+
+        method = getattr(self, 'op_{}'.format(op), None)
+        if method is None:
+            return {'ok': False, 'error': 'Unknown op "{}"'.format(op)}
+
+        try:
+            result = method(**request)
+        except (TypeError, ValueError, KeyError, OSError) as error:
+            return {'ok': False, 'error': error.args[0] if error.args else repr(error)}
+
+        logger.info('Admin: {}'.format(op))
+        return dict(result or {}, ok=True)
+
+    def op_dump(self):
+        """
+        Every command's state, and every output's health
+        """
+        client = self.client
+
+        return {
+            'commands': {
+                name: {
+                    'value': command.current,
+                    'initial': command.initial,
+                    'min': command.min,
+                    'max': command.max,
+                }
+                for name, command in client.commands.items()
+            },
+            'outputs': {
+                name: {
+                    'ready': name not in client.unready_outputs,
+                    'paused': name in client.paused_outputs,
+                    'stats': getattr(output, 'stats', None),
+                }
+                for name, output in client.outputs.items()
+            },
+            'irc': {'connected': client.irc_ready},
+            'tracing': client.tracer.stats if client.tracer is not None else None,
+        }
+
+    def op_activity(self):
+        """
+        Rolling activity stats for every command that's had any
+        """
+        if self.client.activity is None:
+            raise ValueError('Activity stats are not turned on')
+
+        return {'activity': self.client.activity.stats()}
+
+    def op_set(self, values):
+        if not isinstance(values, dict):
+            raise ValueError('"values" must be an object of command names to values')
+
+        return {'set': self.client.set_values(values)}
+
+    def op_send_all(self, commands=None, outputs=None, force=True):
+        self.client.send_all(force=force, commands=commands, outputs=outputs)
+
+    def op_pause(self, output):
+        self.client.pause_output(output)
+
+    def op_resume(self, output):
+        self.client.resume_output(output)
+
+    def op_reload(self):
+        self.client.on_reload()
+
+    def cleanup(self):
+        if self.server is not None:
+            self.server.close()
+
+        try:
+            remove_socket(self.path)
+        except FileExistsError as error:
+            logger.warning('Not removing admin socket: {}'.format(error))
@@ -0,0 +1,60 @@
+class ChangeDetector:
+    """
+    Remembers the last value sent for each (command, output) pair, so that sends
+    which wouldn't change anything on the receiving end can be skipped.
+
+    Values within `epsilon` of the last value sent count as unchanged.  Since the
+    comparison is always against the last value actually sent, small changes still
+    add up and go out once they drift further than `epsilon`.
+    """
+    def __init__(self, epsilon=0.0):
+        self.epsilon = epsilon
+        self.last_sent = {}
+
+    def has_changed(self, command_name, output_name, value):
+        """
+        Returns True (and records `value` as sent) if `value` differs from the last
+        value sent for this command/output pair
+        """
+        key = (command_name, output_name)
+
+        if key in self.last_sent and self.is_close(self.last_sent[key], value):
+            return False
+
+        self.last_sent[key] = value
+        return True
+
+    def is_close(self, previous, value):
+        """
+        Compares two values, using `epsilon` for anything numeric, componentwise
+        for vectors
+        """
+        if isinstance(value, (tuple, list)):
+            return (
+                isinstance(previous, (tuple, list))
+                and len(previous) == len(value)
+                and all(self.is_close(a, b) for a, b in zip(previous, value))
+            )
+
+        try:
+            return abs(previous - value) <= self.epsilon
+        except TypeError:
+            return previous == value
+
+    def forget(self, command_name=None, output_name=None):
+        """
+        Clears the recorded values for a command, an output, or (with no arguments)
+        everything, so the next send goes out regardless
+        """
+        if command_name is None and output_name is None:
+            self.last_sent.clear()
+            return
+
+        self.last_sent = {
+            (sent_command, sent_output): value
+            for (sent_command, sent_output), value in self.last_sent.items()
+            if not (
+                (command_name is None or sent_command == command_name)
+                and (output_name is None or sent_output == output_name)
+            )
+        }
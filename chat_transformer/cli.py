@@ -1,11 +1,11 @@
 import os
 import sys
+import signal
 import argparse
 import logging
-import asyncio
 import json
 
-from .client import TransformerClient
+from .utils import EVENT_LOOPS, create_event_loop
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +22,14 @@ def get_required_key(key, config):
         )
 
 
+def read_config(filename):
+    """
+    Reads and parses the JSON config file
+    """
+    with open(filename) as config_file:
+        return json.loads(config_file.read())
+
+
 class CLI:
     """
     Command-line interface for running the IRC chat-to-command transformer
@@ -32,6 +40,10 @@ class CLI:
     )
 
     def __init__(self):
+        # The config most recently read from the config file, that reloads are
+        # compared against
+        self.config = None
+
         self.parser = argparse.ArgumentParser(
             description=self.description,
         )
@@ -53,6 +65,65 @@ class CLI:
             help='How verbose to make the output. Default is 1 (INFO)',
             default=1,
         )
+        self.parser.add_argument(
+            '-l',
+            '--loop',
+            choices=EVENT_LOOPS,
+            help=(
+                'Event loop implementation. "uvloop" requires uvloop to be installed, '
+                'and falls back to "asyncio" if it is not. Overrides the "loop" config key'
+            ),
+            default=os.environ.get('CHAT_TRANSFORMER_LOOP', None),
+        )
+        self.parser.add_argument(
+            '--profile',
+            choices=('cprofile', 'sampling'),
+            help=(
+                'Profile the client from startup, with cProfile or by sampling the stack. '
+                'Profiling can also be toggled at any time by sending the process SIGUSR1'
+            ),
+            default=None,
+        )
+        self.parser.add_argument(
+            '--profile-duration',
+            type=float,
+            help='Time (in seconds) each profiling window lasts. Overrides "profile.duration"',
+            default=None,
+        )
+        self.parser.add_argument(
+            '--profile-output',
+            help='Filename prefix for profiling results. Overrides "profile.output"',
+            default=None,
+        )
+
+    def reload_config(self, config_file, client):
+        """
+        Re-reads the config file in the background (see `_reload_config`)
+        """
+        return client.loop.create_task(self._reload_config(config_file, client))
+
+    async def _reload_config(self, config_file, client):
+        """
+        Re-reads the config file in a worker thread, and hands the new output config to
+        the client.  Only outputs can be changed while running; other changes (since the
+        config was last read) are logged, and need a restart
+        """
+        try:
+            new_config = await client.loop.run_in_executor(None, read_config, config_file)
+            outputs = get_required_key('outputs', new_config)
+        except (OSError, ValueError) as error:
+            logger.error('Could not reload {}: {}'.format(config_file, error))
+            return
+
+        logger.info('Reloading outputs from {}'.format(config_file))
+
+        config, self.config = self.config or {}, new_config
+
+        for key in sorted(set(config) | set(new_config)):
+            if key != 'outputs' and config.get(key) != new_config.get(key):
+                logger.warning('Changes to "{}" need a restart to take effect'.format(key))
+
+        await client.reload_outputs(outputs)
 
     @classmethod
     def entrypoint(cls):
@@ -77,8 +148,15 @@ class CLI:
             format="%(asctime)-15s %(levelname)-8s %(message)s",
         )
 
-        with open(args.config_file) as config_file:
-            config = json.loads(config_file.read())
+        # Imported here so `--help` and argument errors don't pay for loading asyncio
+        # or the client
+        from .client import StartupError, TransformerClient
+
+        config = self.config = read_config(args.config_file)
+
+        # Create the event loop before anything else, so every part of the client
+        # (outputs, inputs, watchers, the IRC connection) picks up the same loop
+        loop = create_event_loop(args.loop or config.get('loop', 'asyncio'))
 
         # Parse IRC values
         irc = get_required_key('irc', config)
@@ -90,6 +168,9 @@ class CLI:
         irc_password = irc.get('password', None)
         irc_realname = irc.get('realname', None)
         irc_username = irc.get('username', None)
+        irc_reconnect_min_delay = irc.get('reconnect_min_delay', 1.0)
+        irc_reconnect_max_delay = irc.get('reconnect_max_delay', 60.0)
+        irc_engine = irc.get('engine', 'irc')
 
         # Check that required IRC arguments are received
         if not all([irc_server, irc_nickname]):
@@ -102,28 +183,111 @@ class CLI:
         commands_file = commands.get('filename', 'commands.json')
         watch_commands_file = commands.get('watch', False)
         watch_interval = commands.get('watch_interval', 60)
+        command_storage = commands.get('storage', 'objects')
 
         # Load OUTPUT Values
         outputs = get_required_key('outputs', config)
 
+        # Load INPUT values (optional sources of chat messages besides IRC)
+        inputs = config.get('inputs', {})
+
+        # Load RECORDER values (optional recording of inbound chat)
+        recorder = config.get('recorder', None)
+
+        # Parse STARTUP values
+        startup = config.get('startup', {})
+
+        # Parse change detection values
+        changes = config.get('changes', {})
+
+        # Load ADMIN values (optional local control socket)
+        admin = config.get('admin', None)
+
+        # Parse SCHEDULER values (timing of periodic work, and command decay)
+        scheduler = config.get('scheduler', {})
+
+        # Load ACTIVITY values (optional rolling stats for each command)
+        activity = config.get('activity', None)
+
+        # Parse LOG_LIMITS values (rate limits for logging from hot paths)
+        log_limits = config.get('log_limits', None)
+
+        # Load TRACE values (optional tracing of a sample of messages)
+        trace = config.get('trace', None)
+
+        # Parse PROFILE values, overridden by the command-line flags
+        profile = dict(config.get('profile', {}))
+        for key, value in (
+            ('mode', args.profile), ('duration', args.profile_duration), ('output', args.profile_output)
+        ):
+            if value is not None:
+                profile[key] = value
+
         client = TransformerClient(
             irc_channel=irc_channel if irc_channel is not None else irc_nickname,
+            loop=loop,
             commands_file=commands_file,
             watch_commands_file=watch_commands_file,
             watch_file_interval=watch_interval,
             output_data=outputs,
+            skip_unchanged=changes.get('skip_unchanged', False),
+            change_epsilon=changes.get('epsilon', 0.0),
+            resync_interval=changes.get('resync_interval', 0),
+            command_storage=command_storage,
+            reconnect_min_delay=irc_reconnect_min_delay,
+            reconnect_max_delay=irc_reconnect_max_delay,
+            irc_engine=irc_engine,
+            input_data=inputs,
+            recorder_data=recorder,
+            startup_policy=startup.get('policy', 'all'),
+            connect_timeout=startup.get('timeout', 10.0),
+            output_retry_interval=startup.get('retry_interval', 30.0),
+            scheduler_tick=scheduler.get('tick', 0.1),
+            decay_interval=scheduler.get('decay_interval', 0.1),
+            admin_data=admin,
+            profile_data=profile,
+            trace_data=trace,
+            activity_data=activity,
+            log_limits=log_limits,
         )
 
-        loop = client.reactor.loop
+        # SIGUSR1 turns profiling on (for `profile.duration` seconds) and off
+        if hasattr(signal, 'SIGUSR1'):
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, client.profiler.toggle)
+            except (NotImplementedError, RuntimeError):
+                logger.warning('Could not add a SIGUSR1 handler, profiling can only be started with --profile')
 
-        loop.run_until_complete(client.connect(
-            irc_server,
-            irc_port,
-            irc_nickname,
-            password=irc_password,
-            username=irc_username,
-            ircname=irc_realname,
-        ))
+        if args.profile is not None:
+            client.profiler.start()
+
+        # Optionally watch the config file, to pick up output changes without a restart
+        if config.get('watch_config', False):
+            from .watchers import FileWatcher
+
+            watcher = FileWatcher(
+                args.config_file,
+                lambda: self.reload_config(args.config_file, client),
+                loop=loop,
+                check_interval=config.get('watch_config_interval', 5),
+                scheduler=client.scheduler,
+            )
+            watcher.start()
+
+        try:
+            loop.run_until_complete(client.connect(
+                irc_server,
+                irc_port,
+                irc_nickname,
+                password=irc_password,
+                username=irc_username,
+                ircname=irc_realname,
+            ))
+        except StartupError as error:
+            logger.error('Could not start: {}'.format(error))
+            self.shutdown(client, loop)
+            loop.close()
+            sys.exit(1)
 
         try:
             client.start()
@@ -131,19 +295,27 @@ class CLI:
             logger.info("Disconnecting from {}:{}...".format(
                 client.connection.server, client.connection.port
             ))
-            client.disconnect()
-            client.cleanup()
-
-            tasks = asyncio.gather(
-                *asyncio.Task.all_tasks(loop=loop),
-                loop=loop,
-                return_exceptions=True
-            )
-            tasks.add_done_callback(lambda t: loop.stop())
-            tasks.cancel()
-
-            while not tasks.done() and not loop.is_closed():
-                loop.run_forever()
+            self.shutdown(client, loop)
         finally:
             loop.close()
             sys.exit(0)
+
+    def shutdown(self, client, loop):
+        """
+        Disconnects and cleans up the client, and cancels everything still running on the loop
+        """
+        import asyncio
+
+        client.disconnect()
+        client.cleanup()
+
+        tasks = asyncio.gather(
+            *asyncio.Task.all_tasks(loop=loop),
+            loop=loop,
+            return_exceptions=True
+        )
+        tasks.add_done_callback(lambda t: loop.stop())
+        tasks.cancel()
+
+        while not tasks.done() and not loop.is_closed():
+            loop.run_forever()
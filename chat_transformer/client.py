@@ -1,12 +1,21 @@
-import json
+import copy
+import random
 import logging
 import asyncio
-
-from irc.client_aio import AioSimpleIRCClient
+from collections import OrderedDict
 
 from .utils import class_from_string
-from .commands import InvalidActionError, Command
+from .changes import ChangeDetector
+from .registry import CommandRegistry
+from .outputs.base import BaseOutput, OutputUpdate
+from .outputs.queued import QueuedOutput
+from .commands import InvalidActionError, command_class
 from .watchers import FileWatcher
+from .lean import LeanIRCConnection
+from .loader import file_signature, read_commands_file
+from .scheduler import TimerWheel
+from .profiling import Profiler
+from .logs import RateLimitedLog
 
 logger = logging.getLogger(__name__)
 
@@ -16,13 +25,35 @@ DEFAULT_OUTPUT_CLASSES = {
     'http': 'chat_transformer.outputs.http.HTTPOutput',
 }
 
+DEFAULT_INPUT_CLASSES = {
+    'unix': 'chat_transformer.inputs.unix.UnixSocketInput',
+    'udp': 'chat_transformer.inputs.udp.UDPInput',
+    'stdin': 'chat_transformer.inputs.stdin.StdinInput',
+    'replay': 'chat_transformer.inputs.replay.ReplayInput',
+}
+
 
-class TransformerClient(AioSimpleIRCClient):
+class StartupError(Exception):
+    """
+    Raised if the connections required by the startup policy couldn't be made
+    """
+    pass
+
+
+class TransformerClient:
     """
     Takes data from an IRC server, parses it, and passes the appropriate data
     the appropriate output(s), e.g. OSC, http, and/or back out to IRC
     """
-    reconnect_delay = 60
+    # Fraction of each reconnect delay that's randomized, so many clients dropped
+    # at once don't all reconnect in lockstep
+    reconnect_jitter = 0.5
+
+    # What has to connect for startup to succeed:
+    #   all: IRC and every output
+    #   irc: IRC, plus whichever outputs connect in time
+    #   any: nothing; start with whatever connects in time
+    startup_policies = ('all', 'irc', 'any')
 
     def __init__(
         self,
@@ -32,39 +63,263 @@ class TransformerClient(AioSimpleIRCClient):
         watch_file_interval=60,
         loop=None,
         output_data={},
+        skip_unchanged=False,
+        change_epsilon=0.0,
+        resync_interval=0,
+        command_storage='objects',
+        reconnect_min_delay=1.0,
+        reconnect_max_delay=60.0,
+        irc_engine='irc',
+        input_data={},
+        recorder_data=None,
+        startup_policy='all',
+        connect_timeout=10.0,
+        output_retry_interval=30.0,
+        scheduler_tick=0.1,
+        decay_interval=0.1,
+        admin_data=None,
+        profile_data=None,
+        trace_data=None,
+        activity_data=None,
+        log_limits=None,
     ):
         self.irc_channel = self.format_irc_channel(irc_channel) if irc_channel is not None else None
 
+        # Optionally skip sending values the outputs already have, with a periodic
+        # forced resync for receivers that might have lost their state
+        self.change_detector = ChangeDetector(change_epsilon) if skip_unchanged else None
+        self.resync_interval = resync_interval
+
         self.commands = {}
         self.commands_file = commands_file
+        self.command_storage = command_storage
+        self._command_definitions = {}
+        self._commands_signature = None
         self.load_commands()
 
         self.loop = loop if loop is not None else asyncio.get_event_loop()
 
-        # Initialize outputs
+        # All periodic and delayed work (resyncs, file checks, retries, and command
+        # decay and resets) runs on a single timer wheel
+        self.scheduler = TimerWheel(tick=scheduler_tick, loop=self.loop)
+        self.decay_interval = decay_interval
+        self._decaying = set()
+        self._decay_timer = None
+        self._last_decay = None
+        self._last_activity = {}
+        self._reset_timers = {}
+
+        # Reconnect to IRC on disconnect, backing off exponentially between attempts
+        self.autoreconnect = True
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self._reconnect_attempts = 0
+        self._reconnect_handle = None
+
+        if startup_policy not in self.startup_policies:
+            raise ValueError(
+                '"{}" is not a valid startup policy. Choose one of: {}'.format(
+                    startup_policy, ', '.join(self.startup_policies)
+                )
+            )
+
+        self.startup_policy = startup_policy
+        self.connect_timeout = connect_timeout
+        self.output_retry_interval = output_retry_interval
+
+        # Logging for messages that can arrive as fast as chat does
+        log_limits = log_limits or {}
+        self.invalid_action_log = RateLimitedLog(logger, logging.ERROR, loop=self.loop, **log_limits)
+        self.dropped_reply_log = RateLimitedLog(logger, logging.DEBUG, loop=self.loop, **log_limits)
+
+        # Optional tracing of a sample of messages through every stage
+        self.tracer = None
+        if trace_data is not None:
+            from .tracing import Tracer
+            self.tracer = Tracer(**trace_data)
+
+        # Optional rolling activity stats for each command, some of which can be
+        # sent to outputs as read-only "stat" commands
+        self.activity = None
+        self.activity_commands = {}
+        if activity_data is not None:
+            from .activity import ActivityTracker, StatCommand
+
+            activity_data = dict(activity_data)
+            stat_commands = activity_data.pop('commands', {})
+            self.activity_interval = activity_data.pop('interval', 1.0)
+            self.activity = ActivityTracker(**activity_data)
+            self.activity_commands = {
+                key.lower(): StatCommand(name=key.lower(), **value) for key, value in stat_commands.items()
+            }
+
+            for command in self.activity_commands.values():
+                self.activity.check_window(command.window)
+
+        # Initialize outputs.  Outputs that haven't connected yet are tracked
+        # in `unready_outputs`, and aren't sent to
         self.outputs = {}
+        self.unready_outputs = set()
+        self.paused_outputs = set()
+        self._pending_batches = {}
+        self._pending_traces = {}
+
+        # Each output's config is kept, so that changes can be picked out on reload
+        self.output_data = {}
+        self._reload_generation = 0
+
         for key, value in output_data.items():
-            output_cls_str = value.pop('class', DEFAULT_OUTPUT_CLASSES[key])
-            output_cls = class_from_string(output_cls_str)
-            self.outputs[key] = output_cls(**value)
+            self.outputs[key] = self.build_output(key, value)
+            self.output_data[key] = copy.deepcopy(value)
+
+        # Initialize inputs (sources of chat messages besides IRC)
+        self.inputs = {}
+        for key, value in input_data.items():
+            value = dict(value)
+            input_cls = class_from_string(value.pop('class', None) or DEFAULT_INPUT_CLASSES[key])
+            self.inputs[key] = input_cls(loop=self.loop, **value)
+
+        # Optionally record inbound chat, actions, and output sends
+        self.recorder = None
+        if recorder_data:
+            from .recorder import Recorder
+            self.recorder = Recorder(loop=self.loop, **recorder_data)
+
+        # Profiling of the loop, off until started (e.g. by a signal)
+        self.profiler = Profiler(
+            stages=self.profile_stages, loop=self.loop, scheduler=self.scheduler, **(profile_data or {})
+        )
+
+        # Optional local control socket
+        self.admin = None
+        if admin_data is not None:
+            from .admin import AdminServer
+            self.admin = AdminServer(self, loop=self.loop, **admin_data)
 
-        # Init from AioSimpleIRRCClient, but passing the event loop
-        self.reactor = self.reactor_class(loop=self.loop)
-        self.connection = self.reactor.server()
-        self.reactor.add_global_handler("all_events", self._dispatcher, -10)
+        # The "lean" engine bypasses the irc library entirely.  Otherwise, set up
+        # the irc library's reactor on our event loop, only importing it when used
+        if irc_engine == 'lean':
+            self.reactor = None
+            self.connection = LeanIRCConnection(self, loop=self.loop)
+        else:
+            from irc.client_aio import AioReactor
+
+            self.reactor = AioReactor(loop=self.loop)
+            self.reactor.add_global_handler("all_events", self._dispatcher, -10)
+            self.connection = self.reactor.server()
 
         if watch_commands_file:
             watcher = FileWatcher(
-                self.commands_file, self.on_reload, loop=self.loop, check_interval=watch_file_interval
+                self.commands_file,
+                self.on_reload,
+                loop=self.loop,
+                check_interval=watch_file_interval,
+                scheduler=self.scheduler,
             )
             watcher.start()
 
+    def build_output(self, name, config):
+        """
+        Creates an output from its config
+        """
+        config = dict(config)
+        output_cls = class_from_string(config.pop('class', None) or DEFAULT_OUTPUT_CLASSES[name])
+        queue_options = config.pop('queue', None)
+        output = output_cls(**config)
+        output.tracer = self.tracer
+
+        # Optionally isolate the output behind its own queue and worker
+        if queue_options is not None:
+            output = QueuedOutput(output, name=name, loop=self.loop, **queue_options)
+            output.tracer = self.tracer
+
+        return output
+
+    async def reload_outputs(self, output_data):
+        """
+        Brings the outputs in line with new output config, without interrupting the
+        ones that haven't changed (or IRC).  New and changed outputs are connected
+        alongside the old ones, which are only swapped out and cleaned up once their
+        replacement is connected; if it can't connect, the old output is kept.
+        Outputs no longer in the config are removed once that's done.
+
+        If another reload starts before this one finishes, this one is abandoned
+        """
+        self._reload_generation += 1
+        generation = self._reload_generation
+
+        changed = [
+            name for name, config in output_data.items() if self.output_data.get(name) != config
+        ]
+        removed = [name for name in self.outputs if name not in output_data]
+
+        await asyncio.gather(
+            *[self._replace_output(name, output_data[name], generation) for name in changed]
+        )
+
+        if generation != self._reload_generation:
+            return
+
+        for name in removed:
+            logger.info('Removing output "{}"'.format(name))
+            output = self.outputs.pop(name)
+            self.output_data.pop(name, None)
+            self.unready_outputs.discard(name)
+            self.paused_outputs.discard(name)
+            self.cleanup_output(name, output)
+
+    async def _replace_output(self, name, config, generation):
+        try:
+            output = self.build_output(name, config)
+            await asyncio.wait_for(output.connect(), self.connect_timeout)
+        except Exception as error:
+            logger.error('Could not {} output "{}": {}'.format(
+                'reload' if name in self.outputs else 'add',
+                name,
+                error if not isinstance(error, asyncio.TimeoutError) else 'timed out',
+            ))
+            return
+
+        if generation != self._reload_generation:
+            self.cleanup_output(name, output)
+            return
+
+        logger.info('{} output "{}"'.format('Reloaded' if name in self.outputs else 'Added', name))
+        previous = self.outputs.get(name)
+
+        self.outputs[name] = output
+        self.output_data[name] = copy.deepcopy(config)
+        self.unready_outputs.discard(name)
+
+        # The new output starts out knowing nothing, so it gets every value
+        if self.change_detector is not None:
+            self.change_detector.forget(output_name=name)
+        self.send_all(force=True, outputs=[name])
+
+        if previous is not None:
+            self.cleanup_output(name, previous)
+
+    def _dispatcher(self, connection, event):
+        """
+        Dispatch events from the irc library to the on_<event.type> method, if present
+        """
+        method = getattr(self, 'on_' + event.type, None)
+
+        if method is not None:
+            method(connection, event)
+
+    def start(self):
+        """
+        Enter the main processing loop
+        """
+        self.loop.run_forever()
+
     def on_reload(self):
         """
-        Fires when the commands file is reloaded, if `watch_commands_file` is True
+        Fires when the commands file has changed, if `watch_commands_file` is True.
+        The reload runs in the background
         """
-        self.load_commands()
-        self.send_all()
+        return asyncio.ensure_future(self.reload_commands(), loop=self.loop)
 
     def format_irc_channel(self, irc_channel):
         """
@@ -72,38 +327,165 @@ class TransformerClient(AioSimpleIRCClient):
         """
         return irc_channel if irc_channel[0] == '#' else '#{}'.format(irc_channel)
 
-    async def connect(self, irc_server, irc_port, irc_nickname, is_reconnect=False, *args, **kwargs):
+    async def connect(self, irc_server, irc_port, irc_nickname, *args, **kwargs):
         """
-        Creates both IRC and OSC connections
+        Creates both IRC and OSC connections, all at once, each limited to `connect_timeout`.
+        Outputs are only connected here: if IRC drops, only the IRC connection is
+        re-established.  Raises `StartupError` if the `startup_policy` isn't met
         """
         self.irc_server = irc_server
         self.irc_port = irc_port
         self.irc_nickname = irc_nickname
+        self.irc_connect_args = args
+        self.irc_connect_kwargs = kwargs
 
         if self.irc_channel is None:
             self.irc_channel = self.format_irc_channel(self.irc_nickname)
 
-        for output in self.outputs.values():
-            await output.connect()
+        if self.recorder is not None:
+            self.recorder.start()
 
-        self.send_all()
+        self.unready_outputs.update(self.outputs)
+
+        *_, irc_connected = await asyncio.gather(
+            *[self.connect_output(output_name) for output_name in self.outputs],
+            self.connect_irc()
+        )
+
+        if self.startup_policy != 'any' and not irc_connected:
+            raise StartupError('Could not connect to {}:{}'.format(self.irc_server, self.irc_port))
+
+        if self.startup_policy == 'all' and self.unready_outputs:
+            raise StartupError('Could not connect to output(s): {}'.format(
+                ', '.join(sorted(self.unready_outputs))
+            ))
+
+        for input_ in self.inputs.values():
+            await input_.start(self.handle_messages)
+
+        if self.admin is not None:
+            await self.admin.start()
+
+        if self.resync_interval:
+            self.scheduler.call_every(self.resync_interval, self.resync)
 
-        await self.connection.connect(irc_server, irc_port, irc_nickname, *args, **kwargs)
+        if self.activity_commands:
+            self.scheduler.call_every(self.activity_interval, self.send_activity)
 
-        if not is_reconnect:
-            self.loop.call_later(self.reconnect_delay, self.reconnect_checker)
+    async def connect_output(self, output_name):
+        """
+        Connects a single output and sends it every command's value.  If it can't connect,
+        another attempt is scheduled every `output_retry_interval` seconds.
+        Returns whether it connected
+        """
+        try:
+            await asyncio.wait_for(self.outputs[output_name].connect(), self.connect_timeout)
+        except Exception as error:
+            logger.error('Could not connect to output "{}": {}'.format(
+                output_name, error if not isinstance(error, asyncio.TimeoutError) else 'timed out'
+            ))
+
+            if self.output_retry_interval and self.startup_policy != 'all':
+                self.scheduler.call_later(self.output_retry_interval, self._retry_output, output_name)
+
+            return False
+
+        self.unready_outputs.discard(output_name)
+        self.send_all(force=True, outputs=[output_name])
+        return True
+
+    def _retry_output(self, output_name):
+        if output_name in self.outputs and output_name in self.unready_outputs:
+            asyncio.ensure_future(self.connect_output(output_name), loop=self.loop)
+
+    @property
+    def irc_ready(self):
+        return getattr(self.connection, 'connected', False)
+
+    async def connect_irc(self):
+        """
+        Connects (or reconnects) to the IRC server, scheduling another attempt if it fails.
+        Returns whether it connected
+        """
+        try:
+            await asyncio.wait_for(
+                self.connection.connect(
+                    self.irc_server,
+                    self.irc_port,
+                    self.irc_nickname,
+                    *self.irc_connect_args,
+                    **self.irc_connect_kwargs
+                ),
+                self.connect_timeout,
+            )
+        except Exception as error:
+            logger.error('Could not connect to {}:{}: {}'.format(
+                self.irc_server,
+                self.irc_port,
+                error if not isinstance(error, asyncio.TimeoutError) else 'timed out',
+            ))
+            self.schedule_reconnect()
+            return False
+
+        return True
+
+    def on_disconnect(self, connection, event):
+        """
+        Fires whenever the IRC connection is lost
+        """
+        logger.warning('Disconnected from {}:{}'.format(self.irc_server, self.irc_port))
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self):
+        """
+        Schedules an IRC reconnect attempt, with exponential backoff and jitter
+        """
+        if not self.autoreconnect or self._reconnect_handle is not None:
+            return
+
+        delay = min(
+            self.reconnect_max_delay,
+            self.reconnect_min_delay * 2 ** min(self._reconnect_attempts, 32),
+        )
+        delay -= delay * self.reconnect_jitter * random.random()
+        self._reconnect_attempts += 1
+
+        logger.info('Reconnecting to {}:{} in {:.1f}s'.format(self.irc_server, self.irc_port, delay))
+        self._reconnect_handle = self.loop.call_later(delay, self._reconnect)
+
+    def _reconnect(self):
+        self._reconnect_handle = None
+        asyncio.ensure_future(self.connect_irc(), loop=self.loop)
+
+    def disconnect(self, message=''):
+        """
+        Disconnects from IRC for good, without reconnecting
+        """
+        self.autoreconnect = False
+
+        if self._reconnect_handle is not None:
+            self._reconnect_handle.cancel()
+            self._reconnect_handle = None
+
+        self.connection.disconnect(message)
 
     def on_welcome(self, connection, event):
         """
         When connection is established, join the target IRC channel
         to begin receiving messages
         """
+        self._reconnect_attempts = 0
         self.connection.join(self.irc_channel)
 
     def irc_send(self, message):
         """
-        Sends message to the joined IRC channel
+        Sends message to the joined IRC channel.  Messages are dropped while IRC
+        is disconnected, since commands can also arrive through other inputs
         """
+        if not getattr(self.connection, 'connected', False):
+            self.dropped_reply_log('Not connected to IRC, dropped reply "{}"', message)
+            return
+
         self.connection.privmsg(self.irc_channel, message)
 
     def load_commands(self):
@@ -120,7 +502,7 @@ class TransformerClient(AioSimpleIRCClient):
                     "max": MAX_VALUE,
                     "delta": INCREMENT/DECREMENT_VALUE,
                     "initial": INITIAL_VALUE,
-                    "type": "NUMBER" (or "BOOLEAN", "MESSAGE"),
+                    "type": "number" (or "vector", for several components),
                     "outputs": {
                         "osc": { "address": "/OSC/ADDRESS" },
                         "http": { "endpoint": "/HTTP/ENDPOINT" },
@@ -129,39 +511,271 @@ class TransformerClient(AioSimpleIRCClient):
                 },
                 ...
             }
+
+        The file is read, validated and compiled in one go; see `reload_commands` for
+        reloading without blocking the event loop
         """
-        with open(self.commands_file) as commands_file:
-            commands = json.loads(commands_file.read())
+        self.swap_commands(*self.compile_commands(*read_commands_file(self.commands_file)))
 
-        # Load "initial" value into "current" value
-        self.commands = {
-            key.lower(): Command(
-                name=key.lower(),
-                current=self.command_value(key.lower()),
-                **value
-            )
-            for key, value in commands.items()
-        }
+    async def reload_commands(self):
+        """
+        Reloads the commands file in a worker thread, then swaps the new commands in
+        all at once, and sends any new values.  Nothing is reloaded if the file hasn't
+        changed, and if it can't be read or isn't valid, the current commands are kept.
+        Returns whether the commands were reloaded
+        """
+        try:
+            signature = await self.loop.run_in_executor(None, file_signature, self.commands_file)
+
+            if signature == self._commands_signature:
+                return False
+
+            compiled = await self.loop.run_in_executor(None, self._read_and_compile_commands)
+        except (OSError, ValueError, TypeError) as error:
+            logger.error('Could not reload {}: {}'.format(self.commands_file, error))
+            return False
+
+        self.swap_commands(*compiled)
+        self.send_all()
+        return True
+
+    def _read_and_compile_commands(self):
+        return self.compile_commands(*read_commands_file(self.commands_file))
+
+    def compile_commands(self, signature, definitions):
+        """
+        Builds commands from the parsed commands file.  Commands whose definitions are
+        unchanged since the last load are reused as they are, so reloading a large file
+        only rebuilds the commands that changed.
+
+        Only reads the client's state, so it can run outside of the event loop.
+        Returns `(signature, definitions, commands)` for `swap_commands`
+        """
+        # Very large command sets can be stored in contiguous arrays instead
+        if self.command_storage in ('array', 'numpy'):
+            return signature, definitions, CommandRegistry(definitions, backend=self.command_storage)
+
+        previous_definitions, previous_commands = self._command_definitions, self.commands
+        commands = {}
+
+        for key, value in definitions.items():
+            name = key.lower()
+
+            if name in previous_commands and previous_definitions.get(key) == value:
+                commands[name] = previous_commands[name]
+                continue
+
+            value = dict(value)
+            commands[name] = command_class(value.pop('type', 'number'))(name=name, **value)
+
+        return signature, definitions, commands
 
-    def send_all(self):
+    def swap_commands(self, signature, definitions, commands):
         """
-        Initializes the OSC command with all current/initial values
+        Replaces the current commands with newly compiled ones, carrying over current
+        values, as long as a command's type hasn't changed.  Outputs are assumed not to
+        have anything sent for commands whose definitions changed (e.g. new bounds), so
+        change detection doesn't hold back their next full send
         """
-        for command in self.commands.values():
+        previous_commands = self.commands
+
+        if self.change_detector is not None:
+            for key, value in definitions.items():
+                if self._command_definitions.get(key) != value:
+                    self.change_detector.forget(command_name=key.lower())
+
+        for name in commands:
+            command, previous = commands[name], previous_commands.get(name)
+
+            if previous is None or previous is command:
+                continue
+
+            if type(previous) is type(command) and getattr(previous, 'size', None) == getattr(command, 'size', None):
+                command.current = previous.current
+
+        self.commands = commands
+        self._command_definitions = definitions
+        self._commands_signature = signature
+
+    def send_all(self, force=False, commands=None, outputs=None):
+        """
+        Initializes the OSC command with all current/initial values.  With change
+        detection on, only values the outputs don't already have are sent, unless `force` is set.
+
+        `commands` and `outputs` optionally restrict the send to the given names
+        """
+        output_names = [
+            output_name for output_name in (outputs if outputs is not None else self.outputs)
+            if output_name in self.outputs
+            and output_name not in self.unready_outputs
+            and output_name not in self.paused_outputs
+        ]
+
+        if isinstance(self.commands, CommandRegistry):
+            self._send_all_bulk(force, commands, output_names)
+            return
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        for command_name, command in self.commands.items():
+            if commands is not None and command_name not in commands:
+                continue
+
             value = command.current if command.current is not None else command.initial
 
-            for output_name, output in self.outputs.items():
-                try:
-                    output.send_full(
-                        value,
-                        min=command.min,
-                        max=command.max,
-                        **command.outputs[output_name],
-                    )
-                except KeyError:
-                    logger.debug(
-                        'Command "{}" has not output "{}"'.format(command, output_name)
-                    )
+            for output_name in output_names:
+                output_params = command.outputs.get(output_name)
+
+                if output_params is None:
+                    if debug:
+                        logger.debug('Command "{}" has not output "{}"'.format(command, output_name))
+                    continue
+
+                self.send_output(
+                    output_name,
+                    value,
+                    dict(output_params, min=command.min, max=command.max),
+                    full=True,
+                    command_name=command_name,
+                    force=force,
+                )
+
+    def _send_all_bulk(self, force, commands, output_names):
+        """
+        Full send from an array-backed `CommandRegistry`, using its precomputed
+        updates, and handing batching outputs everything as a single batch
+        """
+        for output_name in output_names:
+            output = self.outputs[output_name]
+            named_updates = [
+                (command_name, update) for command_name, update in self.commands.full_updates(output_name)
+                if (commands is None or command_name in commands)
+                and self.should_send(command_name, output_name, update.value, force)
+            ]
+
+            if not named_updates:
+                continue
+
+            if self.recorder is not None:
+                for command_name, update in named_updates:
+                    self.recorder.record_send(output_name, command_name, update.value)
+
+            updates = [update for _, update in named_updates]
+
+            if output.batching:
+                asyncio.ensure_future(self._send_batch(output_name, updates), loop=self.loop)
+            else:
+                for update in updates:
+                    output.send_full(update.value, **update.params)
+
+    def resync(self):
+        """
+        Periodically re-sends every value, whether or not it has changed
+        """
+        logger.debug('Resyncing all outputs')
+        self.send_all(force=True)
+
+    def send_output(self, output_name, value, output_params, full=False, command_name=None, force=False):
+        """
+        Hands a single update to an output.  Outputs that support batching have their
+        updates collected and passed along as one batch at the end of the current loop
+        iteration; all others are sent to immediately.
+
+        If change detection is on and `command_name` is given, values the output
+        already has are skipped, unless `force` is set
+        """
+        if (
+            output_name in self.unready_outputs
+            or output_name in self.paused_outputs
+            or not self.should_send(command_name, output_name, value, force)
+        ):
+            return
+
+        if self.recorder is not None:
+            self.recorder.record_send(output_name, command_name, value)
+
+        output = self.outputs[output_name]
+        trace = self.tracer.current if self.tracer is not None else None
+
+        if output.batching:
+            if not self._pending_batches:
+                self.loop.call_soon(self.flush_batches)
+
+            self._pending_batches.setdefault(output_name, []).append(
+                OutputUpdate(value, output_params, full)
+            )
+
+            if trace is not None:
+                self.tracer.hold(trace)
+                self._pending_traces.setdefault(output_name, []).append((trace, self.tracer.clock()))
+        elif full:
+            output.send_full(value, **output_params)
+        else:
+            output.send(value, **output_params)
+
+        # Queued outputs time their sends themselves, once they're out of the queue
+        if trace is not None and not output.batching:
+            self.tracer.mark(trace, '{} ({})'.format(
+                'enqueue' if isinstance(output, QueuedOutput) else 'send', output_name
+            ))
+
+    def should_send(self, command_name, output_name, value, force=False):
+        """
+        Checks (and records) whether a value needs sending, if change detection is on
+        """
+        if self.change_detector is None or command_name is None:
+            return True
+
+        return self.change_detector.has_changed(command_name, output_name, value) or force
+
+    def flush_batches(self):
+        """
+        Sends each batching output everything collected for it since the last flush
+        """
+        batches, self._pending_batches = self._pending_batches, {}
+        traces, self._pending_traces = self._pending_traces, {}
+
+        for output_name, updates in batches.items():
+            asyncio.ensure_future(
+                self._send_batch(output_name, updates, traces.get(output_name)), loop=self.loop
+            )
+
+    async def _send_batch(self, output_name, updates, traces=None):
+        output = self.outputs.get(output_name)
+
+        if traces is not None:
+            started = self._start_batch_traces(output_name, traces)
+
+        try:
+            if output is not None:
+                await output.send_many(updates)
+                await output.flush()
+        except Exception:
+            logger.exception('Error sending {} update(s) to "{}"'.format(len(updates), output_name))
+        finally:
+            if traces is not None:
+                self._end_batch_traces(output_name, traces, started)
+
+    def _start_batch_traces(self, output_name, traces):
+        """
+        Records how long traced updates waited for their batch, and makes the latest
+        the current trace while the batch is handed to the output
+        """
+        started = self.tracer.clock()
+
+        for trace, queued in traces:
+            self.tracer.span(trace, 'queue ({})'.format(output_name), queued, started)
+
+        self.tracer.current = traces[-1][0]
+        return started
+
+    def _end_batch_traces(self, output_name, traces, started):
+        self.tracer.current = None
+        ended = self.tracer.clock()
+
+        for trace, _ in traces:
+            self.tracer.span(trace, 'send ({})'.format(output_name), started, ended)
+            self.tracer.release(trace)
 
     def on_privmsg(self, connection, event):
         """
@@ -179,7 +793,16 @@ class TransformerClient(AioSimpleIRCClient):
         """
         Redirects all incoming IRC messages to a single parser
         """
-        self.parse_command(event.arguments[0])
+        self.parse_command(event.arguments[0], nickname=getattr(event.source, 'nick', None))
+
+    def handle_messages(self, messages, received=None):
+        """
+        Handles a batch of `(nickname, message)` pairs, as received from
+        the lean IRC engine or any of the inputs.  `received` is the
+        monotonic time the batch arrived, if known, for tracing
+        """
+        for nickname, message in messages:
+            self.parse_command(message, nickname=nickname, received=received)
 
     def _split_command(self, irc_command):
         """
@@ -199,36 +822,207 @@ class TransformerClient(AioSimpleIRCClient):
 
         return command_name, action, value
 
-    def parse_command(self, irc_command):
+    def parse_command(self, irc_command, nickname=None, received=None):
         """
         break irc_command into its parts and, if it's a valid command,
         send it to the appropriate Command for handling
         """
+        trace = self.tracer.begin(irc_command, received) if self.tracer is not None else None
+
+        if self.recorder is not None:
+            self.recorder.record_inbound(nickname, irc_command)
+
         command_name, action, value = self._split_command(irc_command)
 
         if command_name is None:
-            return
+            command = None
+        else:
+            command = self.commands.get(command_name.lower(), None)
 
-        command = self.commands.get(command_name.lower(), None)
+            if command is None and self.activity_commands:
+                command = self.activity_commands.get(command_name.lower(), None)
+
+        if trace is not None:
+            self.tracer.mark(trace, 'lookup')
 
         if command is not None:
+            previous = command.current if self.activity is not None else None
+
             try:
                 response = command.run_action(action, value)
             except InvalidActionError as error:
-                logger.error(str(error))
+                self.invalid_action_log('{}', error)
             else:
-                self.handle_action_response(response)
+                if self.recorder is not None:
+                    self.recorder.record_action(command.name, action, value)
+
+                if command.decay or command.reset_after:
+                    self.on_command_activity(command)
+
+                if trace is not None:
+                    self.tracer.mark(trace, 'action')
+                    self.tracer.current = trace
+
+                try:
+                    self.handle_action_response(response, command_name=command.name)
+                finally:
+                    if trace is not None:
+                        self.tracer.current = None
+
+            if self.activity is not None:
+                self.on_activity(command, nickname, action, previous)
+
+        if trace is not None:
+            self.tracer.end(trace)
 
-    def handle_action_response(self, response):
+    def on_activity(self, command, nickname, action, previous):
+        """
+        Records a message for a command's activity stats, and replies to the "stats"
+        action, for commands that allow it
+        """
+        self.activity.record(command.name, nickname, previous, command.current)
+
+        if action is not None and action.lower() == 'stats' and 'stats' in command.allowed_actions:
+            self.irc_send(self.activity.summary_msg(command.name))
+
+    def send_activity(self):
+        """
+        Refreshes the stat commands, and sends the ones that changed
+        """
+        for command in self.activity_commands.values():
+            if command.refresh(self.activity):
+                self.send_command(command)
+
+    def on_command_activity(self, command):
+        """
+        Keeps track of commands that decay or reset, after an action is run on them
+        """
+        if command.decay and command.current != command.initial:
+            self._decaying.add(command.name)
+
+            if self._decay_timer is None:
+                self._last_decay = self.loop.time()
+                self._decay_timer = self.scheduler.call_every(self.decay_interval, self.decay_commands)
+
+        if command.reset_after:
+            self._last_activity[command.name] = self.loop.time()
+
+            # Rather than rescheduling on every action, the timer checks when it fires
+            # whether there's been activity since, and if so waits out the rest
+            if command.name not in self._reset_timers:
+                self._reset_timers[command.name] = self.scheduler.call_later(
+                    command.reset_after, self._check_reset, command.name
+                )
+
+    def decay_commands(self):
+        """
+        Moves every decaying command toward its initial value, sending the new values.
+        Stops once none are left
+        """
+        now = self.loop.time()
+        elapsed, self._last_decay = now - self._last_decay, now
+
+        for command_name in list(self._decaying):
+            command = self.commands.get(command_name)
+
+            if command is None or not command.decay or not command.decay_toward_initial(elapsed):
+                self._decaying.discard(command_name)
+                continue
+
+            self.send_command(command)
+
+            if command.current == command.initial:
+                self._decaying.discard(command_name)
+
+        if not self._decaying:
+            self._decay_timer.cancel()
+            self._decay_timer = None
+
+    def _check_reset(self, command_name):
+        command = self.commands.get(command_name)
+
+        if command is None or not command.reset_after:
+            self._reset_timers.pop(command_name, None)
+            return
+
+        remaining = self._last_activity[command_name] + command.reset_after - self.loop.time()
+
+        if remaining > self.scheduler.tick / 2:
+            self._reset_timers[command_name] = self.scheduler.call_later(remaining, self._check_reset, command_name)
+            return
+
+        del self._reset_timers[command_name]
+        self._decaying.discard(command_name)
+
+        if command.current != command.initial:
+            logger.debug('Resetting "{}" after {}s without activity'.format(command_name, command.reset_after))
+            command.current = command.initial
+            self.send_command(command)
+
+    def set_values(self, values):
+        """
+        Sets several commands' values at once, from a mapping of command name to value,
+        clamped to each command's min/max, and sends them.  Returns the names set
+        """
+        commands = [
+            (self.commands[name], value) for name, value in values.items() if name in self.commands
+        ]
+
+        # Check everything before setting anything
+        commands = [(command, command.clamp(command.coerce(value))) for command, value in commands]
+
+        for command, value in commands:
+            command.current = value
+            self.send_command(command)
+
+        return [command.name for command, _ in commands]
+
+    def pause_output(self, output_name):
+        """
+        Stops sending to an output until `resume_output`
+        """
+        if output_name not in self.outputs:
+            raise KeyError('No output "{}"'.format(output_name))
+
+        self.paused_outputs.add(output_name)
+
+    def resume_output(self, output_name):
+        """
+        Starts sending to a paused output again, bringing it up to date first
+        """
+        if output_name not in self.outputs:
+            raise KeyError('No output "{}"'.format(output_name))
+
+        self.paused_outputs.discard(output_name)
+        self.send_all(force=True, outputs=[output_name])
+
+    def send_command(self, command):
+        """
+        Sends a command's current value to each of its outputs
+        """
+        for output_name, output_params in command.outputs.items():
+            if output_name in self.outputs:
+                self.send_output(output_name, command.current, output_params, command_name=command.name)
+
+    def handle_action_response(self, response, command_name=None):
         """
         Sends appropriate response message to IRC.
-        If an OSC update is needed, also sends the appropriate OSC msg
+        If an OSC update is needed, also sends the appropriate OSC msg.
+        Commands return no response at all when there's nothing to reply or send
         """
-        self.irc_send(response.irc_message)
+        if response is None:
+            return
+
+        if response.irc_message:
+            self.irc_send(response.irc_message)
+
+            if self.tracer is not None and self.tracer.current is not None:
+                self.tracer.mark(self.tracer.current, 'reply')
 
         if response.has_output:
             for output_name, output_params in response.output_params.items():
-                self.outputs[output_name].send(response.value, **output_params)
+                if output_name in self.outputs:
+                    self.send_output(output_name, response.value, output_params, command_name=command_name)
 
     def command_value(self, command):
         """
@@ -238,30 +1032,79 @@ class TransformerClient(AioSimpleIRCClient):
         command_data = self.commands.get(command, None)
         return command_data.current if command_data is not None else None
 
-    def cleanup(self):
-        for output in self.outputs.values():
-            output.cleanup()
+    def output_stats(self):
+        """
+        Returns the stats for every output that keeps them: queue depth and latency
+        for queued outputs, and target health for HTTP outputs
+        """
+        return {
+            output_name: output.stats
+            for output_name, output in self.outputs.items()
+            if hasattr(output, 'stats')
+        }
 
-    def reconnect_checker(self):
+    def profile_stages(self):
         """
-        Checks at a regular interval as to whether the connection to IRC has been
-        disconnected, and re-starts the connection if it has
+        The functions making up each stage of the hot path, by label, for the profiler's
+        report.  Outputs are grouped by class, and only methods an output class defines
+        itself are included.  Queued outputs also include their worker's delivery, and the
+        wrapped output's sends, which run in it
         """
-        if not getattr(self.connection, 'connected', False) and self.autoreconnect:
-            logger.info('Attempting to reconnect to {}:{}'.format(
-                self.connection.server, self.connection.port
-            ))
-            asyncio.ensure_future(
-                self.connect(
-                    self.connection.server,
-                    self.connection.port,
-                    self.connection.nickname,
-                    password=self.connection.password,
-                    username=self.connection.username,
-                    ircname=self.connection.ircname,
-                    is_reconnect=True,
-                ),
-                loop=self.loop
-            )
+        stages = OrderedDict()
+        stages['irc dispatch'] = [self._dispatcher.__code__, self.handle_messages.__code__]
+        stages['parse_command'] = [self.parse_command.__code__]
+        stages['run_action'] = list({type(command).run_action.__code__ for command in self.commands.values()})
 
-        self.loop.call_later(self.reconnect_delay, self.reconnect_checker)
+        output_names = OrderedDict()
+        for name, output in self.outputs.items():
+            output_cls = type(output.output) if isinstance(output, QueuedOutput) else None
+            output_names.setdefault((type(output), output_cls), []).append(name)
+
+        for (output_cls, wrapped_cls), names in output_names.items():
+            codes = self._send_codes(output_cls)
+
+            if wrapped_cls is not None:
+                codes += [QueuedOutput._deliver.__code__] + self._send_codes(wrapped_cls)
+
+            stages['send ({})'.format(', '.join(names))] = codes
+
+        return stages
+
+    def _send_codes(self, output_cls):
+        return [
+            getattr(output_cls, method).__code__
+            for method in ('send', 'send_full', 'send_many', 'flush', '_send')
+            if hasattr(getattr(output_cls, method, None), '__code__')
+            and getattr(output_cls, method) is not getattr(BaseOutput, method, None)
+        ]
+
+    def cleanup(self):
+        self.profiler.stop()
+        self.invalid_action_log.flush()
+        self.dropped_reply_log.flush()
+
+        if self.tracer is not None:
+            self.tracer.close()
+        self.scheduler.stop()
+
+        if self.admin is not None:
+            self.admin.cleanup()
+
+        for input_ in self.inputs.values():
+            input_.cleanup()
+
+        if self.recorder is not None:
+            self.recorder.close()
+
+        for output_name, output in self.outputs.items():
+            self.cleanup_output(output_name, output)
+
+    def cleanup_output(self, output_name, output):
+        """
+        Cleans up an output, logging any error, so one output failing to clean up
+        never stops the others (or shutdown)
+        """
+        try:
+            output.cleanup()
+        except Exception:
+            logger.exception('Error cleaning up output "{}"'.format(output_name))
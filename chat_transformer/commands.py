@@ -3,9 +3,17 @@ from .responses import ActionResponse
 
 class InvalidActionError(Exception):
     """
-    Raised if the action type passed to a Command is not in `allowed_acctions`
+    Raised if the action type passed to a Command is not in `allowed_acctions`.
+    The message is only formatted when it's needed, since invalid actions come
+    straight from chat
     """
-    pass
+    def __init__(self, action, command_name):
+        super().__init__(action, command_name)
+        self.action = action
+        self.command_name = command_name
+
+    def __str__(self):
+        return '"{}" is not a valid action for command "{}"'.format(self.action, self.command_name.upper())
 
 
 class Command:
@@ -18,7 +26,20 @@ class Command:
     third argument for actions that must set a particular value.
 
     running an action should return a CommandResponse object, which will contain a VALUE
+
+    Reply templates (and the responses that never change, like the echo) are compiled
+    once on init, so call `compile_templates` again if `name`, `min` or `max` are changed
+
+    `decay` (units per second) and `reset_after` (seconds without an action) return the
+    value to `initial` over time; they're run by the client's scheduler
     """
+    __slots__ = (
+        'name', 'outputs', 'min', 'max', 'delta', 'initial', 'current', 'echo', 'allowed_actions',
+        'decay', 'reset_after',
+        '_min_template', '_max_template', '_range_template',
+        '_echo_response', '_at_min_response', '_at_max_response', '_invalid_value_response',
+    )
+
     def __init__(
         self,
         name=None,
@@ -30,6 +51,8 @@ class Command:
         outputs={},
         echo='',
         allowed_actions=[],
+        decay=0.0,
+        reset_after=0,
     ):
         if name is None:
             raise ValueError(
@@ -41,27 +64,64 @@ class Command:
         self.min = min
         self.max = max
         self.delta = delta
-        self.initial = initial,
+        self.initial = initial
         self.current = current if current is not None else initial
         self.echo = echo
         self.allowed_actions = allowed_actions
+        self.decay = decay
+        self.reset_after = reset_after
+
+        self.compile_templates()
+
+    def compile_templates(self):
+        """
+        Pre-formats everything in the reply messages except the current value, and
+        builds the responses whose content never changes
+        """
+        name = self.name.upper().replace('{', '{{').replace('}', '}}')
+
+        self._min_template = '{} is at {{}} (Min {})'.format(name, self.min)
+        self._max_template = '{} is at {{}} (Max {})'.format(name, self.max)
+        self._range_template = '{} is at {{}} (Min {}, Max {})'.format(name, self.min, self.max)
+
+        # No reply is needed for a command without an echo
+        self._echo_response = ActionResponse(self.echo) if self.echo else None
+        self._at_min_response = ActionResponse(self._min_template.format(self.format_value(self.min)))
+        self._at_max_response = ActionResponse(self._max_template.format(self.format_value(self.max)))
+        self._invalid_value_response = ActionResponse(self.invalid_value_msg)
 
     def __str__(self):
         return self.name
 
+    def format_value(self, value):
+        """
+        Formats a value for reply messages
+        """
+        return round(value, 3)
+
+    def clamp(self, value):
+        """
+        Restricts a value to min/max
+        """
+        return self.min if value < self.min else self.max if value > self.max else value
+
+    def coerce(self, value):
+        """
+        Converts a value from outside of chat (e.g. JSON) to this command's type
+        """
+        return float(value)
+
     def run_action(self, action=None, value=None):
         """
         Checks action validity and the passes the action to the proper function
         """
         if action is None:
-            return ActionResponse(self.echo)
+            return self._echo_response
 
         action = action.lower()
 
         if action not in self.allowed_actions:
-            raise InvalidActionError(
-                '"{}" is not a valid action for command "{}"'.format(action, self.name.upper())
-            )
+            raise InvalidActionError(action, self.name)
 
         action_func = getattr(
             self, 'run_{}'.format(action), lambda *args, **kwargs: None
@@ -76,7 +136,7 @@ class Command:
         return a valid ActionResponse object
         """
         if self.current == self.max:
-            return ActionResponse(self.max_msg)
+            return self._at_max_response
 
         self.current += self.delta
 
@@ -96,7 +156,7 @@ class Command:
         return a valid CommandResponse object
         """
         if self.current == self.min:
-            return ActionResponse(self.min_msg)
+            return self._at_min_response
 
         self.current -= self.delta
 
@@ -115,8 +175,8 @@ class Command:
         """
         try:
             value = float(value)
-        except (ValueError, TypeError) as e:
-            return ActionResponse(self.invalid_value_msg)
+        except (ValueError, TypeError):
+            return self._invalid_value_response
 
         if value > self.max or value < self.min:
             return ActionResponse(self.get_out_of_bounds_msg(value))
@@ -131,6 +191,22 @@ class Command:
             self.outputs,
         )
 
+    def decay_toward_initial(self, elapsed):
+        """
+        Moves the current value `decay * elapsed` closer to `initial`.  Returns whether
+        the value changed
+        """
+        step = self.decay * elapsed
+
+        if self.current > self.initial:
+            self.current = max(self.initial, self.current - step)
+        elif self.current < self.initial:
+            self.current = min(self.initial, self.current + step)
+        else:
+            return False
+
+        return True
+
     def run_get(self, **kwargs):
         """
         Returns the current value
@@ -146,23 +222,21 @@ class Command:
         """
         Generates message with current value and minimum values for use in ActionResponse objects
         """
-        return "{} is at {} (Min {})".format(self.name.upper(), round(self.current, 3), self.min)
+        return self._min_template.format(self.format_value(self.current))
 
     @property
     def max_msg(self):
         """
         Generates message with current value and maximum values for use in ActionResponse objects
         """
-        return "{} is at {} (Max {})".format(self.name.upper(), round(self.current, 3), self.max)
+        return self._max_template.format(self.format_value(self.current))
 
     @property
     def range_msg(self):
         """
         Generates message with the current value and the min/max values for us in ActionResponse objects
         """
-        return "{} is at {} (Min {}, Max {})".format(
-            self.name.upper(), round(self.current, 3), self.max, self.min
-        )
+        return self._range_template.format(self.format_value(self.current))
 
     @property
     def invalid_value_msg(self):
@@ -181,3 +255,148 @@ class Command:
         return "{} is out of bounds for {} (Min {}, Max {})".format(
            value, self.name.upper(), self.min, self.max
         )
+
+
+def as_vector(value, size, field):
+    """
+    Returns `value` as a tuple of `size` components.  A single number is used
+    for every component
+    """
+    if not isinstance(value, (list, tuple)):
+        return (value,) * size
+
+    if len(value) != size:
+        raise ValueError('"{}" has {} components, expected {}'.format(field, len(value), size))
+
+    return tuple(value)
+
+
+class VectorCommand(Command):
+    """
+    A command whose value is a vector of several components, e.g. an RGB colour, that's
+    sent to each output as a single update.  `min`, `max`, `delta` and `initial` are
+    either per-component lists, or single numbers used for every component.
+
+    Values are set as comma-separated components, e.g. `color set 1,0.5,0`, and
+    increments and decrements apply to every component at once
+    """
+    __slots__ = ('size',)
+
+    def __init__(self, name=None, size=None, min=0.0, max=1.0, delta=0.05, initial=0.0, current=None, **kwargs):
+        if size is None:
+            sizes = [len(value) for value in (min, max, delta, initial) if isinstance(value, (list, tuple))]
+            size = sizes[0] if sizes else 1
+
+        self.size = size
+
+        super().__init__(
+            name=name,
+            min=as_vector(min, size, 'min'),
+            max=as_vector(max, size, 'max'),
+            delta=as_vector(delta, size, 'delta'),
+            initial=as_vector(initial, size, 'initial'),
+            # A current value with the wrong number of components (e.g. carried over
+            # from before `size` was changed) is ignored
+            current=tuple(current) if current is not None and len(current) == size else None,
+            **kwargs
+        )
+
+    def format_value(self, value):
+        return '({})'.format(', '.join(str(round(component, 3)) for component in value))
+
+    def coerce(self, value):
+        if isinstance(value, str):
+            value = value.split(',')
+
+        components = tuple(float(component) for component in value)
+
+        if len(components) != self.size:
+            raise ValueError('"{}" has {} components, expected {}'.format(self.name, len(components), self.size))
+
+        return components
+
+    def clamp(self, values):
+        """
+        Restricts each component to its min/max
+        """
+        return tuple(
+            minimum if value < minimum else maximum if value > maximum else value
+            for value, minimum, maximum in zip(values, self.min, self.max)
+        )
+
+    def parse_value(self, value):
+        """
+        Parses comma-separated components.  Returns None if they aren't valid
+        """
+        try:
+            components = tuple(float(component) for component in value.split(','))
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+        return components if len(components) == self.size else None
+
+    def run_increment(self, **kwargs):
+        if self.current == self.max:
+            return self._at_max_response
+
+        self.current = self.clamp([value + delta for value, delta in zip(self.current, self.delta)])
+
+        return ActionResponse(self.max_msg, self.current, self.outputs)
+
+    def run_decrement(self, **kwargs):
+        if self.current == self.min:
+            return self._at_min_response
+
+        self.current = self.clamp([value - delta for value, delta in zip(self.current, self.delta)])
+
+        return ActionResponse(self.min_msg, self.current, self.outputs)
+
+    def run_set(self, value, **kwargs):
+        components = self.parse_value(value)
+
+        if components is None:
+            return self._invalid_value_response
+
+        if self.clamp(components) != components:
+            return ActionResponse(self.get_out_of_bounds_msg(self.format_value(components)))
+
+        self.current = components
+
+        return ActionResponse(self.range_msg, self.current, self.outputs)
+
+    def decay_toward_initial(self, elapsed):
+        step = self.decay * elapsed
+        current = tuple(
+            max(initial, value - step) if value > initial else min(initial, value + step)
+            for value, initial in zip(self.current, self.initial)
+        )
+
+        if current == self.current:
+            return False
+
+        self.current = current
+        return True
+
+    @property
+    def invalid_value_msg(self):
+        return '"{} set" requires {} comma-separated numbers between {} and {}'.format(
+            self.name.upper(), self.size, self.format_value(self.min), self.format_value(self.max)
+        )
+
+
+COMMAND_TYPES = {
+    'number': Command,
+    'vector': VectorCommand,
+}
+
+
+def command_class(command_type='number'):
+    """
+    Returns the `Command` class for a `type` from the commands file
+    """
+    try:
+        return COMMAND_TYPES[command_type.lower()]
+    except KeyError:
+        raise ValueError('"{}" is not a valid command type. Choose one of: {}'.format(
+            command_type, ', '.join(COMMAND_TYPES)
+        ))
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def split_line(line):
+    """
+    Input lines are either a bare chat message, or a nickname and message
+    separated by a tab.  Returns a `(nickname, message)` pair
+    """
+    nickname, tab, message = line.partition('\t')
+    return (nickname, message) if tab else (None, line)
+
+
+def parse_lines(data, encoding='utf-8'):
+    """
+    Splits a chunk of bytes into `(nickname, message)` pairs, skipping blank lines
+    """
+    return [
+        split_line(line)
+        for line in data.decode(encoding, 'replace').splitlines()
+        if line.strip()
+    ]
+
+
+class LineBufferProtocol(asyncio.Protocol):
+    """
+    Base for stream protocols reading LF-terminated lines.  Partial lines are held
+    until they're complete, but a partial line longer than `max_line_length` bytes
+    is dropped, and the rest of it skipped when it arrives, so a peer that never
+    sends a newline can't grow the buffer without limit
+    """
+    max_line_length = 16384
+
+    buffer = b''
+
+    # Set while skipping the rest of an over-long line
+    discarding = False
+
+    def read_lines(self, data):
+        """
+        Adds `data` to the buffer, and returns every complete line in it as a single
+        chunk, without the final LF (empty if there are none)
+        """
+        lines, newline, self.buffer = (self.buffer + data).rpartition(b'\n')
+
+        if self.discarding and newline:
+            _, _, lines = lines.partition(b'\n')
+            self.discarding = False
+
+        if len(self.buffer) > self.max_line_length:
+            if not self.discarding:
+                self.line_too_long()
+
+            self.buffer = b''
+            self.discarding = True
+
+        return lines
+
+    def line_too_long(self):
+        logger.warning('Dropping a line longer than {} bytes'.format(self.max_line_length))
+
+
+class LineProtocol(LineBufferProtocol):
+    """
+    Protocol for line-delimited stream inputs.  Every complete line from a single
+    read is delivered as one batch
+    """
+    def __init__(self, deliver, encoding='utf-8'):
+        self.deliver = deliver
+        self.encoding = encoding
+        self.buffer = b''
+
+    def data_received(self, data):
+        data = self.read_lines(data)
+
+        if data:
+            messages = parse_lines(data, self.encoding)
+            if messages:
+                self.deliver(messages)
+
+    def eof_received(self):
+        if self.buffer:
+            self.data_received(b'\n')
+
+
+class BaseInput:
+    """
+    Alternative sources of chat messages, besides IRC.  Inputs hand batches of
+    `(nickname, message)` pairs (nickname may be None) to the `deliver` callback
+    passed to `start`, which feeds them through the same parsing as IRC messages
+    """
+    def __init__(self, loop=None):
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+    async def start(self, deliver):
+        """
+        Begin receiving messages.  Required for all possible inputs
+        """
+        raise NotImplementedError
+
+    def cleanup(self):
+        """
+        Hook for closing any servers, files or connections on shutdown
+        """
+        pass
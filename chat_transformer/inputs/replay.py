@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from itertools import islice
+
+from .base import BaseInput
+from ..recorder import INBOUND, RECORDING_SUFFIX, read_recording
+
+logger = logging.getLogger(__name__)
+
+
+def parse_record(line):
+    """
+    Replay files hold one message per line, in the form of:
+
+        TIMESTAMP<TAB>MESSAGE
+
+    or
+
+        TIMESTAMP<TAB>NICKNAME<TAB>MESSAGE
+
+    Returns `(timestamp, nickname, message)`, or None for lines that can't be parsed
+    """
+    parts = line.rstrip('\r\n').split('\t', 2)
+
+    try:
+        timestamp = float(parts[0])
+    except ValueError:
+        return None
+
+    if len(parts) == 2:
+        return timestamp, None, parts[1]
+    elif len(parts) == 3:
+        return timestamp, parts[1], parts[2]
+
+    return None
+
+
+class ReplayInput(BaseInput):
+    """
+    Replays a file of timestamped chat messages, keeping the original timing
+    scaled by `speed` (2.0 replays twice as fast).  A `speed` of 0 replays as
+    fast as possible.  The file is read `chunk_size` messages at a time in a
+    thread, and messages that are due together are delivered as one batch.
+
+    Recordings made by the `Recorder` (`.rec.gz` files) can be replayed too, in
+    which case their inbound chat messages are replayed
+    """
+    def __init__(self, filename='replay.log', speed=1.0, chunk_size=1000, encoding='utf-8', loop=None):
+        super().__init__(loop=loop)
+        self.filename = filename
+        self.speed = speed
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.task = None
+        self.replayed = 0
+
+    async def start(self, deliver):
+        self.task = asyncio.ensure_future(self.replay(deliver), loop=self.loop)
+
+    def read_records(self):
+        """
+        Yields `(timestamp, nickname, message)` for every message in the file
+        """
+        if self.filename.endswith(RECORDING_SUFFIX):
+            for record in read_recording(self.filename):
+                if record.kind == INBOUND:
+                    nickname, message = record.fields
+                    yield record.timestamp, nickname or None, message
+            return
+
+        with open(self.filename, encoding=self.encoding) as replay_file:
+            for line in replay_file:
+                record = parse_record(line)
+
+                if record is not None:
+                    yield record
+
+    async def replay(self, deliver):
+        """
+        Reads through the file, delivering each message when it's due
+        """
+        records = self.read_records()
+        started_at = self.loop.time()
+        first_timestamp = None
+        batch = []
+
+        while True:
+            chunk = await self.loop.run_in_executor(None, lambda: list(islice(records, self.chunk_size)))
+
+            if not chunk:
+                break
+
+            for timestamp, nickname, message in chunk:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+
+                if self.speed:
+                    wait = started_at + (timestamp - first_timestamp) / self.speed - self.loop.time()
+
+                    if wait > 0:
+                        self.deliver_batch(deliver, batch)
+                        batch = []
+                        await asyncio.sleep(wait)
+
+                batch.append((nickname, message))
+
+            self.deliver_batch(deliver, batch)
+            batch = []
+
+        logger.info('Finished replaying {} messages from {}'.format(self.replayed, self.filename))
+
+    def deliver_batch(self, deliver, batch):
+        if batch:
+            self.replayed += len(batch)
+            deliver(batch)
+
+    def cleanup(self):
+        if self.task is not None:
+            self.task.cancel()
@@ -0,0 +1,22 @@
+import sys
+
+from .base import BaseInput, LineProtocol
+
+
+class StdinInput(BaseInput):
+    """
+    Reads line-delimited chat messages from standard input
+    """
+    def __init__(self, encoding='utf-8', loop=None):
+        super().__init__(loop=loop)
+        self.encoding = encoding
+        self.transport = None
+
+    async def start(self, deliver):
+        self.transport, _ = await self.loop.connect_read_pipe(
+            lambda: LineProtocol(deliver, self.encoding), sys.stdin
+        )
+
+    def cleanup(self):
+        if self.transport is not None:
+            self.transport.close()
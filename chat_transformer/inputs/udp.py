@@ -0,0 +1,42 @@
+import asyncio
+import logging
+
+from .base import BaseInput, parse_lines
+
+logger = logging.getLogger(__name__)
+
+
+class UDPInputProtocol(asyncio.DatagramProtocol):
+    def __init__(self, deliver, encoding='utf-8'):
+        self.deliver = deliver
+        self.encoding = encoding
+
+    def datagram_received(self, data, addr):
+        messages = parse_lines(data, self.encoding)
+        if messages:
+            self.deliver(messages)
+
+    def error_received(self, exc):
+        logger.error('Protocol Error: {}'.format(exc))
+
+
+class UDPInput(BaseInput):
+    """
+    Receives chat messages as UDP datagrams, each holding one or more lines
+    """
+    def __init__(self, ip='127.0.0.1', port=6790, encoding='utf-8', loop=None):
+        super().__init__(loop=loop)
+        self.ip = ip
+        self.port = port
+        self.encoding = encoding
+        self.transport = None
+
+    async def start(self, deliver):
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: UDPInputProtocol(deliver, self.encoding), local_addr=(self.ip, self.port)
+        )
+        logger.info('Listening for input on {}:{}'.format(self.ip, self.port))
+
+    def cleanup(self):
+        if self.transport is not None:
+            self.transport.close()
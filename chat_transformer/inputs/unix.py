@@ -0,0 +1,34 @@
+import logging
+
+from ..utils import create_private_unix_server, remove_socket
+from .base import BaseInput, LineProtocol
+
+logger = logging.getLogger(__name__)
+
+
+class UnixSocketInput(BaseInput):
+    """
+    Listens on a Unix socket for line-delimited chat messages, e.g. from a
+    local bot, or a relay from other chat platforms.  The socket is only accessible
+    to the current user (see `create_private_unix_server`)
+    """
+    def __init__(self, path='chat_transformer.sock', encoding='utf-8', loop=None):
+        super().__init__(loop=loop)
+        self.path = path
+        self.encoding = encoding
+        self.server = None
+
+    async def start(self, deliver):
+        self.server = await create_private_unix_server(
+            self.loop, lambda: LineProtocol(deliver, self.encoding), self.path
+        )
+        logger.info('Listening for input on {}'.format(self.path))
+
+    def cleanup(self):
+        if self.server is not None:
+            self.server.close()
+
+        try:
+            remove_socket(self.path)
+        except FileExistsError as error:
+            logger.warning('Not removing input socket: {}'.format(error))
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+
+from .inputs.base import LineBufferProtocol
+
+logger = logging.getLogger(__name__)
+
+
+def parse_line(line):
+    """
+    Minimal IRC line parser.  Returns `(prefix, command, params)`, where `params` is
+    the raw remainder of the line, leaving any further parsing to the caller.
+    IRCv3 message tags are skipped
+    """
+    if line.startswith('@'):
+        _, _, line = line.partition(' ')
+
+    prefix = ''
+    if line.startswith(':'):
+        prefix, _, line = line[1:].partition(' ')
+
+    command, _, params = line.partition(' ')
+    return prefix, command, params
+
+
+class LeanIRCProtocol(LineBufferProtocol):
+    """
+    Bare-bones asyncio IRC protocol.  Only PING, PRIVMSG and the welcome numeric are
+    handled; everything else is dropped without being parsed further.  All the chat
+    messages from a single socket read are passed on as one batch.
+
+    Lines end in LF, with or without a CR before it.  A partial line longer than
+    `max_line_length` bytes (far more than IRC allows, tags included) is dropped
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        received = time.monotonic()
+        lines = self.read_lines(data).split(b'\n')
+
+        messages = []
+        for line in lines:
+            if line.endswith(b'\r'):
+                line = line[:-1]
+
+            if not line:
+                continue
+
+            if line.startswith(b'PING'):
+                self.transport.write(b'PONG' + line[4:] + b'\r\n')
+                continue
+
+            prefix, command, params = parse_line(line.decode('utf-8', 'replace'))
+
+            if command == 'PRIVMSG':
+                _, _, text = params.partition(' :')
+                messages.append((prefix.partition('!')[0], text))
+            elif command == '001':
+                self.connection.on_welcome()
+            elif command == '433':
+                logger.error('Nickname "{}" is already in use'.format(self.connection.nickname))
+
+        if messages:
+            self.connection.on_messages(messages, received)
+
+    def line_too_long(self):
+        logger.warning('Dropping an IRC line longer than {} bytes'.format(self.max_line_length))
+
+    def connection_lost(self, exc):
+        self.connection.on_connection_lost(exc)
+
+
+class LeanIRCConnection:
+    """
+    Drop-in replacement for the `irc` library's server connection, as far as
+    `TransformerClient` is concerned, using `LeanIRCProtocol`.  Incoming chat is fed
+    straight to the client's `handle_messages`, skipping the `irc` reactor and its
+    event dispatch entirely
+    """
+    protocol_class = LeanIRCProtocol
+
+    def __init__(self, client, loop=None):
+        self.client = client
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.connected = False
+        self.transport = None
+        self.server = None
+        self.port = None
+        self.nickname = None
+
+    async def connect(self, server, port, nickname, password=None, username=None, ircname=None):
+        """
+        Connect to the IRC server and log on
+        """
+        if self.connected:
+            self.disconnect('Changing servers')
+
+        self.server = server
+        self.port = port
+        self.nickname = nickname
+        self.password = password
+        self.username = username or nickname
+        self.ircname = ircname or nickname
+
+        self.transport, _ = await self.loop.create_connection(
+            lambda: self.protocol_class(self), server, port
+        )
+        self.connected = True
+
+        if self.password:
+            self.send_raw('PASS {}'.format(self.password))
+        self.send_raw('NICK {}'.format(self.nickname))
+        self.send_raw('USER {} 0 * :{}'.format(self.username, self.ircname))
+
+        return self
+
+    def send_raw(self, string):
+        """
+        Send a raw line to the server, stripping any line breaks
+        """
+        if not self.connected:
+            logger.error('Not connected, dropped "{}"'.format(string))
+            return
+
+        line = string.replace('\r', ' ').replace('\n', ' ')
+        self.transport.write(line.encode('utf-8') + b'\r\n')
+
+    def join(self, channel, key=''):
+        self.send_raw('JOIN {}{}'.format(channel, ' ' + key if key else ''))
+
+    def privmsg(self, target, text):
+        self.send_raw('PRIVMSG {} :{}'.format(target, text))
+
+    def disconnect(self, message=''):
+        """
+        Quit and close the connection
+        """
+        if not self.connected:
+            return
+
+        self.send_raw('QUIT :{}'.format(message))
+        self.connected = False
+        self.transport.close()
+
+    def on_welcome(self):
+        self.client.on_welcome(self, None)
+
+    def on_messages(self, messages, received=None):
+        self.client.handle_messages(messages, received)
+
+    def on_connection_lost(self, exc):
+        was_connected = self.connected
+        self.connected = False
+
+        if was_connected:
+            self.client.on_disconnect(self, None)
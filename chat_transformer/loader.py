@@ -0,0 +1,30 @@
+import json
+import os
+
+
+def file_signature(filename):
+    """
+    Modification time and size of a file, which change whenever its contents do
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_commands_file(filename):
+    """
+    Reads and validates a commands file.  Returns its signature (see `file_signature`)
+    and the parsed commands.  Raises `ValueError` if it isn't valid
+    """
+    signature = file_signature(filename)
+
+    with open(filename) as commands_file:
+        commands = json.loads(commands_file.read())
+
+    if not isinstance(commands, dict):
+        raise ValueError('{} must contain a JSON object of commands'.format(filename))
+
+    for name, command in commands.items():
+        if not isinstance(command, dict):
+            raise ValueError('Command "{}" in {} must be a JSON object'.format(name, filename))
+
+    return signature, commands
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+
+
+class LazyMessage:
+    """
+    Log message that's only formatted (with `str.format`) if it's actually emitted
+    """
+    __slots__ = ('template', 'args')
+
+    def __init__(self, template, *args):
+        self.template = template
+        self.args = args
+
+    def __str__(self):
+        return self.template.format(*self.args)
+
+
+class RateLimitedLog:
+    """
+    Logs from a single call site, for messages that can come at the rate of chat or
+    output traffic (e.g. invalid commands, or failed sends).
+
+    At most `rate` messages a second are logged at `level`, after an initial burst of
+    up to `burst`.  Past that, only every `sample`th message is (none, if `sample` is
+    0), and once `summary_interval` seconds have passed since the first one dropped,
+    a summary of how many were suppressed is logged instead, with the latest of them.
+
+    Messages are `str.format` templates and arguments, which are only formatted if
+    the message is logged, and nothing is done at all if `logger` isn't enabled for
+    `level`
+    """
+    def __init__(
+        self,
+        logger,
+        level=logging.ERROR,
+        rate=1.0,
+        burst=10,
+        sample=0,
+        summary_interval=10.0,
+        clock=time.monotonic,
+        loop=None,
+    ):
+        self.logger = logger
+        self.level = level
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self.summary_interval = summary_interval
+        self.clock = clock
+        self.loop = loop
+
+        self.tokens = burst
+        self.updated = None
+        self.suppressed = 0
+        self.latest = None
+        self._limited = 0
+        self._summary = None
+
+    def __call__(self, template, *args):
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        now = self.clock()
+
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.logger.log(self.level, LazyMessage(template, *args))
+            return
+
+        self._limited += 1
+
+        if self.sample and self._limited % self.sample == 0:
+            self.logger.log(self.level, LazyMessage(template, *args))
+            return
+
+        self.suppressed += 1
+        self.latest = (template, args)
+
+        if self._summary is None:
+            self.schedule_summary()
+
+    def schedule_summary(self):
+        try:
+            loop = self.loop if self.loop is not None else asyncio.get_event_loop()
+            self._summary = loop.call_later(self.summary_interval, self.flush)
+        except RuntimeError:
+            # No (open) loop to run on: the summary waits for `flush`
+            self._summary = True
+
+    def flush(self):
+        """
+        Logs a summary of the messages suppressed since the last one, if any were
+        """
+        if self._summary is not None and self._summary is not True:
+            self._summary.cancel()
+
+        self._summary = None
+        self._limited = 0
+
+        if not self.suppressed:
+            return
+
+        template, args = self.latest
+        self.logger.log(self.level, LazyMessage(
+            'Suppressed {} similar message(s), the latest: {}', self.suppressed, LazyMessage(template, *args)
+        ))
+        self.suppressed = 0
+        self.latest = None
@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+import time
+
+from ..utils import class_from_string
+
+AUTH_CLASSES = {
+    'jwt': 'chat_transformer.outputs.auth.JWTAuth',
+    'bearer': 'chat_transformer.outputs.auth.BearerAuth',
+    'hmac': 'chat_transformer.outputs.auth.HMACAuth',
+}
+
+
+def auth_from_config(config):
+    """
+    Builds an auth provider from its config: a `class` key (one of `AUTH_CLASSES`, or
+    the import string of a custom provider), plus the provider's own options
+    """
+    config = dict(config)
+    cls = config.pop('class', 'bearer')
+    return class_from_string(AUTH_CLASSES.get(cls, cls))(**config)
+
+
+class BaseAuth:
+    """
+    Auth providers supply the headers that authenticate each HTTP request.
+
+    `needs_body` providers (e.g. request signing) are passed the encoded request
+    body; others are passed `None`, and should return the same headers mapping for
+    as long as it stays valid, so callers can cache anything built from it
+    """
+    needs_body = False
+
+    def get_headers(self, body=None):
+        return {}
+
+
+class BearerAuth(BaseAuth):
+    """
+    A static bearer token
+    """
+    def __init__(self, token=''):
+        self.headers = {'Authorization': 'Bearer {}'.format(token)}
+
+    def get_headers(self, body=None):
+        return self.headers
+
+
+class JWTAuth(BaseAuth):
+    """
+    HS256-signed JWT bearer tokens, valid for `token_length` seconds.  One token is
+    reused for all requests until `refresh_margin` (a fraction of `token_length`)
+    before it expires, when a new one is signed
+    """
+    def __init__(self, secret='', token_length=30, refresh_margin=0.2):
+        self.secret = secret
+        self.token_length = token_length
+        self.refresh_margin = refresh_margin
+
+        self.headers = None
+        self.refresh_at = 0
+
+    def get_headers(self, body=None):
+        current = time.time()
+
+        if self.headers is None or current >= self.refresh_at:
+            self.refresh(current)
+
+        return self.headers
+
+    def refresh(self, current):
+        import jwt
+
+        issued = int(current)
+        token = jwt.encode({'exp': issued + self.token_length}, self.secret, algorithm='HS256')
+
+        if isinstance(token, bytes):
+            token = token.decode('utf-8')
+
+        self.headers = {'Authorization': 'Bearer {}'.format(token)}
+        self.refresh_at = issued + self.token_length * (1 - self.refresh_margin)
+
+
+class HMACAuth(BaseAuth):
+    """
+    Signs each request with an HMAC of its timestamp and body, as
+    `hex(HMAC(secret, "<timestamp>.<body>"))`
+    """
+    needs_body = True
+
+    def __init__(
+        self,
+        secret='',
+        algorithm='sha256',
+        signature_header='X-Signature',
+        timestamp_header='X-Timestamp',
+    ):
+        self.secret = secret.encode('utf-8')
+        self.digest = getattr(hashlib, algorithm)
+        self.signature_header = signature_header
+        self.timestamp_header = timestamp_header
+
+    def get_headers(self, body=None):
+        timestamp = str(int(time.time()))
+        signature = hmac.new(
+            self.secret, timestamp.encode('utf-8') + b'.' + (body or b''), self.digest
+        ).hexdigest()
+
+        return {
+            self.signature_header: signature,
+            self.timestamp_header: timestamp,
+        }
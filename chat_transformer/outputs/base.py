@@ -1,4 +1,21 @@
+from collections import namedtuple
+
+
+# A single value bound for an output.  `full` marks load/reload updates,
+# which are passed to `send_full` rather than `send`
+OutputUpdate = namedtuple('OutputUpdate', ['value', 'params', 'full'])
+
+
 class BaseOutput:
+    # Outputs that can do something useful with several updates at once
+    # (e.g. bundle or coalesce them) set this to True, and are handed
+    # batches through `send_many` and `flush` instead of individual `send` calls
+    batching = False
+
+    # Set by the client when tracing is on (see `chat_transformer.tracing`), for
+    # outputs that finish sending in the background to time their sends
+    tracer = None
+
     @classmethod
     def initialize(cls, *args, **kwargs):
         """
@@ -25,6 +42,24 @@ class BaseOutput:
         """
         self.send(value, **kwargs)
 
+    async def send_many(self, updates):
+        """
+        Send a batch of `OutputUpdate`s.  The default adapter passes each update to
+        `send`/`send_full` in turn, so existing outputs work unchanged
+        """
+        for update in updates:
+            if update.full:
+                self.send_full(update.value, **update.params)
+            else:
+                self.send(update.value, **update.params)
+
+    async def flush(self):
+        """
+        Called after each batch.  Outputs that buffer updates in `send_many`
+        should write them out here
+        """
+        pass
+
     def cleanup(self):
         """
         Hook for adding any necessary shutdown/connection close mechanisms
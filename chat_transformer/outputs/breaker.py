@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a single target.  After `failure_threshold` failures in a
+    row the breaker opens, and nothing is sent to the target for `reset_timeout`
+    seconds.  After that it's half-open: a single trial send is let through, which
+    closes the breaker again if it succeeds, or re-opens it if it fails.
+
+    While the breaker isn't closed, the latest value for each key is kept (up to
+    `cache_size` keys), to be sent once the target recovers
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, cache_size=100, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache_size = cache_size
+        self.clock = clock
+
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_pending = False
+        self.cache = OrderedDict()
+
+        self.times_opened = 0
+        self.dropped = 0
+
+    @property
+    def state(self):
+        if self._state == OPEN and self.clock() >= self.opened_at + self.reset_timeout:
+            self._state = HALF_OPEN
+            self.trial_pending = False
+
+        return self._state
+
+    def allow(self):
+        """
+        Whether a send should go ahead.  While half-open, only the first send is allowed
+        """
+        state = self.state
+
+        if state == CLOSED:
+            return True
+
+        if state == HALF_OPEN and not self.trial_pending:
+            self.trial_pending = True
+            return True
+
+        return False
+
+    def record_success(self):
+        """
+        Closes the breaker.  Returns the cached values to catch up on (if the breaker
+        wasn't already closed)
+        """
+        self.failures = 0
+        self.trial_pending = False
+
+        if self._state == CLOSED:
+            return []
+
+        self._state = CLOSED
+        cached, self.cache = list(self.cache.values()), OrderedDict()
+        return cached
+
+    def record_failure(self):
+        """
+        Returns True if this failure opened the breaker
+        """
+        self.failures += 1
+        self.trial_pending = False
+
+        if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+            self._state = OPEN
+            self.opened_at = self.clock()
+            self.times_opened += 1
+            return True
+
+        return False
+
+    def cache_value(self, key, value):
+        """
+        Keep only the latest `value` for `key` until the target recovers
+        """
+        self.cache.pop(key, None)
+        self.cache[key] = value
+
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+            self.dropped += 1
+
+    def discard(self, key):
+        """
+        Forget the cached value for `key`, once a newer value has been sent
+        """
+        self.cache.pop(key, None)
+
+    @property
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'times_opened': self.times_opened,
+            'cached': len(self.cache),
+            'dropped': self.dropped,
+        }
@@ -1,16 +1,82 @@
 import asyncio
+import inspect
+import json
 import logging
-import time
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
-import jwt
 
-from .base import BaseOutput
+from ..logs import RateLimitedLog
+from .auth import JWTAuth, auth_from_config
+from .base import BaseOutput, OutputUpdate
+from .breaker import CLOSED, OPEN, CircuitBreaker
+from .spool import Spool
 
 logger = logging.getLogger(__name__)
 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Spools in use, by absolute path: the spool, its writer thread, and the outputs using it
+SHARED_SPOOLS = {}
+
+
+def get_json_encoder(name='auto'):
+    """
+    Returns a function encoding an object to compact JSON bytes.  Uses orjson if
+    it's installed (and `name` is "auto" or "orjson"), otherwise the standard
+    library's `json`, with the same output
+    """
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+        except ImportError:
+            if name == 'orjson':
+                logger.warning('orjson is not installed, falling back to the json module')
+        else:
+            def encode(obj):
+                return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+            return encode
+
+    def encode(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    return encode
+
+
+def takes_argument(func):
+    """
+    Whether `func` can be called with a positional argument
+    """
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return True
+
+    return any(
+        parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD, parameter.VAR_POSITIONAL)
+        for parameter in parameters
+    )
+
+
+def full_params(params):
+    """
+    The params sent with a full (load/reload) update: the command, endpoint and range
+    """
+    return {
+        'command_name': params.get('command_name', ''),
+        'endpoint': params.get('endpoint', ''),
+        'min': params.get('min', 0.0),
+        'max': params.get('max', 1.0),
+    }
+
 
 class HTTPOutput(BaseOutput):
+    batching = True
+
     def __init__(
         self,
         base_url='http://localhost:8000/',
@@ -18,80 +84,512 @@ class HTTPOutput(BaseOutput):
         loop=None,
         jwt_secret='',
         jwt_token_length=30,
+        auth=None,
+        json_encoder='auto',
+        timeout=10.0,
+        breaker={},
+        breaker_scope='base_url',
+        spool=None,
+        log_limits=None,
     ):
         self.base_url = base_url
         self.headers = headers
         self.jwt_secret = jwt_secret
         self.jwt_token_length = jwt_token_length
         self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.session = None
+
+        if auth is not None:
+            self.auth = auth_from_config(auth)
+        elif jwt_secret:
+            self.auth = JWTAuth(jwt_secret, token_length=jwt_token_length)
+        else:
+            self.auth = None
+
+        self._auth_headers = None
+        self._headers = headers
+        self._last_headers = None
+        self._request_headers = None
+
+        # Overrides of `get_headers` from before it was passed the body still work
+        self._headers_take_body = takes_argument(self.get_headers)
+
+        self.encode = get_json_encoder(json_encoder)
+        self._templates = {}
+
+        self.timeout = timeout
+        self.breaker_config = breaker
+        self.breaker_scope = breaker_scope
+        self.breakers = {}
 
-        asyncio.ensure_future(self.initialize_session())
+        if spool is not None:
+            spool = dict(spool)
+            self.replay_rate = spool.pop('replay_rate', 50.0)
+            self.open_spool(**spool)
+            self._spool_writes = 0
+        else:
+            self.spool = None
 
-    def get_headers(self):
+        self._draining = None
+
+        self._replay = None
+        self._replaying = OrderedDict()
+
+        # Timers for the trial send to each open breaker's target, so it recovers
+        # without waiting for new sends
+        self._probes = {}
+
+        # Requests sent since their command's last spooled request was written, whose
+        # spooled requests are older, and mustn't be replayed over them
+        self._sent_live = set()
+
+        # A failing target fails every send, so errors for single sends are rate limited
+        log_limits = log_limits or {}
+        self.error_log = RateLimitedLog(logger, logging.ERROR, loop=self.loop, **log_limits)
+        self.rejected_log = RateLimitedLog(logger, logging.ERROR, loop=self.loop, **log_limits)
+
+    def open_spool(self, path='http-spool', **options):
         """
-        Hook for dynamic headers.  Primarily used for JWT tokens currently,
-        but can be overridden for custom behavior
+        Opens the spool at `path`, and its writer thread: spool reads and writes (and
+        compactions) run off the loop, in order, in that single thread.
+
+        Outputs spooling to the same path (e.g. an output and its replacement, while a
+        reload connects it) share one spool and writer thread, so that neither drains
+        or removes segments from under the other.  The latest output's limits apply
         """
-        headers = self.headers
+        key = os.path.abspath(path)
+        shared = SHARED_SPOOLS.get(key)
+
+        if shared is None:
+            shared = SHARED_SPOOLS[key] = (Spool(path, **options), ThreadPoolExecutor(max_workers=1), [])
+        else:
+            for name, value in options.items():
+                setattr(shared[0], name, value)
 
-        if self.jwt_secret:
-            current = int(time.time())
-            params = {'exp': current + self.jwt_token_length}
-            token = jwt.encode(params, self.jwt_secret, algorithm='HS256')
-            headers = {
-                **headers,
-                'Authorization': 'Bearer {}'.format(token.decode('utf-8')),
-            }
+        self.spool, self._spool_executor, self._spool_users = shared
+        self._spool_key = key
+        self._spool_users.append(self)
 
-        return headers
+    def get_headers(self, body=None):
+        """
+        Hook for dynamic headers.  Adds the auth provider's headers (if any) to the
+        static ones, reusing the merged headers for as long as the provider does.
+        `body` is the encoded request body, which is only passed on to `needs_body`
+        providers (e.g. ones that sign it).  Overrides can leave it out
+        """
+        if self.auth is None:
+            return self.headers
+
+        auth_headers = self.auth.get_headers(body if self.auth.needs_body else None)
+
+        if auth_headers is not self._auth_headers:
+            self._auth_headers = auth_headers
+            self._headers = {**self.headers, **auth_headers}
+
+        return self._headers
+
+    async def connect(self):
+        """
+        Create the session up front, so it's ready before the first send.  Anything
+        spooled by a previous run is replayed
+        """
+        await self.initialize_session()
+
+        if self.spool is not None and not self.spool.empty:
+            self.start_replay()
 
     async def initialize_session(self):
-        self.session = aiohttp.ClientSession()
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
 
     def send(self, value, command_name='', endpoint='', **kwargs):
         """
-        POST the data to the target endpoint
+        POST the data to the target endpoint, in the background
+        """
+        url, body = self.encode_body(value, command_name, endpoint, kwargs)
+        asyncio.ensure_future(self.post(url, body, command_name, value))
+
+    def post(self, url, body, command_name, value):
+        """
+        Returns a coroutine making the request, timed for the current trace if there is one
+        """
+        trace = self.tracer.current if self.tracer is not None else None
+
+        if trace is None:
+            return self._send(url, body, command_name, value)
+
+        self.tracer.hold(trace)
+        return self._traced_send(trace, url, body, command_name, value)
+
+    async def _traced_send(self, trace, url, body, command_name, value):
+        """
+        `_send`, timing the request for the message's trace
+        """
+        start = self.tracer.clock()
+
+        try:
+            await self._send(url, body, command_name, value)
+        finally:
+            self.tracer.span(trace, 'http', start, self.tracer.clock(), {'url': url})
+            self.tracer.release(trace)
+
+    def encode_body(self, value, command_name, endpoint, params):
+        """
+        Returns the URL and the encoded JSON body for a send.  Everything but the value
+        is the same from one send to the next for a given command, so it's encoded
+        once into a template, and only the value is encoded on each send
         """
-        data = {
-            'value': value,
-            'name': command_name,
-            **kwargs,
-        }
+        try:
+            key = (command_name, endpoint, tuple(params.items()))
+            template = self._templates.get(key)
+        except TypeError:
+            # Unhashable params can't be cached
+            key = template = None
+
+        if template is None:
+            static = self.encode({'name': command_name, **params})
+            template = (self.base_url + endpoint, b',' + static[1:])
+
+            if key is not None:
+                self._templates[key] = template
+
+        url, tail = template
 
-        url = self.base_url + endpoint
+        # repr of a finite float is already valid JSON, and much quicker to get
+        if type(value) is float and math.isfinite(value):
+            encoded = repr(value).encode('ascii')
+        else:
+            encoded = self.encode(value)
 
-        asyncio.ensure_future(self._send(url, data))
+        return url, b'{"value":' + encoded + tail
 
-    async def _send(self, url, data):
+    async def send_many(self, updates):
         """
-        Posts to target. Avoids using aiohttp context manager for easier testing
+        Coalesce the batch down to the latest value for each command/endpoint pair,
+        so a burst of updates to one command becomes a single POST.  Unlike `send`,
+        returns once every request has completed (or failed), so a queue in front of
+        the output sees their latency and errors
         """
-        r = await self.session.post(url, json=data, headers=self.get_headers())
+        latest = OrderedDict()
+
+        for update in updates:
+            key = (update.params.get('endpoint', ''), update.params.get('command_name', ''))
+            previous = latest.get(key)
+
+            if previous is not None:
+                update = OutputUpdate(
+                    update.value, {**previous.params, **update.params}, previous.full or update.full
+                )
+
+            latest[key] = update
+
+        requests = []
+        for update in latest.values():
+            params = full_params(update.params) if update.full else dict(update.params)
+            command_name, endpoint = params.pop('command_name', ''), params.pop('endpoint', '')
+            url, body = self.encode_body(update.value, command_name, endpoint, params)
+            requests.append(self.post(url, body, command_name, update.value))
+
+        await asyncio.gather(*requests)
+
+    def breaker_for(self, url):
+        """
+        The circuit breaker for `url`: one per endpoint URL, or one shared by every
+        endpoint if `breaker_scope` is "base_url".  None if breakers are turned off
+        """
+        if self.breaker_config is None:
+            return None
+
+        target = self.base_url if self.breaker_scope == 'base_url' else url
+        breaker = self.breakers.get(target)
+
+        if breaker is None:
+            breaker = self.breakers[target] = CircuitBreaker(**self.breaker_config)
+
+        return breaker
+
+    async def _send(self, url, body, command_name='', value=None):
+        """
+        Posts to target. Avoids using aiohttp context manager for easier testing.
+
+        Connection errors and server errors count as failures for the target's circuit
+        breaker.  While the breaker is open, requests are deferred (see `defer`) instead
+        of sent, and sent once the target recovers
+        """
+        try:
+            headers = self.request_headers(body)
+        except Exception as e:
+            self.error_log('Error building headers to post {} value of {} to {}: {}', command_name, value, url, e)
+            return
+
+        breaker = self.breaker_for(url)
+
+        if breaker is not None:
+            if not breaker.allow():
+                self.defer(breaker, url, body, command_name, value)
+                return
+
+            # Anything deferred for this command is older than what's being sent now
+            breaker.discard((url, command_name))
+            self._replaying.pop((url, command_name), None)
+
+            if self.spool is not None:
+                self._sent_live.add((url, command_name))
+
+        await self.initialize_session()
+
+        try:
+            r = await self.session.post(url, data=body, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            self.on_failure(breaker, url, body, command_name, value, e)
+            return
 
         if r.status < 200 or r.status >= 300:
             text = await r.text()
-            logger.error(
-                'Error posting {} value of {} to {}: {} '.format(
-                    data['name'], data['value'], url, text
-                )
-            )
+
+            if r.status >= 500:
+                self.on_failure(breaker, url, body, command_name, value, text)
+            else:
+                # The target is up, it just didn't like the request
+                self.on_success(breaker, url)
+                self.rejected_log('Error posting {} value of {} to {}: {} ', command_name, value, url, text)
+        else:
+            self.on_success(breaker, url)
 
         r.release()
 
+    def on_failure(self, breaker, url, body, command_name, value, error):
+        if breaker is None:
+            self.error_log('Error posting {} value of {} to {}: {} ', command_name, value, url, error)
+            return
+
+        if breaker.record_failure():
+            logger.error('{} is failing ({}), pausing sends for {}s'.format(url, error, breaker.reset_timeout))
+            self.schedule_probe(breaker, breaker.reset_timeout)
+        elif breaker.state == CLOSED:
+            self.error_log('Error posting {} value of {} to {}: {} ', command_name, value, url, error)
+
+        if breaker.state != CLOSED:
+            self.defer(breaker, url, body, command_name, value)
+
+    def defer(self, breaker, url, body, command_name, value):
+        """
+        Hold on to a request while its target is down: in the spool, if there is one,
+        otherwise in the breaker's latest-value cache
+        """
+        if self.spool is not None:
+            self.spool_append(url, command_name, body)
+            self._sent_live.discard((url, command_name))
+        else:
+            breaker.cache_value((url, command_name), (url, body, command_name, value))
+
+    def spool_call(self, func, *args):
+        """
+        Runs `func` (a spool method) in the spool's writer thread, after everything
+        already handed to it.  Returns an asyncio future for the result
+        """
+        return self.loop.run_in_executor(self._spool_executor, func, *args)
+
+    def spool_append(self, url, command_name, body):
+        self._spool_writes += 1
+        self.spool_call(self.spool.append, url, command_name, body).add_done_callback(self._spool_appended)
+
+    def _spool_appended(self, future):
+        self._spool_writes -= 1
+
+        if not future.cancelled() and future.exception() is not None:
+            self.error_log('Error writing to the HTTP spool: {}', future.exception())
+
+    def schedule_probe(self, breaker, delay):
+        previous = self._probes.get(breaker)
+
+        if previous is not None:
+            previous.cancel()
+
+        self._probes[breaker] = self.loop.call_later(delay, self._probe, breaker)
+
+    def _probe(self, breaker):
+        """
+        Once an open breaker's `reset_timeout` is up, sends something deferred for its
+        target as the half-open trial: the spool is replayed, or one of the breaker's
+        cached values sent.  If the trial fails, the breaker re-opens and schedules
+        another probe
+        """
+        self._probes.pop(breaker, None)
+        state = breaker.state
+
+        if state == OPEN:
+            # The loop's timer ran slightly ahead of the breaker's clock
+            self.schedule_probe(breaker, max(breaker.opened_at + breaker.reset_timeout - breaker.clock(), 0.001))
+            return
+
+        if state == CLOSED or breaker.trial_pending:
+            return
+
+        if self.spool is not None:
+            if self.spooled:
+                self.start_replay()
+        elif breaker.cache:
+            asyncio.ensure_future(self._send(*next(iter(breaker.cache.values()))))
+
+    def on_success(self, breaker, url):
+        if breaker is None:
+            return
+
+        recovered = breaker.state != CLOSED
+        cached = breaker.record_success()
+
+        if cached:
+            logger.info('{} has recovered, sending {} cached values'.format(url, len(cached)))
+
+            for args in cached:
+                asyncio.ensure_future(self._send(*args))
+
+        if recovered and self.spool is not None and self.spooled:
+            logger.info('{} has recovered, replaying spooled requests'.format(url))
+            self.start_replay()
+
+    @property
+    def spooled(self):
+        """
+        Whether there's anything in the spool, counting writes still to be made
+        """
+        return self._spool_writes > 0 or not self.spool.empty
+
+    def start_replay(self):
+        if self._replay is None or self._replay.done():
+            self._replay = asyncio.ensure_future(self._replay_spool())
+
+    async def _replay_spool(self):
+        """
+        Send the latest spooled request for each command, at no more than
+        `replay_rate` requests a second.  If a target fails again, whatever's left
+        goes back in the spool, to be replayed on the next recovery.  Commands that
+        have been sent since they were spooled are skipped, as what's spooled is older.
+        A half-open target is sent one request as its trial, and the rest once it passes
+        """
+        self._draining = self._spool_executor.submit(self.spool.drain)
+        drained = await asyncio.wrap_future(self._draining, loop=self.loop)
+        self._draining = None
+
+        # Taken once the drain is done, so sends made while it ran are included
+        sent_live, self._sent_live = self._sent_live, set()
+
+        for key, body in drained.items():
+            if key not in sent_live:
+                self._replaying[key] = body
+
+        while self._replaying:
+            (url, command_name), body = self._replaying.popitem(last=False)
+            breaker = self.breaker_for(url)
+
+            if breaker is not None and (breaker.state == OPEN or breaker.trial_pending):
+                self.spool_append(url, command_name, body)
+                self._sent_live.discard((url, command_name))
+                continue
+
+            await self._send(url, body, command_name)
+            await asyncio.sleep(1 / self.replay_rate)
+
+    def take_over_replay(self, replaying):
+        """
+        Takes over requests another output sharing the spool was still to replay, when
+        it's cleaned up, skipping any this output has sent since
+        """
+        for key, body in replaying.items():
+            if key not in self._sent_live:
+                self._replaying.setdefault(key, body)
+
+        if self._replaying:
+            self.start_replay()
+
+    @property
+    def stats(self):
+        """
+        Circuit breaker state for each target, and the size of the spool
+        """
+        stats = {'targets': {target: breaker.stats for target, breaker in self.breakers.items()}}
+
+        if self.spool is not None:
+            stats['spool'] = dict(self.spool.stats, replaying=len(self._replaying))
+
+        return stats
+
+    def request_headers(self, body):
+        """
+        `get_headers`, plus the JSON content type.  Rebuilt only when `get_headers`
+        returns new headers
+        """
+        headers = self.get_headers(body) if self._headers_take_body else self.get_headers()
+
+        if headers is not self._last_headers:
+            self._last_headers = headers
+            self._request_headers = {**JSON_HEADERS, **headers}
+
+        return self._request_headers
+
     def send_full(self, value, **kwargs):
-        self.send(
-            value,
-            command_name=kwargs.get('command_name', ''),
-            endpoint=kwargs.get('endpoint', ''),
-            min=kwargs.get('min', 0.0),
-            max=kwargs.get('max', 1.0),
-        )
+        self.send(value, **full_params(kwargs))
 
     def cleanup(self):
         """
-        Close the session
+        Close the session, and spool anything still waiting to be replayed, once
+        the spool's writer thread has finished.  If another output shares the spool,
+        it's left open, and that output takes over the replay instead
         """
-        asyncio.ensure_future(self._cleanup())
+        if self._replay is not None:
+            self._replay.cancel()
+
+        for probe in self._probes.values():
+            probe.cancel()
+
+        self._probes.clear()
+        self.error_log.flush()
+        self.rejected_log.flush()
+
+        if self.spool is not None:
+            self._spool_users.remove(self)
+
+            if not self._spool_users:
+                self._spool_executor.shutdown(wait=True)
+
+            # A replay cancelled during its drain hasn't taken what was drained yet.  If
+            # the spool is shared, the drain may still be running, and what it drains is
+            # handed over once it's done, rather than waiting for it on the loop
+            if self._draining is not None and self._draining.done():
+                if not self._draining.cancelled() and self._draining.exception() is None:
+                    for key, body in self._draining.result().items():
+                        self._replaying.setdefault(key, body)
+            elif self._draining is not None:
+                asyncio.wrap_future(self._draining, loop=self.loop).add_done_callback(self._drained)
+
+            self._draining = None
+            self.hand_over_replay(self._replaying)
+            self._replaying.clear()
+
+            if not self._spool_users:
+                del SHARED_SPOOLS[self._spool_key]
+
+        if self.session is not None:
+            asyncio.ensure_future(self._cleanup())
+
+    def _drained(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.hand_over_replay(future.result())
+
+    def hand_over_replay(self, replaying):
+        """
+        Once cleaned up, gives requests still to be replayed to the latest output sharing
+        the spool, or puts them back in the spool if there's none
+        """
+        if self._spool_users:
+            self._spool_users[-1].take_over_replay(replaying)
+            return
+
+        for (url, command_name), body in replaying.items():
+            self.spool.append(url, command_name, body)
+
+        self.spool.close()
 
     async def _cleanup(self):
         await self.session.close()
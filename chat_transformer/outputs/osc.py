@@ -1,11 +1,28 @@
+import struct
 from collections import Iterable
 
 from pythonosc.osc_message_builder import OscMessageBuilder
 
 from .udp import UDPOutput
 
+# "#bundle" tag followed by the special "immediately" time tag
+BUNDLE_HEADER = b'#bundle\x00' + b'\x00\x00\x00\x00\x00\x00\x00\x01'
+
 
 class OSCOutput(UDPOutput):
+    def __init__(self, ip='127.0.0.1', port=6789, loop=None, bundle=False, max_bundle_size=8192):
+        super().__init__(ip=ip, port=port, loop=loop)
+        self.bundle = bundle
+        self.max_bundle_size = max_bundle_size
+        self._pending = []
+
+    @property
+    def batching(self):
+        """
+        Batches are only requested when sending as OSC bundles
+        """
+        return self.bundle
+
     def send(self, value, address='', **kwargs):
         """
         send structures OSC message via UDP
@@ -13,6 +30,24 @@ class OSCOutput(UDPOutput):
         msg = self.build_osc_message(address, value)
         self.transport.sendto(msg)
 
+    async def send_many(self, updates):
+        """
+        Buffer the batch's messages, to be sent as bundles on `flush`
+        """
+        for update in updates:
+            self._pending.append(
+                self.build_osc_message(update.params.get('address', ''), update.value)
+            )
+
+    async def flush(self):
+        """
+        send all buffered messages, packed into as few bundles as `max_bundle_size` allows
+        """
+        pending, self._pending = self._pending, []
+
+        for bundle in self.build_osc_bundles(pending):
+            self.transport.sendto(bundle)
+
     def build_osc_message(self, address, value):
         """
         composes OSC message in proper format for sending
@@ -27,3 +62,25 @@ class OSCOutput(UDPOutput):
         msg = builder.build()
 
         return msg.dgram
+
+    def build_osc_bundles(self, messages):
+        """
+        packs already-built OSC messages into bundles no larger than `max_bundle_size`
+        (a single oversized message still gets a bundle of its own)
+        """
+        elements = [BUNDLE_HEADER]
+        size = len(BUNDLE_HEADER)
+
+        for msg in messages:
+            element = struct.pack('>i', len(msg)) + msg
+
+            if len(elements) > 1 and size + len(element) > self.max_bundle_size:
+                yield b''.join(elements)
+                elements = [BUNDLE_HEADER]
+                size = len(BUNDLE_HEADER)
+
+            elements.append(element)
+            size += len(element)
+
+        if len(elements) > 1:
+            yield b''.join(elements)
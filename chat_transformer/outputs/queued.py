@@ -0,0 +1,273 @@
+import asyncio
+import functools
+import inspect
+import logging
+
+from ..logs import RateLimitedLog
+from .base import BaseOutput, OutputUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedOutput(BaseOutput):
+    """
+    Wraps another output so that its sends run behind a bounded queue and a
+    dedicated worker task.  A slow, blocking, or failing output only backs up
+    its own queue, rather than stalling the IRC reply and every other output.
+
+    `overflow` decides what happens when the queue is full:
+
+        drop_oldest: discard the oldest queued update to make room (default)
+        drop_newest: discard the incoming update
+        error: reject the incoming update, and log it as an error
+
+    Nothing is raised back to the caller, so a full queue never stops the other
+    outputs getting the update.
+
+    If the wrapped output supports batching, the worker drains up to
+    `batch_size` queued updates at a time and hands them over through
+    `send_many`/`flush`.
+
+    Traced updates keep their trace open while they're queued, and get a `queue`
+    stage for the time spent waiting and a `send` stage for the delivery, labelled
+    with the output's `name`.
+    """
+    overflow_policies = ('drop_oldest', 'drop_newest', 'error')
+
+    def __init__(self, output, maxsize=100, overflow='drop_oldest', timeout=5.0, threaded=False,
+                 batch_size=50, name='', loop=None):
+        if overflow not in self.overflow_policies:
+            raise ValueError(
+                '"{}" is not a valid overflow policy. Choose one of: {}'.format(
+                    overflow, ', '.join(self.overflow_policies)
+                )
+            )
+
+        self.output = output
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.timeout = timeout
+        self.threaded = threaded
+        self.batch_size = batch_size
+        self.name = name
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.queue = None
+        self._worker = None
+        self.dropped_log = RateLimitedLog(logger, logging.DEBUG, loop=self.loop)
+        self.rejected_log = RateLimitedLog(logger, logging.ERROR, loop=self.loop)
+
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_latency = None
+        self.avg_latency = None
+        self.max_latency = None
+
+    def __str__(self):
+        return 'Queued {}'.format(self.output.__class__.__name__)
+
+    async def connect(self, *args, **kwargs):
+        """
+        Connects the wrapped output, then starts the worker task
+        """
+        await self.output.connect(*args, **kwargs)
+        self.start()
+
+    def start(self):
+        """
+        Creates the queue and its worker.  Called from `connect`, so the queue
+        is bound to the running loop
+        """
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run(), loop=self.loop)
+
+    def send(self, value, **kwargs):
+        """
+        Queue a regular update for the wrapped output
+        """
+        self.enqueue(OutputUpdate(value, kwargs, False))
+
+    def send_full(self, value, **kwargs):
+        """
+        Queue a full (load/reload) update for the wrapped output
+        """
+        self.enqueue(OutputUpdate(value, kwargs, True))
+
+    def enqueue(self, update):
+        """
+        Put an update on the queue, applying the overflow policy if it's full
+        """
+        if self.queue is None:
+            self.start()
+
+        trace = self.tracer.current if self.tracer is not None else None
+        item = (update, self.loop.time(), (trace, self.tracer.clock()) if trace is not None else None)
+
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow == 'error':
+                self.rejected += 1
+                self.rejected_log('{} is full, rejected an update', self)
+                return
+
+            self.dropped += 1
+
+            if self.overflow == 'drop_oldest':
+                _, _, dropped_trace = self.queue.get_nowait()
+                self.queue.task_done()
+                self.queue.put_nowait(item)
+
+                if dropped_trace is not None:
+                    self.tracer.release(dropped_trace[0])
+
+            self.dropped_log('{} is full, dropped an update ({})', self, self.overflow)
+
+            if self.overflow == 'drop_newest':
+                return
+
+        if trace is not None:
+            self.tracer.hold(trace)
+
+    async def _run(self):
+        """
+        Worker loop: pulls updates off the queue and passes them to the wrapped output,
+        isolating any errors or timeouts so the worker keeps running
+        """
+        while True:
+            items = [await self.queue.get()]
+
+            if self.output.batching:
+                while len(items) < self.batch_size and not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+
+            updates = [update for update, _, _ in items]
+            traces = [trace for _, _, trace in items if trace is not None]
+
+            if traces:
+                started = self._start_traces(traces)
+
+            try:
+                await self._deliver(updates)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.error('{} timed out after {}s sending {} update(s)'.format(
+                    self, self.timeout, len(updates)
+                ))
+            except Exception:
+                self.errors += 1
+                logger.exception('{} failed sending {} update(s)'.format(self, len(updates)))
+            else:
+                self.sent += len(updates)
+            finally:
+                now = self.loop.time()
+                for _, enqueued_at, _ in items:
+                    self.record_latency(now - enqueued_at)
+                    self.queue.task_done()
+
+                if traces:
+                    self._end_traces(traces, started)
+
+    def _start_traces(self, traces):
+        """
+        Records how long traced updates waited in the queue, and makes the latest the
+        current trace while they're delivered (as `TransformerClient` does for batches)
+        """
+        started = self.tracer.clock()
+
+        for trace, enqueued_at in traces:
+            self.tracer.span(trace, 'queue ({})'.format(self.name or self), enqueued_at, started)
+
+        self.tracer.current = traces[-1][0]
+        return started
+
+    def _end_traces(self, traces, started):
+        self.tracer.current = None
+        ended = self.tracer.clock()
+
+        for trace, _ in traces:
+            self.tracer.span(trace, 'send ({})'.format(self.name or self), started, ended)
+            self.tracer.release(trace)
+
+    async def _deliver(self, updates):
+        """
+        Hands the updates to the wrapped output, as a batch if it supports batching
+        """
+        if self.output.batching:
+            await asyncio.wait_for(self._send_batch(updates), self.timeout)
+            return
+
+        for update in updates:
+            func = self.output.send_full if update.full else self.output.send
+            await self._call(func, update.value, update.params)
+
+    async def _send_batch(self, updates):
+        await self.output.send_many(updates)
+        await self.output.flush()
+
+    async def _call(self, func, value, kwargs):
+        """
+        Runs the send, either in the default executor (for blocking outputs), or
+        directly, awaiting the result if the output returned an awaitable
+        """
+        if self.threaded:
+            result = self.loop.run_in_executor(None, functools.partial(func, value, **kwargs))
+        else:
+            result = func(value, **kwargs)
+
+        if inspect.isawaitable(result):
+            await asyncio.wait_for(result, self.timeout)
+
+    def record_latency(self, latency):
+        """
+        Tracks the time from an update being queued to its send completing
+        """
+        self.last_latency = latency
+        self.max_latency = latency if self.max_latency is None else max(self.max_latency, latency)
+        self.avg_latency = latency if self.avg_latency is None else 0.9 * self.avg_latency + 0.1 * latency
+
+    @property
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    @property
+    def stats(self):
+        """
+        Snapshot of queue depth, throughput and latency for this output
+        """
+        stats = {
+            'depth': self.depth,
+            'maxsize': self.maxsize,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'last_latency': self.last_latency,
+            'avg_latency': self.avg_latency,
+            'max_latency': self.max_latency,
+        }
+
+        if hasattr(self.output, 'stats'):
+            stats['output'] = self.output.stats
+
+        return stats
+
+    def cleanup(self):
+        """
+        Stop the worker and clean up the wrapped output
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+
+        self.dropped_log.flush()
+        self.rejected_log.flush()
+        self.output.cleanup()
@@ -0,0 +1,191 @@
+import glob
+import logging
+import os
+import struct
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Each record is a header of (url length, command name length, body length),
+# followed by the utf-8 url and command name, and the body
+HEADER = struct.Struct('>HHI')
+
+SPOOL_SUFFIX = '.spool'
+
+
+def encode_request(url, command_name, body):
+    url, command_name = url.encode('utf-8'), command_name.encode('utf-8')
+    return HEADER.pack(len(url), len(command_name), len(body)) + url + command_name + body
+
+
+class Spool:
+    """
+    Append-only spool of requests on disk, split into segment files of around
+    `segment_bytes`.  Once the spool grows past `max_bytes`, it's compacted down
+    to the latest request for each URL/command, so its size stays bounded however
+    long it's written to.  If that still isn't small enough, the least recently
+    updated requests are dropped.
+
+    Segments left over from a previous run are picked up again
+    """
+    def __init__(self, path='http-spool', max_bytes=16 * 1024 * 1024, segment_bytes=1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        segments = self.segments()
+        self.segment = int(segments[-1][len(self.path) + 1:-len(SPOOL_SUFFIX)]) if segments else 0
+        self.size = sum(os.path.getsize(segment) for segment in segments)
+
+        # Kept count of, so `stats` doesn't need to list the directory
+        self.segment_count = len(segments)
+
+        self.file = None
+        self.file_size = 0
+        self.dropped = 0
+        self.compactions = 0
+
+    def segments(self):
+        return sorted(glob.glob(glob.escape(self.path) + '-' + '[0-9]' * 6 + SPOOL_SUFFIX))
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    def append(self, url, command_name, body):
+        if self.file is None or self.file_size >= self.segment_bytes:
+            self._rotate()
+
+        self._write(encode_request(url, command_name, body))
+
+        if self.size > self.max_bytes:
+            self.compact()
+
+    def _write(self, record):
+        self.file.write(record)
+        self.file_size += len(record)
+        self.size += len(record)
+
+    def _rotate(self):
+        self._close_file()
+
+        self.segment += 1
+        self.file = open('{}-{:06d}{}'.format(self.path, self.segment, SPOOL_SUFFIX), 'ab')
+        self.file_size = 0
+        self.segment_count += 1
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def read(self):
+        """
+        Streams `(url, command name, body)` for every spooled request, oldest first.
+        A request cut off part way through (e.g. by a crash while it was being
+        written) ends its segment, and one that can't be decoded is skipped
+        """
+        if self.file is not None:
+            self.file.flush()
+
+        for segment in self.segments():
+            with open(segment, 'rb') as spool:
+                while True:
+                    header = spool.read(HEADER.size)
+
+                    if not header:
+                        break
+
+                    if len(header) < HEADER.size:
+                        logger.warning('Ignoring a partly written request at the end of {}'.format(segment))
+                        break
+
+                    url_length, name_length, body_length = HEADER.unpack(header)
+                    url, command_name, body = (
+                        spool.read(url_length), spool.read(name_length), spool.read(body_length)
+                    )
+
+                    if len(url) < url_length or len(command_name) < name_length or len(body) < body_length:
+                        logger.warning('Ignoring a partly written request at the end of {}'.format(segment))
+                        break
+
+                    try:
+                        url, command_name = url.decode('utf-8'), command_name.decode('utf-8')
+                    except UnicodeDecodeError:
+                        logger.warning('Skipping an unreadable request in {}'.format(segment))
+                        continue
+
+                    yield url, command_name, body
+
+    def latest(self):
+        """
+        The latest body for each `(url, command name)`, least recently updated first
+        """
+        latest = OrderedDict()
+
+        for url, command_name, body in self.read():
+            latest.pop((url, command_name), None)
+            latest[(url, command_name)] = body
+
+        return latest
+
+    def compact(self):
+        """
+        Rewrite the spool as a single segment holding only the latest request for
+        each URL/command, dropping the oldest if they take up more than half of
+        `max_bytes`, to leave room for new requests
+        """
+        records = [
+            encode_request(url, command_name, body) for (url, command_name), body in self.latest().items()
+        ]
+        old_segments = self.segments()
+
+        total = sum(len(record) for record in records)
+        while records and total > self.max_bytes // 2:
+            total -= len(records.pop(0))
+            self.dropped += 1
+
+        # Write the compacted segment out before removing the old ones
+        self.size = 0
+        self._rotate()
+        for record in records:
+            self._write(record)
+        self.file.flush()
+
+        for segment in old_segments:
+            os.remove(segment)
+
+        self.segment_count = 1
+        self.compactions += 1
+        logger.info('Compacted HTTP spool to {} requests'.format(len(records)))
+
+    def drain(self):
+        """
+        Returns the latest body for each `(url, command name)` (as `latest` does),
+        and empties the spool
+        """
+        latest = self.latest()
+
+        self._close_file()
+        for segment in self.segments():
+            os.remove(segment)
+        self.size = 0
+        self.segment_count = 0
+
+        return latest
+
+    @property
+    def stats(self):
+        return {
+            'size': self.size,
+            'segments': self.segment_count,
+            'compactions': self.compactions,
+            'dropped': self.dropped,
+        }
+
+    def close(self):
+        self._close_file()
@@ -16,6 +16,7 @@ class UDPOutput(BaseOutput):
         self.port = port
         self.ip = ip
         self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.transport = None
 
     async def connect(self):
         """
@@ -34,6 +35,7 @@ class UDPOutput(BaseOutput):
 
     def cleanup(self):
         """
-        Close the UDP connection
+        Close the UDP connection, if it was ever made
         """
-        self.transport.close()
+        if self.transport is not None:
+            self.transport.close()
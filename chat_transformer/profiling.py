@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+def code_key(code):
+    """
+    The key `cProfile` uses for a function's stats
+    """
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def describe_code(code):
+    return '{}:{}'.format(os.path.basename(code.co_filename), code.co_name)
+
+
+def stage_totals(stats, keys):
+    """
+    Number of calls and total time (in seconds) spent in a stage, given `pstats`
+    stats and the keys of the stage's functions.  Only calls from outside of the stage
+    count, so that a stage function calling another (e.g. `send_full` calling `send`)
+    isn't counted twice
+    """
+    calls = total = 0
+
+    for key in keys:
+        entry = stats.get(key)
+
+        if entry is None:
+            continue
+
+        primitive_calls, entry_calls, own_time, cumulative_time, callers = entry
+
+        # Called before profiling started, so there's nothing to split by caller
+        if not callers:
+            calls += entry_calls
+            total += cumulative_time
+            continue
+
+        for caller, (caller_calls, _, _, caller_time) in callers.items():
+            if caller not in keys:
+                calls += caller_calls
+                total += caller_time
+
+    return calls, total
+
+
+class Sampler:
+    """
+    Records the stack of `thread_id` every `interval` seconds from a background thread.
+    Much lower overhead than `cProfile` (nothing runs on the profiled thread), at the
+    cost of only being statistically accurate
+    """
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='chat_transformer-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+
+            # Outermost frame first, as flame graphs expect
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+
+class Profiler:
+    """
+    Profiles the event loop's thread for a fixed window, toggled at runtime (e.g. from
+    a signal), and writes the results to `output`-prefixed files:
+
+    * "cprofile" mode writes `.prof` stats (for `pstats`, snakeviz, etc.)
+    * "sampling" mode samples the stack every `sample_interval` seconds from another
+      thread, and writes `.folded` stacks (for flame graphs)
+
+    Both write a `.txt` report, with the time spent in each stage of the hot path
+    (as given by `stages`, see `TransformerClient.profile_stages`).  Nothing is
+    installed while the profiler is off, so it costs nothing until it's started
+    """
+    def __init__(
+        self,
+        mode='cprofile',
+        duration=30.0,
+        output='chat_transformer-profile',
+        sample_interval=0.005,
+        stages=None,
+        loop=None,
+        scheduler=None,
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError('"{}" is not a valid profile mode. Choose one of: {}'.format(
+                mode, ', '.join(PROFILE_MODES)
+            ))
+
+        self.mode = mode
+        self.duration = duration
+        self.output = output
+        self.sample_interval = sample_interval
+        self.stages = stages
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.scheduler = scheduler
+
+        self._profile = None
+        self._sampler = None
+        self._started = None
+        self._timer = None
+
+    @property
+    def running(self):
+        return self._started is not None
+
+    def toggle(self):
+        """
+        Starts profiling if it's off, otherwise stops it early
+        """
+        if self.running:
+            return self.stop()
+
+        self.start()
+
+    def start(self, duration=None):
+        """
+        Starts profiling for `duration` seconds (by default, `self.duration`).  Must be
+        called from the loop's thread, which is the one profiled
+        """
+        if self.running:
+            return
+
+        duration = duration if duration is not None else self.duration
+
+        if self.mode == 'cprofile':
+            import cProfile
+
+            profile = cProfile.Profile()
+
+            try:
+                profile.enable()
+            except ValueError as error:
+                # e.g. another profiler is already active
+                logger.error('Could not start profiling: {}'.format(error))
+                return
+
+            self._profile = profile
+        else:
+            self._sampler = Sampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+
+        self._started = time.time()
+        logger.info('Profiling ({}) for {}s'.format(self.mode, duration))
+
+        if self.scheduler is not None:
+            self._timer = self.scheduler.call_later(duration, self.stop)
+        else:
+            self._timer = self.loop.call_later(duration, self.stop)
+
+    def stop(self):
+        """
+        Stops profiling, and writes the results in a worker thread.  Returns the
+        future for the write, or None if the profiler wasn't running
+        """
+        if not self.running:
+            return None
+
+        if self._profile is not None:
+            self._profile.disable()
+
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        profile, sampler, started = self._profile, self._sampler, self._started
+        self._profile = self._sampler = self._started = self._timer = None
+
+        stages = self.stages() if self.stages is not None else {}
+        return self.loop.run_in_executor(None, self.write, profile, sampler, started, time.time(), stages)
+
+    def write(self, profile, sampler, started, stopped, stages):
+        """
+        Writes the results of a profiling window.  Returns the report's filename
+        """
+        prefix = '{}-{}'.format(self.output, time.strftime('%Y%m%d-%H%M%S', time.localtime(started)))
+        window = stopped - started
+
+        if profile is not None:
+            import pstats
+
+            profile.dump_stats(prefix + '.prof')
+            stats = pstats.Stats(profile)
+            rows = self.cprofile_stages(stats.stats, stages)
+        else:
+            with open(prefix + '.folded', 'w') as folded:
+                for stack, count in sampler.stacks.most_common():
+                    folded.write('{} {}\n'.format(';'.join(describe_code(code) for code in stack), count))
+
+            stats = None
+            rows = self.sampling_stages(sampler, stages)
+
+        with open(prefix + '.txt', 'w') as report:
+            report.write('chat_transformer profile ({}), {:.1f}s from {}\n\n'.format(
+                self.mode, window, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))
+            ))
+
+            if profile is not None:
+                report.write('{:<40} {:>10} {:>12} {:>14} {:>8}\n'.format(
+                    'Stage', 'Calls', 'Total (s)', 'Per call (us)', '% time'
+                ))
+
+                for label, calls, total in rows:
+                    report.write('{:<40} {:>10} {:>12.4f} {:>14.2f} {:>7.1f}%\n'.format(
+                        label, calls, total, total / calls * 1e6 if calls else 0.0,
+                        total / window * 100 if window else 0.0,
+                    ))
+
+                report.write('\n')
+                stats.stream = report
+                stats.sort_stats('cumulative').print_stats(40)
+            else:
+                report.write('{:<40} {:>10} {:>8}\n'.format('Stage', 'Samples', '% time'))
+
+                for label, samples in rows:
+                    report.write('{:<40} {:>10} {:>7.1f}%\n'.format(
+                        label, samples, samples / sampler.samples * 100 if sampler.samples else 0.0
+                    ))
+
+                report.write('\n{} samples, every {}s\n'.format(sampler.samples, self.sample_interval))
+
+        logger.info('Wrote profile to {}.txt'.format(prefix))
+        return prefix + '.txt'
+
+    def cprofile_stages(self, stats, stages):
+        """
+        `(label, calls, total time)` for each stage
+        """
+        rows = []
+
+        for label, codes in stages.items():
+            calls, total = stage_totals(stats, {code_key(code) for code in codes})
+            rows.append((label, calls, total))
+
+        return rows
+
+    def sampling_stages(self, sampler, stages):
+        """
+        `(label, samples)` for each stage: the number of samples taken while the stage
+        was anywhere on the stack
+        """
+        hits = OrderedDict((label, 0) for label in stages)
+
+        for stack, count in sampler.stacks.items():
+            on_stack = set(stack)
+
+            for label, codes in stages.items():
+                if not on_stack.isdisjoint(codes):
+                    hits[label] += count
+
+        return list(hits.items())
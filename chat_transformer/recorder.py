@@ -0,0 +1,197 @@
+import asyncio
+import gzip
+import logging
+import os
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .logs import RateLimitedLog
+
+logger = logging.getLogger(__name__)
+
+# Each record is a header of (timestamp, kind, payload length), followed by the
+# payload: the record's fields, utf-8 encoded and tab-separated (tabs within fields
+# are replaced by spaces)
+HEADER = struct.Struct('>dBI')
+
+INBOUND = 1
+ACTION = 2
+SEND = 3
+
+RECORDING_SUFFIX = '.rec.gz'
+
+Record = namedtuple('Record', ['timestamp', 'kind', 'fields'])
+
+
+def encode_record(timestamp, kind, fields):
+    payload = '\t'.join(
+        '' if field is None else str(field).replace('\t', ' ') for field in fields
+    ).encode('utf-8')
+    return HEADER.pack(timestamp, kind, len(payload)) + payload
+
+
+def read_recording(filename):
+    """
+    Streams the `Record`s in a recording back, in the order they were written.
+    Recordings that are still being written to (or never closed, e.g. after a crash)
+    are read up to their last complete record
+    """
+    with gzip.open(filename, 'rb') as recording:
+        while True:
+            try:
+                header = recording.read(HEADER.size)
+
+                if len(header) < HEADER.size:
+                    return
+
+                timestamp, kind, length = HEADER.unpack(header)
+                payload = recording.read(length)
+            except EOFError:
+                # The compressed stream ends without its end-of-stream marker
+                return
+
+            if len(payload) < length:
+                return
+
+            yield Record(timestamp, kind, payload.decode('utf-8').split('\t'))
+
+
+class Recorder:
+    """
+    Records inbound chat, the actions it triggered, and what was sent to the outputs,
+    to gzip-compressed recording files, for replay and capacity planning.
+
+    Recording only appends to an in-memory buffer; the buffer is encoded, compressed
+    and written every `flush_interval` seconds by a single background thread.  A new
+    file is started once the current one has had `max_bytes` (uncompressed) written to it.
+
+    If the writer falls behind and `max_buffer` records are waiting to be written, new
+    records are dropped (and counted in `dropped`) until it catches up.  Errors writing
+    (e.g. a full disk) are logged, and the records being written are lost
+    """
+    def __init__(
+        self,
+        path='recording',
+        max_bytes=64 * 1024 * 1024,
+        flush_interval=1.0,
+        max_buffer=100000,
+        loop=None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.buffer = []
+        self.dropped = 0
+        self.dropped_log = RateLimitedLog(logger, logging.WARNING, loop=self.loop)
+        self.error_log = RateLimitedLog(logger, logging.ERROR, loop=self.loop)
+        self.file = None
+        self.filename = None
+        self.written = 0
+        self.segment = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._flush_handle = None
+
+    def start(self):
+        self._flush_handle = self.loop.call_later(self.flush_interval, self._scheduled_flush)
+
+    def record_inbound(self, nickname, message):
+        self.record(INBOUND, (nickname, message))
+
+    def record_action(self, command_name, action, value):
+        self.record(ACTION, (command_name, action, value))
+
+    def record_send(self, output_name, command_name, value):
+        self.record(SEND, (output_name, command_name, repr(value)))
+
+    def record(self, kind, fields):
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            self.dropped_log('Recording buffer is full, dropped {} record(s) so far', self.dropped)
+            return
+
+        self.buffer.append((time.time(), kind, fields))
+
+    def _scheduled_flush(self):
+        self.flush()
+        self._flush_handle = self.loop.call_later(self.flush_interval, self._scheduled_flush)
+
+    def flush(self):
+        """
+        Hands everything buffered so far to the writer thread
+        """
+        if not self.buffer:
+            return None
+
+        records, self.buffer = self.buffer, []
+        future = self._executor.submit(self._write, records)
+        future.add_done_callback(self._written)
+        return future
+
+    def _written(self, future):
+        """
+        Logs any error writing, back on the loop.  Runs in the writer thread
+        """
+        if future.cancelled() or future.exception() is None:
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self.error_log, 'Error writing recording: {}', future.exception())
+        except RuntimeError:
+            # The loop is already closed
+            logger.error('Error writing recording: {}'.format(future.exception()))
+
+    def _write(self, records):
+        """
+        Encode and write records, rotating to a new file if needed.  Runs in the writer thread
+        """
+        data = b''.join(encode_record(*record) for record in records)
+
+        if self.file is None or self.written >= self.max_bytes:
+            self._rotate()
+
+        self.file.write(data)
+        self.file.flush()
+        self.written += len(data)
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        while True:
+            self.segment += 1
+            self.filename = '{}-{}-{:04d}{}'.format(self.path, stamp, self.segment, RECORDING_SUFFIX)
+
+            if not os.path.exists(self.filename):
+                break
+
+        logger.info('Recording to {}'.format(self.filename))
+        self.file = gzip.open(self.filename, 'wb')
+        self.written = 0
+
+    def close(self):
+        """
+        Write out anything still buffered and close the current file
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+
+        self.dropped_log.flush()
+        self.flush()
+        self._executor.submit(self._close_file)
+        self._executor.shutdown(wait=True)
+        self.error_log.flush()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
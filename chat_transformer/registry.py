@@ -0,0 +1,163 @@
+from array import array
+from collections.abc import Mapping
+
+from .commands import Command
+from .outputs.base import OutputUpdate
+
+
+def import_numpy():
+    """
+    NumPy is optional, and slow to import, so it's only imported when asked for
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ArrayCommand(Command):
+    """
+    A `Command` whose numeric state lives in a `CommandRegistry`'s arrays rather than
+    on the instance.  Behaves exactly like a regular `Command`
+    """
+    __slots__ = ('registry', 'index')
+
+    def __init__(self, registry, index, **kwargs):
+        self.registry = registry
+        self.index = index
+        super().__init__(**kwargs)
+
+    def _field(name):
+        def getter(self):
+            return getattr(self.registry, name)[self.index]
+
+        def setter(self, value):
+            getattr(self.registry, name)[self.index] = value
+
+        return property(getter, setter)
+
+    min = _field('min')
+    max = _field('max')
+    delta = _field('delta')
+    initial = _field('initial')
+    current = _field('current')
+
+    del _field
+
+
+class CommandRegistry(Mapping):
+    """
+    Read-only mapping of command name to `ArrayCommand`, storing every command's min,
+    max, delta, initial and current values in contiguous arrays.  Intended for very large
+    parameter sets (e.g. per-LED or per-voice controls), where it allows clamping,
+    snapshots and full sends to work on all commands at once.
+
+    Uses NumPy arrays when `backend` is "numpy" and NumPy is installed, falling back
+    to the standard library's `array` otherwise.
+    """
+    fields = ('min', 'max', 'delta', 'initial', 'current')
+
+    def __init__(self, commands, backend='array', current_values=None):
+        """
+        `commands` is the parsed commands file; `current_values` maps command
+        names to values to carry over (e.g. from before a reload)
+        """
+        self.numpy = import_numpy() if backend == 'numpy' else None
+        self.backend = 'numpy' if self.numpy is not None else 'array'
+        current_values = current_values or {}
+
+        size = len(commands)
+        for field in self.fields:
+            setattr(self, field, self.allocate(size))
+
+        self.names = []
+        self._commands = {}
+
+        for index, (key, value) in enumerate(commands.items()):
+            name = key.lower()
+
+            value = dict(value)
+            if value.pop('type', 'number').lower() != 'number':
+                raise ValueError('Command "{}": array storage only supports "number" commands'.format(name))
+
+            self.names.append(name)
+            self._commands[name] = ArrayCommand(
+                self, index, name=name, current=current_values.get(name), **value
+            )
+
+        # Precompute the full-send parameters for every command/output pair
+        self._full_params = {}
+        for index, name in enumerate(self.names):
+            command = self._commands[name]
+            for output_name, output_params in command.outputs.items():
+                self._full_params.setdefault(output_name, []).append((
+                    index, name, dict(output_params, min=command.min, max=command.max)
+                ))
+
+    def allocate(self, size):
+        if self.backend == 'numpy':
+            return self.numpy.zeros(size, dtype=self.numpy.float64)
+        return array('d', bytes(8 * size))
+
+    def __getitem__(self, name):
+        return self._commands[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def clamp(self):
+        """
+        Restricts every command's current value to its min/max
+        """
+        if self.backend == 'numpy':
+            self.numpy.clip(self.current, self.min, self.max, out=self.current)
+            return
+
+        current, minimum, maximum = self.current, self.min, self.max
+        for index in range(len(current)):
+            if current[index] < minimum[index]:
+                current[index] = minimum[index]
+            elif current[index] > maximum[index]:
+                current[index] = maximum[index]
+
+    def set_many(self, values):
+        """
+        Sets the current value of several commands at once from a mapping of name
+        to value, then clamps to each command's min/max.  Returns the names set
+        """
+        names = [name for name in values if name in self._commands]
+
+        for name in names:
+            self.current[self._commands[name].index] = values[name]
+
+        self.clamp()
+        return names
+
+    def snapshot(self):
+        """
+        Returns a copy of every command's current value, in `names` order
+        """
+        if self.backend == 'numpy':
+            return self.current.copy()
+        return array('d', self.current)
+
+    def restore(self, snapshot):
+        """
+        Restores current values from a `snapshot`
+        """
+        self.current[:] = snapshot
+
+    def full_updates(self, output_name):
+        """
+        Returns `(command name, OutputUpdate)` pairs for a full send of every command
+        that uses `output_name`
+        """
+        current = self.current
+        return [
+            (name, OutputUpdate(current[index], params, True))
+            for index, name, params in self._full_params.get(output_name, [])
+        ]
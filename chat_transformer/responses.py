@@ -3,6 +3,8 @@ class ActionResponse:
     Contains data necessary to both set the output values,
     and send the current status of the variable in question to IRC.
     """
+    __slots__ = ('irc_message', 'value', 'output_params')
+
     def __init__(self, irc_message, value=None, output_params=None):
         self.irc_message = irc_message
         self.value = value
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    """
+    Handle for a callback scheduled on a `TimerWheel`
+    """
+    __slots__ = ('callback', 'args', 'interval', 'rounds', 'cancelled')
+
+    def __init__(self, callback, args, interval=None):
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.rounds = 0
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: timers are kept in `slots` buckets, one per `tick` seconds,
+    and a single loop callback per tick runs whichever timers in the current bucket
+    are due.  Scheduling and cancelling are O(1), and however many timers there are,
+    they cost one loop callback per tick (and none at all while there are no timers).
+
+    Timers only fire on tick boundaries, so delays are rounded up to whole ticks
+    """
+    def __init__(self, tick=0.1, slots=512, loop=None):
+        self.tick = tick
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.slots = [[] for _ in range(slots)]
+        self.position = 0
+        self.pending = 0
+
+        self._handle = None
+        self._next_tick = None
+
+        # When the current slot was (or, while idle, would have been) run
+        self._position_time = None
+
+    def call_later(self, delay, callback, *args):
+        """
+        Run `callback(*args)` once, after `delay` seconds
+        """
+        timer = Timer(callback, args)
+        self._schedule(timer, delay)
+        return timer
+
+    def call_every(self, interval, callback, *args):
+        """
+        Run `callback(*args)` every `interval` seconds, until cancelled
+        """
+        timer = Timer(callback, args, interval)
+        self._schedule(timer, interval)
+        return timer
+
+    def _schedule(self, timer, delay, start=None):
+        """
+        Adds `timer`, due `delay` seconds after `start` (by default, now)
+        """
+        now = self.loop.time()
+
+        if self._handle is None:
+            self._position_time = now
+            self._next_tick = now + self.tick
+            self._handle = self.loop.call_at(self._next_tick, self._tick)
+
+        # The slot `ticks` ahead runs `ticks` ticks after the current one did, so count
+        # from then, rather than now, to never fire before `delay` is up
+        start = start if start is not None else now
+        ticks = max(1, math.ceil((start + delay - self._position_time) / self.tick - 1e-9))
+        timer.rounds, offset = divmod(ticks - 1, len(self.slots))
+
+        self.slots[(self.position + offset + 1) % len(self.slots)].append(timer)
+        self.pending += 1
+
+    def _tick(self):
+        self.position = (self.position + 1) % len(self.slots)
+        self._position_time = self._next_tick
+        slot = self.slots[self.position]
+        self.slots[self.position] = waiting = []
+
+        for timer in slot:
+            if timer.cancelled:
+                self.pending -= 1
+            elif timer.rounds:
+                timer.rounds -= 1
+                waiting.append(timer)
+            else:
+                self.pending -= 1
+
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    logger.exception('Error in scheduled callback {}'.format(timer.callback))
+
+                if timer.interval is not None and not timer.cancelled:
+                    # From when this run was due, so repeats don't drift
+                    self._schedule(timer, timer.interval, self._position_time)
+
+        if self.pending:
+            # Schedule from the previous tick's time, rather than now, to avoid drift
+            self._next_tick = max(self._next_tick + self.tick, self.loop.time())
+            self._handle = self.loop.call_at(self._next_tick, self._tick)
+        else:
+            self._handle = None
+
+    def stop(self):
+        """
+        Cancel every timer
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        self.slots = [[] for _ in range(len(self.slots))]
+        self.pending = 0
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """
+    Latency histogram with power-of-two microsecond buckets: bucket 0 holds
+    latencies under 1us, and bucket `i` those from 2^(i-1) up to 2^i us
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self, buckets=32):
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = int(seconds * 1e6).bit_length()
+        self.counts[min(index, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Upper bound (in seconds) of the bucket holding the `fraction` percentile
+        """
+        target = fraction * self.count
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+
+            if count and seen >= target:
+                return min((1 << index) / 1e6, self.max)
+
+        return self.max
+
+    @property
+    def stats(self):
+        """
+        Count, and mean, percentile and max latencies in microseconds
+        """
+        if not self.count:
+            return {'count': 0}
+
+        return {
+            'count': self.count,
+            'mean_us': round(self.total / self.count * 1e6, 1),
+            'p50_us': round(self.percentile(0.5) * 1e6, 1),
+            'p90_us': round(self.percentile(0.9) * 1e6, 1),
+            'p99_us': round(self.percentile(0.99) * 1e6, 1),
+            'max_us': round(self.max * 1e6, 1),
+        }
+
+
+class Trace:
+    """
+    Stage timings for a single chat message.  `last` is the end of the most recent
+    stage, and `pending` the number of stages still running in the background (e.g.
+    batched sends, and HTTP requests)
+    """
+    __slots__ = ('id', 'message', 'start', 'last', 'spans', 'pending', 'ended')
+
+    def __init__(self, trace_id, message, start):
+        self.id = trace_id
+        self.message = message
+        self.start = start
+        self.last = start
+        self.spans = []
+        self.pending = 0
+        self.ended = False
+
+
+class Tracer:
+    """
+    Traces a sample of chat messages through the client and outputs, timing each stage
+    with the monotonic clock: from the message being received, through the command
+    lookup, the action, the IRC reply, and each output's send (and, for HTTP outputs,
+    the request completing).
+
+    Every `1 / sample_rate`th message is traced.  The time spent in each stage goes
+    into a `Histogram` per stage (see `stats`), and finished traces are written to
+    `output` (a filename, or "-" for stdout) in the Chrome trace event format, which
+    can be opened in chrome://tracing or Perfetto
+    """
+    def __init__(self, sample_rate=0.01, output='chat_transformer-trace.json', clock=time.monotonic):
+        if not 0 < sample_rate <= 1:
+            raise ValueError('"sample_rate" must be more than 0, and at most 1')
+
+        self.sample_every = max(1, int(round(1 / sample_rate)))
+        self.output = output
+        self.clock = clock
+
+        # The trace of the message being handled right now, if it's being traced,
+        # for stages that don't have the trace passed to them (e.g. outputs)
+        self.current = None
+
+        self.histograms = OrderedDict()
+        self.traced = 0
+        self._countdown = 1
+        self._next_id = 1
+        self._pid = os.getpid()
+
+        self._file = None
+        self._written = 0
+
+    def begin(self, message, received=None):
+        """
+        Starts a trace for `message` if it's sampled, otherwise returns None.
+        `received` is when the message arrived, if known
+        """
+        self._countdown -= 1
+
+        if self._countdown:
+            return None
+
+        self._countdown = self.sample_every
+        trace = Trace(self._next_id, message, received if received is not None else self.clock())
+        self._next_id += 1
+
+        if received is not None:
+            self.mark(trace, 'receive')
+
+        return trace
+
+    def mark(self, trace, name):
+        """
+        Ends the stage `name`, which started when the previous one ended
+        """
+        now = self.clock()
+        self.span(trace, name, trace.last, now)
+        trace.last = now
+
+    def span(self, trace, name, start, end, args=None):
+        """
+        Records a stage with explicit start and end times
+        """
+        trace.spans.append((name, start, end, args))
+
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+
+        histogram.record(end - start)
+
+    def hold(self, trace):
+        """
+        Keeps `trace` open until a matching `release`, for stages finishing later
+        """
+        trace.pending += 1
+
+    def release(self, trace):
+        trace.pending -= 1
+
+        if trace.ended and not trace.pending:
+            self.finish(trace)
+
+    def end(self, trace):
+        """
+        Ends the synchronous part of handling the message.  The trace is finished once
+        any stages still running in the background are
+        """
+        trace.ended = True
+
+        if not trace.pending:
+            self.finish(trace)
+
+    def finish(self, trace):
+        end = max([trace.last] + [span[2] for span in trace.spans])
+        self.span(trace, 'total', trace.start, end, {'message': trace.message})
+        self.traced += 1
+
+        try:
+            self.write(trace)
+        except OSError as error:
+            logger.error('Could not write trace to {}: {}'.format(self.output, error))
+
+    def events(self, trace):
+        """
+        Chrome trace "complete" events for each of a trace's spans, in microseconds.
+        Each trace is shown as its own thread
+        """
+        return [
+            {
+                'name': name,
+                'cat': 'chat_transformer',
+                'ph': 'X',
+                'ts': round(start * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+                'pid': self._pid,
+                'tid': trace.id,
+                'args': args or {},
+            }
+            for name, start, end, args in trace.spans
+        ]
+
+    def write(self, trace):
+        if self._file is None:
+            self._file = sys.stdout if self.output == '-' else open(self.output, 'w')
+            self._file.write('[')
+
+        for event in self.events(trace):
+            self._file.write(',\n' if self._written else '\n')
+            self._file.write(json.dumps(event))
+            self._written += 1
+
+    @property
+    def stats(self):
+        """
+        Latency stats for each stage
+        """
+        return OrderedDict((name, histogram.stats) for name, histogram in self.histograms.items())
+
+    def close(self):
+        if self._file is None:
+            return
+
+        self._file.write('\n]\n')
+
+        if self._file is sys.stdout:
+            self._file.flush()
+        else:
+            self._file.close()
+
+        self._file = None
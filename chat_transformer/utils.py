@@ -1,7 +1,77 @@
+import logging
+import os
+import stat
+from functools import lru_cache
 from importlib import import_module
 
+logger = logging.getLogger(__name__)
 
+EVENT_LOOPS = ('asyncio', 'uvloop')
+
+
+@lru_cache(maxsize=None)
 def class_from_string(import_str):
     module_path, class_name = import_str.rsplit('.', 1)
     module = import_module(module_path, class_name)
     return getattr(module, class_name)
+
+
+def create_event_loop(name='asyncio'):
+    """
+    Creates a new event loop and sets it as the current loop.  "uvloop" installs
+    uvloop's loop policy first, falling back to the default asyncio loop if
+    uvloop isn't installed
+    """
+    import asyncio
+
+    if name not in EVENT_LOOPS:
+        raise ValueError(
+            '"{}" is not a valid event loop. Choose one of: {}'.format(name, ', '.join(EVENT_LOOPS))
+        )
+
+    if name == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning('uvloop is not installed, falling back to the default asyncio event loop')
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+def remove_socket(path):
+    """
+    Removes the Unix socket at `path`, if there is one.  Raises `FileExistsError` if
+    something else is there, so a mistyped path never deletes a regular file
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError('{} already exists, and is not a socket'.format(path))
+
+    os.remove(path)
+
+
+async def create_private_unix_server(loop, protocol_factory, path):
+    """
+    Listens on a Unix socket at `path`, replacing a socket left there by a previous
+    run, but never any other kind of file (see `remove_socket`).  The socket is
+    created only accessible to the current user, so there's no window where anyone
+    else can connect
+    """
+    remove_socket(path)
+
+    umask = os.umask(0o077)
+    try:
+        server = await loop.create_unix_server(protocol_factory, path)
+    finally:
+        os.umask(umask)
+
+    os.chmod(path, 0o600)
+    return server
@@ -7,9 +7,10 @@ logger = logging.getLogger(__name__)
 
 class FileWatcher:
     """
-    Class to handle actions on file change
+    Class to handle actions on file change.  Checks run on `scheduler` (a
+    `TimerWheel`) if given, otherwise on the loop directly
     """
-    def __init__(self, filename, change_func, loop=None, check_interval=60):
+    def __init__(self, filename, change_func, loop=None, check_interval=60, scheduler=None):
         self._last_modified = self.get_last_modified_time(filename)
         self.check_interval = check_interval
 
@@ -17,6 +18,9 @@ class FileWatcher:
         self.change_func = change_func
 
         self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.scheduler = scheduler
+        self.timer = None
+        self._checking = None
 
     def get_last_modified_time(self, filename):
         """
@@ -27,18 +31,44 @@ class FileWatcher:
     def check_watched_file(self):
         """
         Check if the watched file has changed.  If so, run function passed on
-        init
+        init.  The file is checked in a worker thread, so a slow disk doesn't hold
+        up the loop; returns the future for the check
         """
-        current_last_mod = self.get_last_modified_time(self.filename)
+        # Don't pile up checks if a previous one hasn't returned yet
+        if self._checking is not None and not self._checking.done():
+            return self._checking
+
+        self._checking = self.loop.run_in_executor(None, self.get_last_modified_time, self.filename)
+        self._checking.add_done_callback(self._on_checked)
+        return self._checking
+
+    def _on_checked(self, future):
+        if future.cancelled():
+            return
+
+        try:
+            current_last_mod = future.result()
+        except OSError as error:
+            logger.warning('Could not check {}: {}'.format(self.filename, error))
+            return
 
         if current_last_mod != self._last_modified:
             self._last_modified = current_last_mod
             self.change_func()
 
-        self.loop.call_later(self.check_interval, self.check_watched_file)
+    def _check_periodically(self):
+        self.check_watched_file()
+        self.timer = self.loop.call_later(self.check_interval, self._check_periodically)
 
     def start(self):
         """
         Initiate the watching loop
         """
-        self.loop.call_later(self.check_interval, self.check_watched_file)
+        if self.scheduler is not None:
+            self.timer = self.scheduler.call_every(self.check_interval, self.check_watched_file)
+        else:
+            self.timer = self.loop.call_later(self.check_interval, self._check_periodically)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
@@ -0,0 +1,120 @@
+from unittest import TestCase
+import asyncio
+import os
+
+from chat_transformer.activity import ActivityTracker, StatCommand
+from chat_transformer.client import TransformerClient
+
+from .utils import FakeClock
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ActivityTrackerTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.tracker = ActivityTracker(clock=self.clock)
+
+    def test_windows(self):
+        """
+        Each window should only count messages from within it
+        """
+        self.tracker.record('volume', 'alice', 0.0, 0.5)
+        self.clock.now += 30
+        self.tracker.record('volume', 'bob', 0.5, 0.25)
+        self.tracker.record('volume', 'Bob', 0.25, 0.3)
+        self.clock.now += 5
+
+        self.assertEqual(self.tracker.window('volume', 10), {'rate': 0.2, 'change': -0.2, 'users': 1})
+        self.assertEqual(self.tracker.window('volume', 60), {'rate': 0.05, 'change': 0.3, 'users': 2})
+        self.assertEqual(list(self.tracker.summary('volume')), ['10s', '1m', '5m'])
+
+    def test_buffers_wrap(self):
+        """
+        Buckets older than the longest window should be reused, not counted
+        """
+        self.tracker.record('volume', 'alice')
+        self.clock.now += 300
+        self.tracker.record('volume', 'bob')
+
+        self.assertEqual(self.tracker.window('volume', 300)['rate'], round(1 / 300, 3))
+        self.assertEqual(self.tracker.window('volume', 300)['users'], 1)
+        self.assertEqual(len(self.tracker.activity['volume'].counts), 300)
+
+    def test_unique_users_estimate(self):
+        for user in range(500):
+            self.tracker.record('volume', 'user{}'.format(user))
+
+        self.assertAlmostEqual(self.tracker.window('volume', 10)['users'], 500, delta=50)
+
+    def test_integer_changes(self):
+        """
+        Changes should be counted for any numbers, not just floats
+        """
+        self.tracker.record('brightness', 'alice', 0, 5)
+        self.tracker.record('brightness', 'bob', 5, 2.5)
+        self.tracker.record('color', 'bob', (0.0, 0.0), (1.0, 1.0))
+
+        self.assertEqual(self.tracker.window('brightness', 10)['change'], 2.5)
+        self.assertEqual(self.tracker.window('color', 10)['change'], 0.0)
+
+    def test_check_window(self):
+        self.tracker.check_window(300)
+
+        for window in (301, 0):
+            with self.assertRaises(ValueError):
+                self.tracker.check_window(window)
+
+    def test_no_activity(self):
+        self.assertEqual(self.tracker.window('speed', 10), {'rate': 0.0, 'change': 0.0, 'users': 0})
+
+    def test_summary_msg(self):
+        tracker = ActivityTracker(windows=(10,), clock=self.clock)
+        tracker.record('volume', 'alice', 0.0, 0.5)
+
+        self.assertEqual(tracker.summary_msg('volume'), 'VOLUME 10s: 0.1/s, +0.5, 1 users')
+
+
+class StatCommandTests(TestCase):
+    def test_refresh(self):
+        clock = FakeClock(1000.0)
+        tracker = ActivityTracker(clock=clock)
+        command = StatCommand(name='volume_rate', command='Volume', metric='rate', window=10)
+
+        self.assertEqual(command.allowed_actions, ['get'])
+        self.assertFalse(command.refresh(tracker))
+
+        tracker.record('volume')
+        self.assertTrue(command.refresh(tracker))
+        self.assertEqual(command.current, 0.1)
+
+    def test_bounds(self):
+        """
+        Stats have no upper bound, which replies shouldn't claim they do
+        """
+        command = StatCommand(name='volume_users', command='volume', metric='users', window=10)
+        command.current = 2.0
+
+        self.assertEqual((command.min, command.max), (0.0, float('inf')))
+        self.assertEqual(command.run_action('get').irc_message, 'VOLUME_USERS is at 2.0')
+
+    def test_window_longer_than_kept(self):
+        """
+        Stat commands over a window longer than the tracker keeps should be rejected
+        """
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        with self.assertRaises(ValueError):
+            TransformerClient(
+                commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+                activity_data={
+                    'windows': [10, 60],
+                    'commands': {'volume_rate': {'command': 'volume', 'window': 300}},
+                },
+                loop=loop,
+            )
+
+    def test_invalid_metric(self):
+        with self.assertRaises(ValueError):
+            StatCommand(name='volume_rate', command='volume', metric='median')
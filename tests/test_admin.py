@@ -0,0 +1,163 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import asyncio
+import json
+import os
+import tempfile
+
+from chat_transformer.admin import AdminProtocol, encode_response
+from chat_transformer.client import TransformerClient
+from chat_transformer.commands import VectorCommand
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class AdminServerTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'admin.sock')
+
+        self.client = TransformerClient(
+            commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+            output_data={'osc': {'port': 6789}},
+            irc_engine='lean',
+            admin_data={'path': self.path},
+            loop=self.loop,
+        )
+        self.admin = self.client.admin
+        self.client.commands['color'] = VectorCommand(
+            name='color', initial=[0.0, 0.0, 0.0], outputs={'osc': {'address': '/light/color'}}
+        )
+
+    def tearDown(self):
+        self.admin.cleanup()
+        self.loop.close()
+        self.directory.cleanup()
+
+    def request(self, **request):
+        return self.admin.handle_request(json.dumps(request).encode('utf-8'))
+
+    def test_dump(self):
+        self.client.unready_outputs.add('osc')
+        response = self.request(op='dump')
+
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['commands']['volume'], {'value': 0.5, 'initial': 0.5, 'min': 0.0, 'max': 1.0})
+        self.assertEqual(response['outputs']['osc'], {'ready': False, 'paused': False, 'stats': None})
+        self.assertEqual(response['irc'], {'connected': False})
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_set(self, mock_send):
+        response = self.request(op='set', values={'volume': 2.0, 'color': '1,0.5,0', 'missing': 1})
+
+        self.assertEqual(response, {'ok': True, 'set': ['volume', 'color']})
+        self.assertEqual(self.client.command_value('volume'), 1.0)
+        self.assertEqual(self.client.command_value('color'), (1.0, 0.5, 0.0))
+        mock_send.assert_any_call(1.0, address='/audio/volume')
+        mock_send.assert_any_call((1.0, 0.5, 0.0), address='/light/color')
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_invalid_set_changes_nothing(self, mock_send):
+        response = self.request(op='set', values={'volume': 0.1, 'color': [1, 0.5]})
+
+        self.assertFalse(response['ok'])
+        self.assertEqual(self.client.command_value('volume'), 0.5)
+        mock_send.assert_not_called()
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_pause_and_resume(self, mock_send):
+        self.assertEqual(self.request(op='pause', output='osc'), {'ok': True})
+        self.client.parse_command('volume set 0.7')
+        mock_send.assert_not_called()
+
+        self.assertEqual(self.request(op='resume', output='osc'), {'ok': True})
+        mock_send.assert_any_call(0.7, address='/audio/volume', min=0.0, max=1.0)
+
+        self.assertEqual(self.request(op='pause', output='http'), {'ok': False, 'error': 'No output "http"'})
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_send_all(self, mock_send):
+        self.assertEqual(self.request(op='send_all', commands=['volume']), {'ok': True})
+        mock_send.assert_called_once_with(0.5, address='/audio/volume', min=0.0, max=1.0)
+
+    def test_bad_requests(self):
+        self.assertFalse(self.admin.handle_request(b'not json')['ok'])
+        self.assertFalse(self.request(values={})['ok'])
+        self.assertEqual(self.request(op='explode'), {'ok': False, 'error': 'Unknown op "explode"'})
+        self.assertFalse(self.request(op='dump', extra=True)['ok'])
+        self.assertEqual(self.request(op='set', values=[1]), {
+            'ok': False, 'error': '"values" must be an object of command names to values',
+        })
+
+    def test_socket(self):
+        """
+        Requests over the socket should get one line of JSON back each
+        """
+        async def talk():
+            await self.admin.start()
+            reader, writer = await asyncio.open_unix_connection(self.path)
+            writer.write(b'{"op": "dump"}\n{"op": "explode"}\n')
+
+            responses = []
+            for _ in range(2):
+                responses.append(json.loads((await reader.readline()).decode('utf-8')))
+
+            writer.close()
+            await asyncio.sleep(0.01)
+            return responses
+
+        dump, error = self.loop.run_until_complete(talk())
+
+        self.assertEqual(dump['commands']['color']['value'], [0.0, 0.0, 0.0])
+        self.assertFalse(error['ok'])
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_long_requests_are_dropped(self):
+        """
+        A request longer than `max_line_length` should be dropped without being
+        buffered, and the next one answered
+        """
+        protocol = AdminProtocol(self.admin)
+        protocol.connection_made(MagicMock())
+
+        with self.assertLogs('chat_transformer.inputs.base', level='WARNING'):
+            protocol.data_received(b'{"op": "' + b'x' * AdminProtocol.max_line_length)
+
+        self.assertEqual(protocol.buffer, b'')
+
+        protocol.data_received(b'"}\n{"op": "explode"}\n')
+
+        protocol.transport.write.assert_called_once_with(
+            encode_response({'ok': False, 'error': 'Unknown op "explode"'})
+        )
+
+    def test_socket_replaces_only_sockets(self):
+        """
+        A socket left over at the path should be replaced, but any other file kept,
+        and the umask left as it was
+        """
+        with open(self.path, 'w') as other_file:
+            other_file.write('important')
+
+        with self.assertRaises(FileExistsError):
+            self.loop.run_until_complete(self.admin.start())
+
+        with self.assertLogs('chat_transformer.admin', level='WARNING'):
+            self.admin.cleanup()
+
+        with open(self.path) as other_file:
+            self.assertEqual(other_file.read(), 'important')
+
+        os.remove(self.path)
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+
+        self.loop.run_until_complete(self.admin.start())
+        self.admin.server.close()
+        self.loop.run_until_complete(self.admin.start())
+
+        self.assertEqual(os.umask(0o022), 0o022)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
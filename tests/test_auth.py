@@ -0,0 +1,58 @@
+from unittest import TestCase
+from unittest.mock import patch
+import hashlib
+import hmac
+
+from chat_transformer.outputs.auth import BaseAuth, BearerAuth, HMACAuth, JWTAuth, auth_from_config
+
+
+class AuthTests(TestCase):
+    @patch('time.time')
+    def test_jwt_token_is_reused_until_refresh(self, mock_time):
+        """
+        The same headers should be returned until `refresh_margin` before the token
+        expires, and a new token signed after that
+        """
+        auth = JWTAuth('this-is-a-fake-key-dont-use-elsewhere', token_length=30, refresh_margin=0.2)
+
+        mock_time.return_value = 1000.0
+        headers = auth.get_headers()
+        self.assertTrue(headers['Authorization'].startswith('Bearer '))
+
+        mock_time.return_value = 1023.9
+        self.assertIs(auth.get_headers(), headers)
+
+        mock_time.return_value = 1024.0
+        refreshed = auth.get_headers()
+        self.assertIsNot(refreshed, headers)
+        self.assertNotEqual(refreshed['Authorization'], headers['Authorization'])
+
+    def test_bearer_auth(self):
+        auth = BearerAuth('abc123')
+
+        self.assertEqual(auth.get_headers(), {'Authorization': 'Bearer abc123'})
+        self.assertIs(auth.get_headers(), auth.get_headers())
+
+    @patch('time.time')
+    def test_hmac_auth_signs_timestamp_and_body(self, mock_time):
+        mock_time.return_value = 1534659178.4787898
+        auth = HMACAuth('secret')
+
+        headers = auth.get_headers(b'{"value": 0.5}')
+
+        self.assertEqual(headers['X-Timestamp'], '1534659178')
+        self.assertEqual(
+            headers['X-Signature'],
+            hmac.new(b'secret', b'1534659178.{"value": 0.5}', hashlib.sha256).hexdigest(),
+        )
+
+    def test_auth_from_config(self):
+        auth = auth_from_config({'class': 'hmac', 'secret': 'secret', 'algorithm': 'sha1'})
+        self.assertIsInstance(auth, HMACAuth)
+        self.assertIs(auth.digest, hashlib.sha1)
+
+        auth = auth_from_config({'class': 'chat_transformer.outputs.auth.BaseAuth'})
+        self.assertIsInstance(auth, BaseAuth)
+
+        auth = auth_from_config({'token': 'abc123'})
+        self.assertIsInstance(auth, BearerAuth)
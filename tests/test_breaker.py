@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from chat_transformer.outputs.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, cache_size=2, clock=lambda: self.now)
+
+    def test_opens_after_threshold(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertFalse(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.record_success(), [])
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_allows_one_trial(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.now = 10.0
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        # A failed trial re-opens the breaker straight away
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.now = 20.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_cache_keeps_latest_values(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.breaker.cache_value('brightness', 0.1)
+        self.breaker.cache_value('volume', 0.2)
+        self.breaker.cache_value('brightness', 0.3)
+        self.breaker.cache_value('contrast', 0.4)
+
+        self.assertEqual(self.breaker.stats['dropped'], 1)
+        self.assertEqual(self.breaker.record_success(), [0.3, 0.4])
+        self.assertEqual(len(self.breaker.cache), 0)
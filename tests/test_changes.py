@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from chat_transformer.changes import ChangeDetector
+
+
+class ChangeDetectorTests(TestCase):
+    def test_first_value_is_always_a_change(self):
+        detector = ChangeDetector()
+        self.assertTrue(detector.has_changed('volume', 'osc', 0.5))
+
+    def test_repeated_value_is_not_a_change(self):
+        """
+        Sending the same value to the same output twice should only count once,
+        but other outputs and commands are tracked separately
+        """
+        detector = ChangeDetector()
+        detector.has_changed('volume', 'osc', 0.5)
+
+        self.assertFalse(detector.has_changed('volume', 'osc', 0.5))
+        self.assertTrue(detector.has_changed('volume', 'http', 0.5))
+        self.assertTrue(detector.has_changed('brightness', 'osc', 0.5))
+        self.assertTrue(detector.has_changed('volume', 'osc', 0.55))
+
+    def test_epsilon(self):
+        """
+        Changes within `epsilon` of the last value sent should be skipped, but
+        should add up over several updates
+        """
+        detector = ChangeDetector(epsilon=0.1)
+        detector.has_changed('volume', 'osc', 0.5)
+
+        self.assertFalse(detector.has_changed('volume', 'osc', 0.55))
+        self.assertFalse(detector.has_changed('volume', 'osc', 0.6))
+        self.assertTrue(detector.has_changed('volume', 'osc', 0.65))
+
+    def test_non_numeric_values(self):
+        detector = ChangeDetector(epsilon=0.1)
+        detector.has_changed('message', 'http', 'hello')
+
+        self.assertFalse(detector.has_changed('message', 'http', 'hello'))
+        self.assertTrue(detector.has_changed('message', 'http', 'goodbye'))
+
+    def test_vector_values(self):
+        """
+        Vectors should be compared componentwise, each within `epsilon`
+        """
+        detector = ChangeDetector(epsilon=0.1)
+        detector.has_changed('color', 'osc', (0.5, 0.5, 0.5))
+
+        self.assertFalse(detector.has_changed('color', 'osc', (0.55, 0.5, 0.45)))
+        self.assertTrue(detector.has_changed('color', 'osc', (0.5, 0.5, 0.7)))
+        self.assertTrue(detector.has_changed('color', 'osc', (0.5, 0.5)))
+
+    def test_forget(self):
+        """
+        `forget` should clear recorded values by command, by output, or entirely
+        """
+        detector = ChangeDetector()
+        for command in ('volume', 'brightness'):
+            for output in ('osc', 'http'):
+                detector.has_changed(command, output, 0.5)
+
+        detector.forget(output_name='osc')
+        self.assertTrue(detector.has_changed('volume', 'osc', 0.5))
+        self.assertFalse(detector.has_changed('volume', 'http', 0.5))
+
+        detector.forget(command_name='brightness')
+        self.assertTrue(detector.has_changed('brightness', 'http', 0.5))
+        self.assertFalse(detector.has_changed('volume', 'http', 0.5))
+
+        detector.forget()
+        self.assertTrue(detector.has_changed('volume', 'http', 0.5))
@@ -0,0 +1,91 @@
+from unittest import TestCase
+import asyncio
+import json
+import os
+import socket
+import tempfile
+
+from chat_transformer.cli import CLI
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeClient:
+    def __init__(self, loop):
+        self.loop = loop
+        self.reloaded = []
+
+    async def reload_outputs(self, outputs):
+        self.reloaded.append(outputs)
+
+
+class ReloadConfigTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.directory.name, 'config.json')
+
+        self.cli = CLI()
+        self.cli.config = {'irc': {'server': 'irc.example.com'}, 'outputs': {}}
+        self.client = FakeClient(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        self.directory.cleanup()
+
+    def reload(self, config):
+        with open(self.config_file, 'w') as config_file:
+            json.dump(config, config_file)
+
+        self.loop.run_until_complete(self.cli.reload_config(self.config_file, self.client))
+
+    def test_restart_warnings_are_only_logged_once(self):
+        """
+        Changes that need a restart should be warned about when they're first seen,
+        not on every reload after
+        """
+        config = {'irc': {'server': 'irc.example.net'}, 'outputs': {'osc': {'port': 6789}}}
+
+        with self.assertLogs('chat_transformer.cli', level='WARNING') as logs:
+            self.reload(config)
+
+        self.assertEqual(len([line for line in logs.output if 'WARNING' in line]), 1)
+
+        config['outputs']['osc']['port'] = 6790
+
+        with self.assertLogs('chat_transformer.cli', level='INFO') as logs:
+            self.reload(config)
+
+        self.assertFalse([line for line in logs.output if 'WARNING' in line])
+        self.assertEqual(self.client.reloaded, [{'osc': {'port': 6789}}, {'osc': {'port': 6790}}])
+
+
+class StartupTests(TestCase):
+    def test_startup_error_exits(self):
+        """
+        If the startup policy isn't met, the CLI should log why and exit non-zero,
+        closing the loop, rather than raising
+        """
+        # A port nothing is listening on
+        with socket.socket() as free:
+            free.bind(('127.0.0.1', 0))
+            port = free.getsockname()[1]
+
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = os.path.join(directory, 'config.json')
+
+            with open(config_file, 'w') as config:
+                json.dump({
+                    'irc': {'server': '127.0.0.1', 'port': port, 'nickname': 'fake_irc_nick', 'engine': 'lean'},
+                    'commands': {'filename': os.path.join(TEST_DIR, 'test_commands_file.json')},
+                    'outputs': {},
+                    'startup': {'timeout': 1.0},
+                }, config)
+
+            with self.assertLogs('chat_transformer.cli', level='ERROR'), self.assertRaises(SystemExit) as exit:
+                CLI().run(['-c', config_file, '-v', '0'])
+
+        self.assertEqual(exit.exception.code, 1)
+        self.assertTrue(asyncio.get_event_loop().is_closed())
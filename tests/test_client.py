@@ -1,9 +1,17 @@
 import os
+import json
 import asyncio
+import tempfile
+from collections import OrderedDict
 from unittest import TestCase
 from unittest.mock import patch, MagicMock, call
 
-from chat_transformer.client import TransformerClient
+import aiohttp
+
+from chat_transformer.client import TransformerClient, StartupError
+from chat_transformer.outputs.base import BaseOutput
+from chat_transformer.outputs.http import HTTPOutput
+from chat_transformer.outputs.queued import QueuedOutput
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -21,6 +29,50 @@ class MockCommand:
         self.max = max
 
 
+class BatchingOutput(BaseOutput):
+    batching = True
+
+    def __init__(self):
+        self.batches = []
+
+    async def send_many(self, updates):
+        self.batches.append(list(updates))
+
+
+class FakeOutput(BaseOutput):
+    """
+    Output that records what it's sent, and can be made to fail to connect
+    """
+    def __init__(self, target='', fail=False):
+        self.target = target
+        self.fail = fail
+        self.sent = []
+        self.cleaned_up = False
+
+    async def connect(self):
+        if self.fail:
+            raise ConnectionRefusedError('Connection refused')
+
+    def send(self, value, **kwargs):
+        self.sent.append(value)
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+class TracedOutput(FakeOutput):
+    """
+    Output that records the id of the current trace when it's sent to
+    """
+    def __init__(self):
+        super().__init__()
+        self.traces = []
+
+    def send(self, value, **kwargs):
+        super().send(value, **kwargs)
+        self.traces.append(self.tracer.current.id)
+
+
 class TransformerClientTests(TestCase):
     def create_connection_mock(self):
         fake_connection = asyncio.Future()
@@ -108,6 +160,19 @@ class TransformerClientTests(TestCase):
         self.assertEqual(self.client.command_value('volume'), 0.5)
         mock_send.assert_not_called()
 
+    def test_invalid_action_logs_are_rate_limited(self):
+        """
+        A flood of invalid actions should only log the first few, then a summary
+        """
+        with self.assertLogs('chat_transformer.client', level='ERROR') as cm:
+            for _ in range(100):
+                self.client.parse_command('volume foo')
+
+            self.client.invalid_action_log.flush()
+
+        self.assertEqual(len(cm.output), 11)
+        self.assertIn('Suppressed 90 similar message(s)', cm.output[-1])
+
     @patch('chat_transformer.outputs.osc.OSCOutput.send')
     def test_non_existing_command_produces_no_response(self, mock_send):
         """
@@ -167,3 +232,601 @@ class TransformerClientTests(TestCase):
         ]
 
         mock_send.assert_has_calls(expected, any_order=True)
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_full_queue_does_not_stop_other_outputs(self, mock_send):
+        """
+        An output rejecting an update because its queue is full shouldn't keep it
+        from the outputs after it
+        """
+        full = QueuedOutput(FakeOutput(), maxsize=1, overflow='error', loop=self.loop)
+        full.start()
+        full.send(0.0)
+        self.client.outputs = OrderedDict([('full', full), ('osc', self.client.outputs['osc'])])
+        self.client.commands['volume'].outputs = OrderedDict([
+            ('full', {'address': '/audio/volume'}),
+            ('osc', {'address': '/audio/volume'}),
+        ])
+
+        with self.assertLogs('chat_transformer.outputs.queued', level='ERROR'):
+            self.client.parse_command('volume set 0.7')
+
+        mock_send.assert_called_with(0.7, address='/audio/volume')
+        self.assertEqual(full.stats['rejected'], 1)
+        full.cleanup()
+
+    def test_batching_outputs_receive_one_batch(self):
+        """
+        Updates for outputs that support batching should be collected and passed
+        as one batch at the end of the loop iteration
+        """
+        output = BatchingOutput()
+        self.client.outputs['batch'] = output
+        self.client.commands['volume'].outputs = {'batch': {'address': '/audio/volume'}}
+
+        self.client.parse_command('volume increment')
+        self.client.parse_command('volume increment')
+        self.assertEqual(output.batches, [])
+
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+        self.assertEqual(len(output.batches), 1)
+        first, second = output.batches[0]
+        self.assertAlmostEqual(first.value, 0.55)
+        self.assertAlmostEqual(second.value, 0.6)
+        self.assertEqual(first.params, {'address': '/audio/volume'})
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_skip_unchanged(self, mock_send):
+        """
+        With `skip_unchanged`, a "get" or a "set" to the current value shouldn't resend
+        the value, unless `send_all` is forced
+        """
+        client = TransformerClient(
+            commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+            output_data={'osc': {'port': 6789}},
+            loop=self.loop,
+            skip_unchanged=True,
+        )
+        client.outputs = self.client.outputs
+        client.connection = self.client.connection
+
+        client.send_all()
+        self.assertEqual(mock_send.call_count, 2)
+
+        client.parse_command('volume get')
+        client.parse_command('volume set 0.5')
+        client.send_all()
+        self.assertEqual(mock_send.call_count, 2)
+
+        client.parse_command('volume set 0.6')
+        mock_send.assert_called_with(0.6, address='/audio/volume')
+        self.assertEqual(mock_send.call_count, 3)
+
+        client.send_all(force=True)
+        self.assertEqual(mock_send.call_count, 5)
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_array_command_storage(self, mock_send):
+        """
+        With array-backed command storage, commands should behave the same, and
+        `send_all` should send every command's value
+        """
+        client = TransformerClient(
+            commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+            output_data={'osc': {'port': 6789}},
+            loop=self.loop,
+            command_storage='array',
+        )
+        client.outputs = self.client.outputs
+        client.connection = self.client.connection
+
+        client.parse_command('volume set 0.73')
+        self.assertAlmostEqual(client.command_value('volume'), 0.73)
+        mock_send.assert_called_with(0.73, address='/audio/volume')
+
+        client.send_all()
+        mock_send.assert_has_calls([
+            call(0.73, address='/audio/volume', min=0.0, max=1.0),
+            call(0, address='/video/bc/brightness', min=-100, max=100),
+        ])
+
+    @patch('random.random')
+    def test_disconnect_schedules_reconnect_with_backoff(self, mock_random):
+        """
+        Losing the IRC connection should schedule a reconnect, backing off exponentially
+        (up to `reconnect_max_delay`) with each failed attempt
+        """
+        mock_random.return_value = 0.0
+        self.client.reconnect_max_delay = 5.0
+
+        with patch.object(self.loop, 'call_later') as mock_call_later:
+            delays = []
+            for _ in range(5):
+                self.client.on_disconnect(None, None)
+                delays.append(mock_call_later.call_args[0][0])
+                self.client._reconnect_handle = None
+
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 5.0, 5.0])
+
+        self.client.on_welcome(None, None)
+        self.assertEqual(self.client._reconnect_attempts, 0)
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.connect')
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_reconnect_only_reconnects_irc(self, mock_send, mock_output_connect):
+        """
+        Reconnecting should only re-establish the IRC connection, without
+        reconnecting or resending to the outputs
+        """
+        with patch.object(self.client.connection, 'connect') as mock_irc_connect:
+            async def fake_connect(*args, **kwargs):
+                pass
+            mock_irc_connect.side_effect = fake_connect
+
+            self.client.reconnect_min_delay = 0
+            self.client.on_disconnect(None, None)
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+
+            mock_irc_connect.assert_called_once_with('my.fake.irc.server', 6667, 'fake_irc_nick')
+
+        mock_output_connect.assert_not_called()
+        mock_send.assert_not_called()
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_commands_decay_toward_initial(self, mock_send):
+        """
+        Commands with a `decay` should move back toward their initial value over time,
+        sending each new value, and stop once they get there
+        """
+        self.client.scheduler.tick = 0.01
+        self.client.decay_interval = 0.01
+        self.client.commands['volume'].decay = 5.0
+
+        self.client.parse_command('volume set 0.6')
+        self.assertIsNotNone(self.client._decay_timer)
+
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+
+        self.assertEqual(self.client.command_value('volume'), 0.5)
+        self.assertGreater(mock_send.call_count, 2)
+        mock_send.assert_called_with(0.5, address='/audio/volume')
+        self.assertIsNone(self.client._decay_timer)
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_commands_reset_after_inactivity(self, mock_send):
+        """
+        Commands with `reset_after` should go back to their initial value once there's
+        been no action on them for that long
+        """
+        self.client.scheduler.tick = 0.01
+        self.client.commands['volume'].reset_after = 0.05
+
+        self.client.parse_command('volume set 0.8')
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+        self.client.parse_command('volume set 0.9')
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+
+        # The second action pushed the reset back
+        self.assertEqual(self.client.command_value('volume'), 0.9)
+
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.assertEqual(self.client.command_value('volume'), 0.5)
+        mock_send.assert_called_with(0.5, address='/audio/volume')
+        self.assertEqual(self.client._reset_timers, {})
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_vector_command(self, mock_send):
+        """
+        Vector commands from the commands file should send all of their components
+        as a single update
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as commands_file:
+            json.dump({
+                'color': {
+                    'type': 'vector',
+                    'initial': [0.0, 0.0, 0.0],
+                    'allowed_actions': ['set'],
+                    'outputs': {'osc': {'address': '/light/color'}},
+                },
+            }, commands_file)
+
+        self.addCleanup(os.remove, commands_file.name)
+        self.client.commands_file = commands_file.name
+        self.client.load_commands()
+
+        self.client.parse_command('color set 1,0.5,0')
+
+        mock_send.assert_called_once_with((1.0, 0.5, 0.0), address='/light/color')
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.cleanup')
+    def test_reload_outputs(self, mock_cleanup):
+        """
+        Reloading outputs should add new ones, replace changed ones once the new one
+        has connected, remove old ones, and leave unchanged ones alone
+        """
+        fake_class = 'tests.test_client.FakeOutput'
+        self.client.commands['volume'].outputs = {'fake': {}}
+        self.loop.run_until_complete(self.client.reload_outputs({
+            'osc': {'port': 6789},
+            'fake': {'class': fake_class, 'target': 'a'},
+        }))
+
+        osc = self.client.outputs['osc']
+        first = self.client.outputs['fake']
+        self.assertEqual(first.target, 'a')
+
+        # New outputs are sent every value
+        self.assertEqual(first.sent, [0.5])
+
+        # A replacement that can't connect leaves the old output in place
+        with self.assertLogs('chat_transformer.client', level='ERROR'):
+            self.loop.run_until_complete(self.client.reload_outputs({
+                'osc': {'port': 6789},
+                'fake': {'class': fake_class, 'target': 'b', 'fail': True},
+            }))
+
+        self.assertIs(self.client.outputs['fake'], first)
+        self.assertFalse(first.cleaned_up)
+
+        self.loop.run_until_complete(self.client.reload_outputs({
+            'fake': {'class': fake_class, 'target': 'c'},
+        }))
+
+        self.assertEqual(self.client.outputs['fake'].target, 'c')
+        self.assertTrue(first.cleaned_up)
+        self.assertNotIn('osc', self.client.outputs)
+        mock_cleanup.assert_called_once_with()
+
+        # For tearDown
+        self.client.outputs['osc'] = osc
+
+    @patch('aiohttp.ClientSession.post')
+    def test_reload_outputs_keeps_the_spool(self, mock_post):
+        """
+        Replacing an HTTP output while its target is down shouldn't lose anything
+        either output spooled, including what the old one spools while the new one
+        is connecting
+        """
+        def run_pending():
+            self.loop.run_until_complete(asyncio.gather(*asyncio.Task.all_tasks(loop=self.loop)))
+
+        connect = HTTPOutput.connect
+
+        async def slow_connect(output):
+            await connect(output)
+            await asyncio.sleep(0.05)
+
+        mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = {
+                'base_url': 'https://test.url/',
+                'breaker': {'failure_threshold': 1, 'reset_timeout': 60.0},
+                'spool': {'path': os.path.join(directory, 'spool'), 'replay_rate': 1000},
+            }
+
+            with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+                self.loop.run_until_complete(self.client.reload_outputs({'osc': {'port': 6789}, 'http': config}))
+                old = self.client.outputs['http']
+
+                # Enough to be written through to disk
+                for index in range(300):
+                    old.send(index, command_name='command{}'.format(index))
+                run_pending()
+
+                with patch.object(HTTPOutput, 'connect', slow_connect):
+                    reload = asyncio.ensure_future(self.client.reload_outputs(
+                        {'osc': {'port': 6789}, 'http': dict(config, timeout=5.0)}
+                    ), loop=self.loop)
+
+                    # The new output has replayed the spool, and the old one is still in use
+                    self.loop.run_until_complete(asyncio.sleep(0.02))
+                    self.assertIs(self.client.outputs['http'], old)
+
+                    old.send(300, command_name='command300')
+                    self.loop.run_until_complete(reload)
+
+                new = self.client.outputs['http']
+                self.assertIsNot(new, old)
+
+                new.send(301, command_name='command301')
+                run_pending()
+
+            spooled = self.loop.run_until_complete(new.spool_call(new.spool.latest))
+            new.cleanup()
+
+            self.assertEqual(sorted(spooled.values()), sorted(
+                '{{"value":{},"name":"command{}"}}'.format(index, index).encode('utf-8') for index in range(302)
+            ))
+
+    def test_reload_outputs_abandons_stale_reloads(self):
+        """
+        A reload that's overtaken by another shouldn't swap in its outputs
+        """
+        fake_class = 'tests.test_client.FakeOutput'
+        stale = asyncio.ensure_future(self.client.reload_outputs({
+            'osc': {'port': 6789},
+            'fake': {'class': fake_class, 'target': 'old'},
+        }), loop=self.loop)
+        self.loop.run_until_complete(self.client.reload_outputs({
+            'osc': {'port': 6789},
+            'fake': {'class': fake_class, 'target': 'new'},
+        }))
+        self.loop.run_until_complete(stale)
+
+        self.assertEqual(self.client.outputs['fake'].target, 'new')
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_reload_commands(self, mock_send):
+        """
+        Reloading should reuse unchanged commands, rebuild changed ones keeping their
+        current values, skip unchanged files, and keep the old commands if the file is bad
+        """
+        definitions = {
+            'volume': {'initial': 0.5, 'allowed_actions': ['set'], 'outputs': {'osc': {'address': '/volume'}}},
+            'speed': {'initial': 0.1, 'outputs': {'osc': {'address': '/speed'}}},
+        }
+
+        def write_commands(contents):
+            with open(commands_file.name, 'w') as new_file:
+                new_file.write(contents)
+
+            # Make sure the file's signature changes, however coarse the clock
+            stat = os.stat(commands_file.name)
+            os.utime(commands_file.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as commands_file:
+            json.dump(definitions, commands_file)
+
+        self.addCleanup(os.remove, commands_file.name)
+        self.client.commands_file = commands_file.name
+        self.client.load_commands()
+        self.client.parse_command('volume set 0.75')
+        volume, speed = self.client.commands['volume'], self.client.commands['speed']
+
+        self.assertFalse(self.loop.run_until_complete(self.client.reload_commands()))
+
+        definitions['volume']['max'] = 2.0
+        write_commands(json.dumps(definitions))
+        self.assertTrue(self.loop.run_until_complete(self.client.reload_commands()))
+
+        self.assertIs(self.client.commands['speed'], speed)
+        self.assertIsNot(self.client.commands['volume'], volume)
+        self.assertEqual(self.client.commands['volume'].max, 2.0)
+        self.assertEqual(self.client.commands['volume'].current, 0.75)
+
+        write_commands('{"volume": ')
+        with self.assertLogs('chat_transformer.client', level='ERROR'):
+            self.assertFalse(self.loop.run_until_complete(self.client.reload_commands()))
+
+        self.assertEqual(self.client.commands['volume'].max, 2.0)
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_reload_commands_resends_changed_definitions(self, mock_send):
+        """
+        With `skip_unchanged`, commands whose definitions changed should be sent in
+        full after a reload, even though their values haven't
+        """
+        definitions = {
+            'volume': {'initial': 0.5, 'outputs': {'osc': {'address': '/volume'}}},
+            'speed': {'initial': 0.1, 'outputs': {'osc': {'address': '/speed'}}},
+        }
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as commands_file:
+            json.dump(definitions, commands_file)
+
+        self.addCleanup(os.remove, commands_file.name)
+        client = TransformerClient(
+            commands_file=commands_file.name,
+            output_data={'osc': {'port': 6789}},
+            loop=self.loop,
+            skip_unchanged=True,
+        )
+        client.outputs = self.client.outputs
+        client.send_all()
+        self.assertEqual(mock_send.call_count, 2)
+
+        definitions['volume']['max'] = 2.0
+        with open(commands_file.name, 'w') as new_file:
+            json.dump(definitions, new_file)
+
+        stat = os.stat(commands_file.name)
+        os.utime(commands_file.name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertTrue(self.loop.run_until_complete(client.reload_commands()))
+
+        self.assertEqual(mock_send.call_count, 3)
+        mock_send.assert_called_with(0.5, address='/volume', min=0.0, max=2.0)
+
+    def test_profile_stages(self):
+        """
+        The profiler should be given the client's hot path, and each output class's sends
+        """
+        stages = self.client.profile_stages()
+
+        self.assertEqual(list(stages)[:3], ['irc dispatch', 'parse_command', 'run_action'])
+        self.assertIn(TransformerClient.parse_command.__code__, stages['parse_command'])
+        self.assertEqual(
+            [code.co_name for code in stages['send (osc)']], ['send', 'send_many', 'flush']
+        )
+
+    def test_profile_stages_unwrap_queued_outputs(self):
+        """
+        A queued output's stage should include the wrapped output's sends, which run
+        in its worker, as well as queueing them
+        """
+        self.client.outputs['queued'] = QueuedOutput(FakeOutput(), loop=self.loop)
+        stages = self.client.profile_stages()
+
+        self.assertEqual(
+            [code.co_name for code in stages['send (queued)']], ['send', 'send_full', '_deliver', 'send']
+        )
+        self.assertIn(FakeOutput.send.__code__, stages['send (queued)'])
+
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_tracing(self, mock_send):
+        """
+        With tracing on, sampled messages should be timed through each stage, including
+        batched sends, which finish in the background
+        """
+        from chat_transformer.tracing import Tracer
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.client.tracer = Tracer(sample_rate=1, output=os.path.join(directory, 'trace.json'))
+            self.client.outputs['batch'] = BatchingOutput()
+            self.client.commands['volume'].outputs = {'osc': {'address': '/volume'}, 'batch': {}}
+
+            self.client.handle_messages([('alice', 'volume set 0.7')], received=self.client.tracer.clock())
+            self.assertEqual(self.client.tracer.traced, 0)
+
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+            self.client.tracer.close()
+
+            self.assertEqual(self.client.tracer.traced, 1)
+            self.assertEqual(list(self.client.tracer.stats), [
+                'receive', 'lookup', 'action', 'reply', 'send (osc)', 'queue (batch)', 'send (batch)', 'total',
+            ])
+
+            # Untraced messages are left alone
+            self.client.tracer = None
+            self.client.parse_command('volume set 0.2')
+
+        del self.client.outputs['batch']
+
+    def test_tracing_queued_outputs(self):
+        """
+        Queued outputs should time their sends once they're out of the queue, with the
+        message's trace current while they're sent
+        """
+        from chat_transformer.tracing import Tracer
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.client.tracer = Tracer(sample_rate=1, output=os.path.join(directory, 'trace.json'))
+            self.client.outputs['queued'] = self.client.build_output(
+                'queued', {'class': 'tests.test_client.TracedOutput', 'queue': {}}
+            )
+            self.client.commands['volume'].outputs = {'queued': {}}
+
+            self.client.handle_messages([('alice', 'volume set 0.7')])
+            self.loop.run_until_complete(self.client.outputs['queued'].queue.join())
+            self.client.outputs['queued'].cleanup()
+            self.client.tracer.close()
+
+            self.assertEqual(self.client.tracer.traced, 1)
+            self.assertEqual(self.client.outputs['queued'].output.traces, [1])
+            self.assertEqual(list(self.client.tracer.stats)[-4:], [
+                'enqueue (queued)', 'queue (queued)', 'send (queued)', 'total',
+            ])
+
+        del self.client.outputs['queued']
+
+    @patch('chat_transformer.client.TransformerClient.irc_send')
+    @patch('chat_transformer.outputs.osc.OSCOutput.send')
+    def test_activity(self, mock_send, mock_irc_send):
+        """
+        Activity should be recorded for each command, answer the "stats" action where
+        it's allowed, and be sent to outputs through stat commands
+        """
+        from chat_transformer.activity import ActivityTracker, StatCommand
+
+        self.client.activity = ActivityTracker(windows=(10,))
+        self.client.activity_commands = {'volume_users': StatCommand(
+            name='volume_users', command='volume', metric='users', window=10,
+            outputs={'osc': {'address': '/stats/volume/users'}},
+        )}
+        self.client.commands['volume'].allowed_actions.append('stats')
+        self.client.commands['volume'].outputs = {}
+
+        self.client.parse_command('volume set 0.75', nickname='alice')
+        self.client.parse_command('volume stats', nickname='bob')
+        mock_irc_send.assert_called_with('VOLUME 10s: 0.2/s, +0.25, 2 users')
+
+        self.client.send_activity()
+        mock_send.assert_called_once_with(2.0, address='/stats/volume/users')
+
+        # Stat commands are read-only
+        with self.assertLogs('chat_transformer.client', level='ERROR'):
+            self.client.parse_command('volume_users set 5')
+
+        self.client.parse_command('volume_users get')
+        mock_irc_send.assert_called_with('VOLUME_USERS is at 2.0')
+
+    def test_disconnect_does_not_reconnect(self):
+        """
+        Deliberately disconnecting shouldn't trigger a reconnect
+        """
+        self.client.disconnect()
+        self.assertFalse(self.client.autoreconnect)
+        self.assertIsNone(self.client._reconnect_handle)
+
+    def test_startup_policies(self):
+        """
+        Startup should connect outputs and IRC at the same time, each limited by `connect_timeout`,
+        and only fail if the `startup_policy` isn't met
+        """
+        class HangingOutput(BaseOutput):
+            async def connect(self):
+                await asyncio.sleep(10)
+
+        async def fake_irc_connect(*args, **kwargs):
+            pass
+
+        for policy in ('all', 'irc', 'any'):
+            client = TransformerClient(
+                commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+                loop=self.loop,
+                startup_policy=policy,
+                connect_timeout=0.01,
+                output_retry_interval=0,
+            )
+            client.outputs = {'hanging': HangingOutput()}
+
+            with patch.object(client.connection, 'connect', side_effect=fake_irc_connect):
+                startup = client.connect('my.fake.irc.server', 6667, 'fake_irc_nick')
+
+                if policy == 'all':
+                    with self.assertLogs(level='ERROR'), self.assertRaises(StartupError):
+                        self.loop.run_until_complete(startup)
+                else:
+                    with self.assertLogs(level='ERROR'):
+                        self.loop.run_until_complete(startup)
+
+            self.assertEqual(client.unready_outputs, {'hanging'})
+
+    def test_cleanup_after_partial_startup(self):
+        """
+        Outputs that never connected should clean up without errors, along with the rest
+        """
+        async def fake_irc_connect(*args, **kwargs):
+            pass
+
+        client = TransformerClient(
+            commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+            output_data={'osc': {'port': 6789}},
+            loop=self.loop,
+            startup_policy='irc',
+            output_retry_interval=0,
+        )
+        client.outputs['fake'] = FakeOutput()
+
+        with patch.object(client.connection, 'connect', side_effect=fake_irc_connect), \
+                patch.object(self.loop, 'create_datagram_endpoint', side_effect=OSError('Unreachable')), \
+                self.assertLogs(level='ERROR'):
+            self.loop.run_until_complete(client.connect('my.fake.irc.server', 6667, 'fake_irc_nick'))
+
+        self.assertEqual(client.unready_outputs, {'osc'})
+
+        client.cleanup()
+        self.assertTrue(client.outputs['fake'].cleaned_up)
+
+        self.loop.run_until_complete(client.reload_outputs({}))
+        self.assertEqual(client.outputs, {})
+
+    def test_unready_outputs_are_not_sent_to(self):
+        with patch.object(self.client.outputs['osc'], 'send') as mock_send:
+            self.client.unready_outputs.add('osc')
+            self.client.parse_command('volume increment')
+            self.client.send_all()
+
+        mock_send.assert_not_called()
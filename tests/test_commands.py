@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from chat_transformer.commands import Command, InvalidActionError
+from chat_transformer.commands import Command, InvalidActionError, VectorCommand, command_class
 
 
 class CommandTests(TestCase):
@@ -284,3 +284,128 @@ class CommandTests(TestCase):
             "This is a description of my command",
         )
         self.assertIsNone(response.value)
+
+    def test_no_echo(self):
+        """
+        Calling `run_action` with no action on a command with no "echo" shouldn't
+        create a response at all
+        """
+        command = Command(name='My Command')
+        self.assertIsNone(command.run_action())
+
+    def test_get(self):
+        """
+        Running the "get" action should report the current value and range
+        """
+        command = Command(
+            name='My Command',
+            initial=0.5,
+            min=0.1,
+            max=1.0,
+            allowed_actions=['get'],
+        )
+
+        response = command.run_action('get')
+        self.assertAlmostEqual(response.value, 0.5)
+        self.assertEqual(
+            response.irc_message,
+            'MY COMMAND is at 0.5 (Min 0.1, Max 1.0)'
+        )
+
+    def test_unchanging_responses_are_reused(self):
+        """
+        Responses that can't change between calls, like hitting the max, should be
+        reused rather than rebuilt each time
+        """
+        command = Command(
+            name='My Command',
+            initial=1.0,
+            max=1.0,
+            allowed_actions=['increment', 'set'],
+        )
+
+        self.assertIs(command.run_action('increment'), command.run_action('increment'))
+        self.assertIs(command.run_action('set', 'foo'), command.run_action('set', 'bar'))
+
+    def test_braces_in_name(self):
+        command = Command(name='{odd}', initial=0.5, allowed_actions=['get'])
+        self.assertEqual(
+            command.run_action('get').irc_message,
+            '{ODD} is at 0.5 (Min 0.0, Max 1.0)'
+        )
+
+    def test_no_instance_dict(self):
+        """
+        Commands are created in large numbers, so shouldn't carry a `__dict__`
+        """
+        command = Command(name='My Command')
+        with self.assertRaises(AttributeError):
+            command.__dict__
+
+
+class VectorCommandTests(TestCase):
+    def setUp(self):
+        self.command = VectorCommand(
+            name='color',
+            min=0.0,
+            max=[1.0, 1.0, 2.0],
+            delta=[0.1, 0.2, 0.5],
+            initial=[0.5, 0.5, 0.5],
+            allowed_actions=['get', 'set', 'increment', 'decrement'],
+            outputs={'osc': {'address': '/light/color'}},
+        )
+
+    def test_components(self):
+        self.assertEqual(self.command.size, 3)
+        self.assertEqual(self.command.min, (0.0, 0.0, 0.0))
+        self.assertEqual(self.command.current, (0.5, 0.5, 0.5))
+
+        with self.assertRaises(ValueError):
+            VectorCommand(name='color', min=[0.0, 0.0], max=[1.0, 1.0, 1.0])
+
+    def test_set(self):
+        response = self.command.run_action('set', '1,0.25,0')
+
+        self.assertEqual(self.command.current, (1.0, 0.25, 0.0))
+        self.assertEqual(response.value, (1.0, 0.25, 0.0))
+        self.assertEqual(
+            response.irc_message, 'COLOR is at (1.0, 0.25, 0.0) (Min (0.0, 0.0, 0.0), Max (1.0, 1.0, 2.0))'
+        )
+
+    def test_invalid_set(self):
+        self.assertEqual(
+            self.command.run_action('set', '1,0.25').irc_message,
+            '"COLOR set" requires 3 comma-separated numbers between (0.0, 0.0, 0.0) and (1.0, 1.0, 2.0)',
+        )
+        self.assertEqual(
+            self.command.run_action('set', '1.5,0,0').irc_message,
+            '(1.5, 0.0, 0.0) is out of bounds for COLOR (Min (0.0, 0.0, 0.0), Max (1.0, 1.0, 2.0))',
+        )
+        self.assertEqual(self.command.current, (0.5, 0.5, 0.5))
+
+    def test_increment_and_decrement_clamp_each_component(self):
+        for _ in range(3):
+            self.command.run_action('increment')
+
+        for component, expected in zip(self.command.current, (0.8, 1.0, 2.0)):
+            self.assertAlmostEqual(component, expected)
+
+        response = self.command.run_action('decrement')
+        self.assertEqual(response.value, self.command.current)
+        self.assertAlmostEqual(self.command.current[0], 0.7)
+        self.assertAlmostEqual(self.command.current[1], 0.8)
+        self.assertAlmostEqual(self.command.current[2], 1.5)
+
+    def test_decay(self):
+        self.command.current = (1.0, 0.0, 0.6)
+        self.command.decay = 0.2
+
+        self.assertTrue(self.command.decay_toward_initial(1.0))
+        self.assertEqual(self.command.current, (0.8, 0.2, 0.5))
+
+    def test_command_class(self):
+        self.assertIs(command_class(), Command)
+        self.assertIs(command_class('Vector'), VectorCommand)
+
+        with self.assertRaises(ValueError):
+            command_class('colour')
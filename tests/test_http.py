@@ -1,8 +1,19 @@
 from unittest import TestCase
 from unittest.mock import patch, Mock
+from collections import OrderedDict
+from concurrent import futures
 import asyncio
+import json
+import os
+import tempfile
+import threading
 
-from chat_transformer.outputs.http import HTTPOutput
+import aiohttp
+
+from chat_transformer.outputs.base import OutputUpdate
+from chat_transformer.outputs.http import HTTPOutput, SHARED_SPOOLS, get_json_encoder
+from chat_transformer.outputs.queued import QueuedOutput
+from chat_transformer.tracing import Tracer
 
 
 class HTTPOutputTests(TestCase):
@@ -42,6 +53,62 @@ class HTTPOutputTests(TestCase):
         ])
         secret_http.cleanup()
 
+    @patch('time.time')
+    def test_headers_are_reused(self, mock_time):
+        """
+        The merged headers should be built once, and reused for as long as the
+        auth provider's token is
+        """
+        mock_time.return_value = 1534659178.4787898
+
+        http = HTTPOutput(headers={'my': 'headers'}, jwt_secret='this-is-a-fake-key-dont-use-elsewhere')
+        headers = http.get_headers()
+
+        self.assertEqual(headers['my'], 'headers')
+        self.assertIs(http.get_headers(), headers)
+        http.cleanup()
+
+    def test_body_only_passed_to_providers_that_need_it(self):
+        http = HTTPOutput(auth={'class': 'bearer', 'token': 'abc123'})
+
+        with patch.object(http.auth, 'get_headers', return_value={}) as mock_get_headers:
+            http.get_headers(b'{"value": 0.5}')
+            mock_get_headers.assert_called_once_with(None)
+
+        http.auth.needs_body = True
+
+        with patch.object(http.auth, 'get_headers', return_value={}) as mock_get_headers:
+            http.get_headers(b'{"value": 0.5}')
+            mock_get_headers.assert_called_once_with(b'{"value": 0.5}')
+
+        http.cleanup()
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_send_signed(self, mock_post):
+        """
+        Auth providers that sign the body should be passed the encoded body, which is
+        then posted as-is
+        """
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.return_value = mock_response()
+
+        http = HTTPOutput(base_url='https://test.url/', auth={'class': 'hmac', 'secret': 'secret'})
+        http.send(0.5, command_name='brightness', endpoint='update/')
+
+        pending = asyncio.Task.all_tasks()
+        self.loop.run_until_complete(asyncio.gather(*pending))
+
+        http.cleanup()
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args, ('https://test.url/update/',))
+        self.assertEqual(kwargs['data'], b'{"value":0.5,"name":"brightness"}')
+        self.assertIn('X-Signature', kwargs['headers'])
+        self.assertEqual(kwargs['headers']['Content-Type'], 'application/json')
+
     @patch('aiohttp.ClientSession.post')
     def test_http_output_send(self, mock_post):
         """
@@ -66,11 +133,10 @@ class HTTPOutputTests(TestCase):
         self.loop.run_until_complete(asyncio.gather(*pending))
 
         http.cleanup()
-        mock_post.assert_called_with(
-            'https://test.url/update/', json={
-                'value': 0.5, 'name': 'brightness',
-            }, headers={'my': 'headers'}
-        )
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args, ('https://test.url/update/',))
+        self.assertEqual(json.loads(kwargs['data'].decode('utf-8')), {'value': 0.5, 'name': 'brightness'})
+        self.assertEqual(kwargs['headers'], {'Content-Type': 'application/json', 'my': 'headers'})
 
     @patch('aiohttp.ClientSession.post')
     def test_http_output_send_all(self, mock_post):
@@ -99,9 +165,455 @@ class HTTPOutputTests(TestCase):
         self.loop.run_until_complete(asyncio.gather(*pending))
 
         http.cleanup()
-        mock_post.assert_called_with(
-            'https://test.url/update/', json={
-                'value': 0.5, 'name': 'brightness',
-                'min': -2.0, 'max': 2.0,
-            }, headers={'my': 'headers'}
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args, ('https://test.url/update/',))
+        self.assertEqual(json.loads(kwargs['data'].decode('utf-8')), {
+            'value': 0.5, 'name': 'brightness', 'min': -2.0, 'max': 2.0,
+        })
+        self.assertEqual(kwargs['headers'], {'Content-Type': 'application/json', 'my': 'headers'})
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_send_traced(self, mock_post):
+        """
+        Sends for a traced message should keep its trace open until the POST completes
+        """
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.return_value = mock_response()
+
+        with tempfile.TemporaryDirectory() as directory:
+            tracer = Tracer(sample_rate=1, output=os.path.join(directory, 'trace.json'))
+            http = HTTPOutput(base_url='https://test.url/')
+            http.tracer = tracer
+
+            tracer.current = trace = tracer.begin('brightness set 0.5')
+            http.send(0.5, command_name='brightness', endpoint='update/')
+            tracer.current = None
+            tracer.end(trace)
+            self.assertEqual(tracer.traced, 0)
+
+            pending = asyncio.Task.all_tasks()
+            self.loop.run_until_complete(asyncio.gather(*pending))
+
+            http.cleanup()
+            tracer.close()
+            self.assertEqual(tracer.traced, 1)
+            self.assertEqual(trace.spans[0][3], {'url': 'https://test.url/update/'})
+
+    @patch('aiohttp.ClientSession.post')
+    def test_get_headers_override_without_body(self, mock_post):
+        """
+        Overrides of `get_headers` that don't take the body should still work, and any
+        errors from them should be logged, not lost in the send's task
+        """
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.side_effect = lambda *args, **kwargs: mock_response()
+
+        class CustomHTTPOutput(HTTPOutput):
+            fail = False
+
+            def get_headers(self):
+                if self.fail:
+                    raise RuntimeError('no token')
+
+                return {'X-Custom': 'yes'}
+
+        http = CustomHTTPOutput(base_url='https://test.url/')
+        self.loop.run_until_complete(http._send('https://test.url/update/', b'{}', 'brightness', 0.5))
+        self.assertEqual(mock_post.call_args[1]['headers']['X-Custom'], 'yes')
+
+        http.fail = True
+        with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+            self.loop.run_until_complete(http._send('https://test.url/update/', b'{}', 'brightness', 0.5))
+
+        http.cleanup()
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_encode_body_reuses_templates(self):
+        """
+        Everything but the value should be encoded once per command/endpoint/params
+        """
+        http = HTTPOutput(base_url='https://test.url/')
+
+        url, body = http.encode_body(0.25, 'brightness', 'update/', {'min': 0.0, 'max': 1.0})
+        self.assertEqual(url, 'https://test.url/update/')
+        self.assertEqual(json.loads(body.decode('utf-8')), {
+            'value': 0.25, 'name': 'brightness', 'min': 0.0, 'max': 1.0,
+        })
+
+        _, body = http.encode_body(0.75, 'brightness', 'update/', {'min': 0.0, 'max': 1.0})
+        self.assertEqual(json.loads(body.decode('utf-8'))['value'], 0.75)
+        self.assertEqual(len(http._templates), 1)
+
+        _, body = http.encode_body(0.5, 'volume', 'update/', {'tags': ['a']})
+        self.assertEqual(json.loads(body.decode('utf-8')), {'value': 0.5, 'name': 'volume', 'tags': ['a']})
+        self.assertEqual(len(http._templates), 1)
+        http.cleanup()
+
+    def test_json_encoders_match(self):
+        """
+        The orjson and standard library encoders should give the same bytes
+        """
+        data = OrderedDict([('value', 0.5), ('name', 'brightness'), ('min', -2.0), ('max', 2)])
+
+        self.assertEqual(get_json_encoder('json')(data), b'{"value":0.5,"name":"brightness","min":-2.0,"max":2}')
+        self.assertEqual(get_json_encoder('auto')(data), get_json_encoder('json')(data))
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_breaker(self, mock_post):
+        """
+        Once the target has failed enough times, values should be cached rather than
+        posted, and the latest for each command sent when it recovers
+        """
+        now = [0.0]
+        http = HTTPOutput(
+            base_url='https://test.url/',
+            breaker={'failure_threshold': 2, 'reset_timeout': 5.0, 'clock': lambda: now[0]},
         )
+
+        def run_sends(*values, command_name='brightness'):
+            for value in values:
+                http.send(value, command_name=command_name, endpoint='update/')
+
+            pending = asyncio.Task.all_tasks()
+            self.loop.run_until_complete(asyncio.gather(*pending))
+
+        mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+        with self.assertLogs('chat_transformer.outputs.http', level='ERROR') as logs:
+            run_sends(0.1, 0.2, 0.3, 0.4)
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(http.stats['targets']['https://test.url/']['state'], 'open')
+
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.side_effect = lambda *args, **kwargs: mock_response()
+        now[0] = 5.0
+        run_sends(0.5, command_name='volume')
+
+        http.cleanup()
+        self.assertEqual(mock_post.call_count, 4)
+        self.assertEqual(mock_post.call_args[1]['data'], b'{"value":0.4,"name":"brightness"}')
+        self.assertEqual(http.stats['targets']['https://test.url/']['state'], 'closed')
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_breaker_recovers_without_sends(self, mock_post):
+        """
+        Once `reset_timeout` is up, a cached value should be sent as the trial without
+        waiting for a new send, and the rest once it succeeds
+        """
+        http = HTTPOutput(base_url='https://test.url/', breaker={'failure_threshold': 1, 'reset_timeout': 0.05})
+
+        mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+        with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+            http.send(0.1, command_name='brightness', endpoint='update/')
+            http.send(0.2, command_name='volume', endpoint='update/')
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+
+        self.assertEqual(mock_post.call_count, 1)
+
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.side_effect = lambda *args, **kwargs: mock_response()
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+
+        http.cleanup()
+        self.assertEqual(sorted(call[1]['data'] for call in mock_post.call_args_list[1:]), [
+            b'{"value":0.1,"name":"brightness"}',
+            b'{"value":0.2,"name":"volume"}',
+        ])
+        self.assertEqual(http.stats['targets']['https://test.url/']['state'], 'closed')
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_spool_replays_without_sends(self, mock_post):
+        """
+        The spool should be replayed once `reset_timeout` is up, without waiting for a
+        new send.  If the trial fails, it should be tried again after another timeout
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            http = HTTPOutput(
+                base_url='https://test.url/',
+                breaker={'failure_threshold': 1, 'reset_timeout': 0.1},
+                spool={'path': os.path.join(directory, 'spool'), 'replay_rate': 1000},
+            )
+
+            mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+            with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+                http.send(0.1, command_name='brightness', endpoint='update/')
+                http.send(0.2, command_name='volume', endpoint='update/')
+                self.loop.run_until_complete(asyncio.sleep(0.15))
+
+            self.assertEqual(mock_post.call_count, 2)
+            self.assertFalse(http.spool.empty)
+
+            async def mock_response():
+                mock_response = Mock()
+                mock_response.status = 200
+                return mock_response
+
+            mock_post.side_effect = lambda *args, **kwargs: mock_response()
+            self.loop.run_until_complete(asyncio.sleep(0.15))
+
+            http.cleanup()
+            self.assertEqual(sorted(call[1]['data'] for call in mock_post.call_args_list[2:]), [
+                b'{"value":0.1,"name":"brightness"}',
+                b'{"value":0.2,"name":"volume"}',
+            ])
+            self.assertTrue(http.spool.empty)
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_spool(self, mock_post):
+        """
+        With a spool, requests made while the target is down should be written to disk,
+        and the latest for each command replayed once it recovers
+        """
+        now = [0.0]
+
+        with tempfile.TemporaryDirectory() as directory:
+            http = HTTPOutput(
+                base_url='https://test.url/',
+                breaker={'failure_threshold': 1, 'reset_timeout': 5.0, 'clock': lambda: now[0]},
+                spool={'path': os.path.join(directory, 'spool'), 'replay_rate': 1000},
+            )
+
+            def run_sends(*values, command_name='brightness'):
+                for value in values:
+                    http.send(value, command_name=command_name, endpoint='update/')
+
+                pending = asyncio.Task.all_tasks()
+                self.loop.run_until_complete(asyncio.gather(*pending))
+
+            mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+            with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+                run_sends(0.1, 0.2, 0.3)
+                run_sends(0.4, command_name='volume')
+
+            self.assertEqual(mock_post.call_count, 1)
+            spooled = self.loop.run_until_complete(http.spool_call(lambda: list(http.spool.read())))
+            self.assertEqual(len(spooled), 4)
+
+            async def mock_response():
+                mock_response = Mock()
+                mock_response.status = 200
+                return mock_response
+
+            mock_post.side_effect = lambda *args, **kwargs: mock_response()
+            now[0] = 5.0
+            run_sends(0.5, command_name='contrast')
+            self.loop.run_until_complete(http._replay)
+
+            http.cleanup()
+            self.assertEqual([call[1]['data'] for call in mock_post.call_args_list[1:]], [
+                b'{"value":0.5,"name":"contrast"}',
+                b'{"value":0.3,"name":"brightness"}',
+                b'{"value":0.4,"name":"volume"}',
+            ])
+            self.assertTrue(http.spool.empty)
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_spool_writes_off_the_loop(self, mock_post):
+        """
+        Spool writes (and compactions) should run in the spool's writer thread, not
+        on the event loop
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            http = HTTPOutput(
+                base_url='https://test.url/',
+                breaker={'failure_threshold': 1, 'reset_timeout': 5.0},
+                spool={'path': os.path.join(directory, 'spool'), 'max_bytes': 100},
+            )
+            append = http.spool.append
+            threads = []
+
+            def recording_append(*args):
+                threads.append(threading.get_ident())
+                append(*args)
+
+            http.spool.append = recording_append
+            mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+
+            with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+                for value in range(10):
+                    http.send(value / 10, command_name='brightness', endpoint='update/')
+
+                pending = asyncio.Task.all_tasks()
+                self.loop.run_until_complete(asyncio.gather(*pending))
+
+            self.loop.run_until_complete(http.spool_call(lambda: None))
+            http.cleanup()
+
+            self.assertEqual(len(threads), 10)
+            self.assertNotIn(threading.get_ident(), threads)
+            self.assertGreater(http.spool.compactions, 0)
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_spool_does_not_replay_over_newer_sends(self, mock_post):
+        """
+        A command sent once the target has recovered shouldn't have its older spooled
+        requests replayed after it
+        """
+        now = [0.0]
+
+        with tempfile.TemporaryDirectory() as directory:
+            http = HTTPOutput(
+                base_url='https://test.url/',
+                breaker={'failure_threshold': 1, 'reset_timeout': 5.0, 'clock': lambda: now[0]},
+                spool={'path': os.path.join(directory, 'spool'), 'replay_rate': 1000},
+            )
+
+            def run_sends(*values, command_name='brightness'):
+                for value in values:
+                    http.send(value, command_name=command_name, endpoint='update/')
+
+                pending = asyncio.Task.all_tasks()
+                self.loop.run_until_complete(asyncio.gather(*pending))
+
+            mock_post.side_effect = aiohttp.ClientConnectionError('Connection refused')
+            with self.assertLogs('chat_transformer.outputs.http', level='ERROR'):
+                run_sends(0.1, 0.2)
+                run_sends(0.4, command_name='volume')
+
+            async def mock_response():
+                mock_response = Mock()
+                mock_response.status = 200
+                return mock_response
+
+            mock_post.side_effect = lambda *args, **kwargs: mock_response()
+            now[0] = 5.0
+            run_sends(0.9)
+            self.loop.run_until_complete(http._replay)
+
+            http.cleanup()
+            self.assertEqual([call[1]['data'] for call in mock_post.call_args_list[1:]], [
+                b'{"value":0.9,"name":"brightness"}',
+                b'{"value":0.4,"name":"volume"}',
+            ])
+            self.assertTrue(http.spool.empty)
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_shared_spool(self, mock_post):
+        """
+        Outputs spooling to the same path should share one spool, which stays open until
+        the last of them is cleaned up.  Whatever one was still to replay is taken over
+        by the other
+        """
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.side_effect = lambda *args, **kwargs: mock_response()
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'path': os.path.join(directory, 'spool'), 'replay_rate': 1000}
+            old = HTTPOutput(base_url='https://test.url/', spool=config)
+            new = HTTPOutput(base_url='https://test.url/', spool=config)
+
+            self.assertIs(new.spool, old.spool)
+
+            old._replaying[('https://test.url/', 'brightness')] = b'{"value":0.1,"name":"brightness"}'
+            old.cleanup()
+            self.loop.run_until_complete(new._replay)
+
+            self.assertEqual([call[1]['data'] for call in mock_post.call_args_list], [
+                b'{"value":0.1,"name":"brightness"}',
+            ])
+
+            new.cleanup()
+            self.assertNotIn(os.path.abspath(config['path']), SHARED_SPOOLS)
+
+    @patch('aiohttp.ClientSession.post')
+    def test_http_output_cleanup_does_not_wait_for_a_shared_drain(self, mock_post):
+        """
+        Cleaning up an output while its drain of a shared spool is still running shouldn't
+        wait for it; what it drains is handed to the other output once it's done
+        """
+        async def mock_response():
+            mock_response = Mock()
+            mock_response.status = 200
+            return mock_response
+
+        mock_post.side_effect = lambda *args, **kwargs: mock_response()
+
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'path': os.path.join(directory, 'spool'), 'replay_rate': 1000}
+            old = HTTPOutput(base_url='https://test.url/', spool=config)
+            new = HTTPOutput(base_url='https://test.url/', spool=config)
+
+            # A drain that won't finish until it's given a result
+            draining = old._draining = futures.Future()
+            draining.set_running_or_notify_cancel()
+            old.cleanup()
+            self.assertIsNone(new._replay)
+
+            draining.set_result(OrderedDict([
+                (('https://test.url/', 'brightness'), b'{"value":0.1,"name":"brightness"}'),
+            ]))
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.run_until_complete(new._replay)
+
+            self.assertEqual([call[1]['data'] for call in mock_post.call_args_list], [
+                b'{"value":0.1,"name":"brightness"}',
+            ])
+            new.cleanup()
+
+    def test_http_output_send_many_coalesces(self):
+        """
+        `send_many` should only send the latest value for each command/endpoint, and
+        return once the requests have been made
+        """
+        http = HTTPOutput(base_url='https://test.url/')
+        sent = []
+
+        async def fake_send(url, body, command_name='', value=None):
+            await asyncio.sleep(0)
+            sent.append((url, body))
+
+        with patch.object(http, '_send', side_effect=fake_send):
+            self.loop.run_until_complete(http.send_many([
+                OutputUpdate(0.1, {'command_name': 'brightness', 'endpoint': 'update/'}, False),
+                OutputUpdate(0.5, {'command_name': 'volume', 'endpoint': 'update/'}, True),
+                OutputUpdate(0.2, {'command_name': 'brightness', 'endpoint': 'update/'}, False),
+            ]))
+
+        http.cleanup()
+        self.assertEqual(sent, [
+            ('https://test.url/update/', b'{"value":0.2,"name":"brightness"}'),
+            ('https://test.url/update/', b'{"value":0.5,"name":"volume","min":0.0,"max":1.0}'),
+        ])
+
+    def test_queued_http_output_times_out(self):
+        """
+        A queued HTTP output should wait on its requests, so a slow target times out
+        the queue's sends, rather than piling up requests in the background
+        """
+        http = HTTPOutput(base_url='https://test.url/')
+        output = QueuedOutput(http, timeout=0.01, loop=self.loop)
+
+        async def slow_send(*args, **kwargs):
+            await asyncio.sleep(1)
+
+        with patch.object(http, '_send', side_effect=slow_send):
+            self.loop.run_until_complete(output.connect())
+
+            with self.assertLogs('chat_transformer.outputs.queued', level='ERROR'):
+                output.send(0.5, command_name='brightness', endpoint='update/')
+                self.loop.run_until_complete(output.queue.join())
+
+        output.cleanup()
+        self.assertEqual(output.stats['timeouts'], 1)
+        self.assertEqual(output.stats['sent'], 0)
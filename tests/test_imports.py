@@ -0,0 +1,38 @@
+from unittest import TestCase
+import subprocess
+import sys
+
+
+class LazyImportTests(TestCase):
+    def imported_modules(self, statement, modules):
+        """
+        Runs `statement` in a fresh interpreter, returning which of `modules` ended up imported
+        """
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            '{}; import sys; print(",".join(m for m in {!r} if m in sys.modules))'.format(statement, modules),
+        ])
+        return [module for module in output.decode('utf-8').strip().split(',') if module]
+
+    def test_cli_imports_nothing_heavy(self):
+        """
+        Importing the CLI shouldn't import asyncio, the client or any optional dependencies
+        """
+        self.assertEqual(
+            self.imported_modules(
+                'import chat_transformer.cli',
+                ['asyncio', 'chat_transformer.client', 'irc', 'aiohttp', 'jwt', 'pythonosc', 'numpy'],
+            ),
+            [],
+        )
+
+    def test_lean_client_does_not_import_irc(self):
+        self.assertEqual(
+            self.imported_modules(
+                'import asyncio; from chat_transformer.client import TransformerClient; '
+                'TransformerClient(commands_file="tests/test_commands_file.json", irc_engine="lean", '
+                'loop=asyncio.new_event_loop())',
+                ['irc', 'aiohttp', 'jwt', 'pythonosc', 'numpy'],
+            ),
+            [],
+        )
@@ -0,0 +1,176 @@
+from unittest import TestCase
+import asyncio
+import os
+import tempfile
+
+from chat_transformer.client import TransformerClient
+from chat_transformer.inputs.base import LineProtocol, split_line
+from chat_transformer.inputs.replay import ReplayInput, parse_record
+from chat_transformer.inputs.unix import UnixSocketInput
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class InputTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.batches = []
+
+    def tearDown(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def deliver(self, messages):
+        self.batches.append(messages)
+
+    def test_split_line(self):
+        self.assertEqual(split_line('volume increment'), (None, 'volume increment'))
+        self.assertEqual(split_line('alice\tvolume increment'), ('alice', 'volume increment'))
+
+    def test_line_protocol_batches_complete_lines(self):
+        """
+        Every complete line in a read should be delivered as one batch, holding
+        partial lines until they're complete
+        """
+        protocol = LineProtocol(self.deliver)
+
+        protocol.data_received(b'volume increment\n\nalice\tvolume set 0.5\nvolume ')
+        protocol.data_received(b'get\n')
+
+        self.assertEqual(self.batches, [
+            [(None, 'volume increment'), ('alice', 'volume set 0.5')],
+            [(None, 'volume get')],
+        ])
+
+    def test_line_protocol_drops_long_lines(self):
+        """
+        A partial line should never grow the buffer past `max_line_length`, and the
+        rest of it should be skipped when it arrives
+        """
+        protocol = LineProtocol(self.deliver)
+
+        with self.assertLogs('chat_transformer.inputs.base', level='WARNING'):
+            protocol.data_received(b'x' * (LineProtocol.max_line_length + 1))
+
+        self.assertEqual(protocol.buffer, b'')
+
+        protocol.data_received(b'xxx')
+        protocol.data_received(b'xxx\nvolume get\n')
+
+        self.assertEqual(self.batches, [[(None, 'volume get')]])
+
+    def test_parse_record(self):
+        self.assertEqual(parse_record('12.5\tvolume get\n'), (12.5, None, 'volume get'))
+        self.assertEqual(parse_record('12.5\talice\tvolume get\n'), (12.5, 'alice', 'volume get'))
+        self.assertIsNone(parse_record('not a record\n'))
+
+    def write_replay_file(self, contents):
+        replay_file = tempfile.NamedTemporaryFile('w', suffix='.log', delete=False)
+        replay_file.write(contents)
+        replay_file.close()
+        self.addCleanup(os.remove, replay_file.name)
+        return replay_file.name
+
+    def test_replay_as_fast_as_possible(self):
+        """
+        With a `speed` of 0, all messages should be delivered without waiting
+        """
+        filename = self.write_replay_file(
+            '100.0\tvolume increment\n'
+            '160.0\talice\tvolume decrement\n'
+            'garbage\n'
+            '220.0\tvolume get\n'
+        )
+        replay = ReplayInput(filename, speed=0, loop=self.loop)
+
+        self.loop.run_until_complete(replay.start(self.deliver))
+        self.loop.run_until_complete(asyncio.wait_for(replay.task, 1))
+
+        self.assertEqual(self.batches, [[
+            (None, 'volume increment'), ('alice', 'volume decrement'), (None, 'volume get'),
+        ]])
+        self.assertEqual(replay.replayed, 3)
+
+    def test_replay_keeps_timing(self):
+        """
+        With a `speed`, messages should be delivered with their original spacing, scaled
+        """
+        filename = self.write_replay_file(
+            '100.0\tvolume increment\n'
+            '100.0\tvolume increment\n'
+            '110.0\tvolume get\n'
+        )
+        replay = ReplayInput(filename, speed=200, loop=self.loop)
+
+        started_at = self.loop.time()
+        self.loop.run_until_complete(replay.start(self.deliver))
+        self.loop.run_until_complete(asyncio.wait_for(replay.task, 1))
+
+        self.assertGreaterEqual(self.loop.time() - started_at, 0.05)
+        self.assertEqual(self.batches, [
+            [(None, 'volume increment'), (None, 'volume increment')],
+            [(None, 'volume get')],
+        ])
+
+    def test_unix_socket_input(self):
+        path = os.path.join(tempfile.mkdtemp(), 'input.sock')
+        unix_input = UnixSocketInput(path, loop=self.loop)
+        self.loop.run_until_complete(unix_input.start(self.deliver))
+
+        async def send():
+            _, writer = await asyncio.open_unix_connection(path)
+            writer.write(b'volume increment\nvolume get\n')
+            await writer.drain()
+            writer.close()
+            await asyncio.sleep(0.05)
+
+        self.loop.run_until_complete(send())
+        unix_input.cleanup()
+
+        self.assertEqual(self.batches, [[(None, 'volume increment'), (None, 'volume get')]])
+        self.assertFalse(os.path.exists(path))
+
+    def test_unix_socket_input_replaces_only_sockets(self):
+        """
+        The input should never remove a file that isn't a socket, and its socket should
+        only be accessible to the current user
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'input.sock')
+
+        with open(path, 'w') as other_file:
+            other_file.write('important')
+
+        unix_input = UnixSocketInput(path, loop=self.loop)
+
+        with self.assertRaises(FileExistsError):
+            self.loop.run_until_complete(unix_input.start(self.deliver))
+
+        with self.assertLogs('chat_transformer.inputs.unix', level='WARNING'):
+            unix_input.cleanup()
+
+        with open(path) as other_file:
+            self.assertEqual(other_file.read(), 'important')
+
+        os.remove(path)
+        self.loop.run_until_complete(unix_input.start(self.deliver))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+        unix_input.cleanup()
+        self.assertFalse(os.path.exists(path))
+
+    def test_client_leaves_input_config_alone(self):
+        """
+        Building the inputs shouldn't change the config they were built from
+        """
+        input_data = {'replay': {'class': 'chat_transformer.inputs.replay.ReplayInput', 'speed': 0}}
+        client = TransformerClient(
+            commands_file=os.path.join(TEST_DIR, 'test_commands_file.json'),
+            input_data=input_data,
+            loop=self.loop,
+        )
+
+        self.assertIsInstance(client.inputs['replay'], ReplayInput)
+        self.assertEqual(input_data['replay']['class'], 'chat_transformer.inputs.replay.ReplayInput')
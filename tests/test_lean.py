@@ -0,0 +1,108 @@
+from unittest import TestCase
+from unittest.mock import ANY, MagicMock
+import asyncio
+
+from chat_transformer.lean import LeanIRCConnection, LeanIRCProtocol, parse_line
+
+
+class ParseLineTests(TestCase):
+    def test_parse_privmsg(self):
+        self.assertEqual(
+            parse_line(':nick!user@host PRIVMSG #channel :volume set 0.5'),
+            ('nick!user@host', 'PRIVMSG', '#channel :volume set 0.5'),
+        )
+
+    def test_parse_without_prefix(self):
+        self.assertEqual(parse_line('PING :server'), ('', 'PING', ':server'))
+
+    def test_parse_skips_tags(self):
+        self.assertEqual(
+            parse_line('@badges=;color= :nick!user@host PRIVMSG #channel :hi'),
+            ('nick!user@host', 'PRIVMSG', '#channel :hi'),
+        )
+
+
+class LeanIRCProtocolTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = MagicMock()
+        self.connection = LeanIRCConnection(self.client, loop=self.loop)
+        self.connection.connected = True
+        self.connection.transport = MagicMock()
+
+        self.protocol = LeanIRCProtocol(self.connection)
+        self.transport = MagicMock()
+        self.protocol.connection_made(self.transport)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_messages_are_batched_per_read(self):
+        """
+        All chat messages in one read should be handed to the client in a single batch,
+        with any partial line held over until the next read, and the time it arrived
+        """
+        self.protocol.data_received(
+            b':alice!a@host PRIVMSG #chan :volume increment\r\n'
+            b':server NOTICE * :ignored\r\n'
+            b':bob!b@host PRIVMSG #chan :volume set 0.5\r\n'
+            b':carol!c@host PRIV'
+        )
+        self.client.handle_messages.assert_called_once_with([
+            ('alice', 'volume increment'),
+            ('bob', 'volume set 0.5'),
+        ], ANY)
+
+        self.protocol.data_received(b'MSG #chan :volume get\r\n')
+        self.client.handle_messages.assert_called_with([('carol', 'volume get')], ANY)
+
+    def test_lf_only_lines(self):
+        """
+        Lines ending in a bare LF should be parsed like CRLF ones
+        """
+        self.protocol.data_received(b'PING :irc.server\n:alice!a@host PRIVMSG #chan :volume get\n')
+
+        self.transport.write.assert_called_once_with(b'PONG :irc.server\r\n')
+        self.client.handle_messages.assert_called_once_with([('alice', 'volume get')], ANY)
+
+    def test_long_lines_are_dropped(self):
+        """
+        A partial line should never grow the buffer past `max_line_length`, and the
+        rest of it should be skipped when it arrives
+        """
+        with self.assertLogs('chat_transformer.lean', level='WARNING'):
+            self.protocol.data_received(b'x' * (LeanIRCProtocol.max_line_length + 1))
+
+        self.assertEqual(self.protocol.buffer, b'')
+
+        self.protocol.data_received(b' :volume set 0.5\r\n:alice!a@host PRIVMSG #chan :volume get\r\n')
+        self.client.handle_messages.assert_called_once_with([('alice', 'volume get')], ANY)
+
+    def test_ping(self):
+        self.protocol.data_received(b'PING :irc.server\r\n')
+        self.transport.write.assert_called_once_with(b'PONG :irc.server\r\n')
+        self.client.handle_messages.assert_not_called()
+
+    def test_welcome(self):
+        self.protocol.data_received(b':irc.server 001 nick :Welcome\r\n')
+        self.client.on_welcome.assert_called_once_with(self.connection, None)
+
+    def test_connection_lost(self):
+        """
+        Losing the connection should be reported to the client, unless we disconnected
+        """
+        self.protocol.connection_lost(None)
+        self.client.on_disconnect.assert_called_once_with(self.connection, None)
+
+        self.client.reset_mock()
+        self.connection.connected = True
+        self.connection.disconnect('bye')
+        self.protocol.connection_lost(None)
+        self.client.on_disconnect.assert_not_called()
+
+    def test_join_and_privmsg(self):
+        self.connection.join('#chan')
+        self.connection.privmsg('#chan', 'hello\r\nthere')
+
+        self.connection.transport.write.assert_any_call(b'JOIN #chan\r\n')
+        self.connection.transport.write.assert_any_call(b'PRIVMSG #chan :hello  there\r\n')
@@ -0,0 +1,94 @@
+from unittest import TestCase
+import asyncio
+import logging
+
+from chat_transformer.logs import LazyMessage, RateLimitedLog
+
+from .utils import FakeClock
+
+logger = logging.getLogger('tests.test_logs')
+
+
+class Formatted:
+    """
+    Counts how many times it's formatted into a message
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __format__(self, spec):
+        self.count += 1
+        return 'formatted'
+
+
+class RateLimitedLogTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def create_log(self, **kwargs):
+        return RateLimitedLog(logger, logging.ERROR, rate=1.0, burst=2, clock=self.clock, loop=self.loop, **kwargs)
+
+    def test_rate_limit_and_summary(self):
+        """
+        Past the burst, messages should be suppressed until the rate allows more,
+        and summarized once the summary interval is up
+        """
+        log = self.create_log(summary_interval=0.01)
+        formatted = Formatted()
+
+        with self.assertLogs(logger, level='ERROR') as logs:
+            for _ in range(5):
+                log('Invalid {}', formatted)
+
+            self.assertEqual(len(logs.output), 2)
+            self.assertEqual(log.suppressed, 3)
+            self.assertEqual(formatted.count, 2)
+
+            self.clock.now = 1.0
+            log('Invalid {}', 'again')
+            self.assertEqual(len(logs.output), 3)
+
+            self.loop.run_until_complete(asyncio.sleep(0.02))
+
+        self.assertEqual(
+            logs.output[-1], 'ERROR:tests.test_logs:Suppressed 3 similar message(s), the latest: Invalid formatted'
+        )
+        self.assertEqual(log.suppressed, 0)
+
+    def test_sampling(self):
+        log = self.create_log(sample=3)
+
+        with self.assertLogs(logger, level='ERROR') as logs:
+            for index in range(8):
+                log('Invalid {}', index)
+
+            self.assertEqual(log.suppressed, 4)
+            log.flush()
+
+        self.assertEqual(logs.output[:-1], [
+            'ERROR:tests.test_logs:Invalid {}'.format(index) for index in (0, 1, 4, 7)
+        ])
+
+    def test_disabled_level(self):
+        """
+        Nothing should be formatted or counted if the logger isn't enabled for the level
+        """
+        log = RateLimitedLog(logger, logging.DEBUG, burst=0, loop=self.loop)
+        formatted = Formatted()
+
+        log('Dropped {}', formatted)
+
+        self.assertEqual(formatted.count, 0)
+        self.assertEqual(log.suppressed, 0)
+
+    def test_lazy_message(self):
+        formatted = Formatted()
+        message = LazyMessage('{} value', formatted)
+
+        self.assertEqual(formatted.count, 0)
+        self.assertEqual(str(message), 'formatted value')
@@ -0,0 +1,61 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+import asyncio
+import struct
+
+from chat_transformer.outputs.base import OutputUpdate
+from chat_transformer.outputs.osc import OSCOutput, BUNDLE_HEADER
+
+
+class OSCOutputTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_batching_only_when_bundling(self):
+        """
+        OSC outputs should only ask for batches if `bundle` is set
+        """
+        self.assertFalse(OSCOutput(loop=self.loop).batching)
+        self.assertTrue(OSCOutput(bundle=True, loop=self.loop).batching)
+
+    def test_send_many_sends_one_bundle_on_flush(self):
+        """
+        Updates passed to `send_many` should be buffered until `flush`, then sent as
+        a single OSC bundle
+        """
+        osc = OSCOutput(bundle=True, loop=self.loop)
+        osc.transport = MagicMock()
+
+        self.loop.run_until_complete(osc.send_many([
+            OutputUpdate(0.5, {'address': '/audio/volume'}, False),
+            OutputUpdate(1.0, {'address': '/video/brightness', 'min': 0.0, 'max': 1.0}, True),
+        ]))
+        osc.transport.sendto.assert_not_called()
+
+        self.loop.run_until_complete(osc.flush())
+
+        volume = osc.build_osc_message('/audio/volume', 0.5)
+        brightness = osc.build_osc_message('/video/brightness', 1.0)
+        osc.transport.sendto.assert_called_once_with(
+            BUNDLE_HEADER
+            + struct.pack('>i', len(volume)) + volume
+            + struct.pack('>i', len(brightness)) + brightness
+        )
+
+    def test_bundles_split_at_max_size(self):
+        """
+        Bundles should be split so none are larger than `max_bundle_size`
+        """
+        osc = OSCOutput(bundle=True, max_bundle_size=96, loop=self.loop)
+        messages = [osc.build_osc_message('/video/brightness', float(i)) for i in range(4)]
+
+        bundles = list(osc.build_osc_bundles(messages))
+
+        self.assertEqual(len(bundles), 2)
+        for bundle in bundles:
+            self.assertTrue(bundle.startswith(BUNDLE_HEADER))
+            self.assertLessEqual(len(bundle), 96)
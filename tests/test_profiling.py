@@ -0,0 +1,107 @@
+from unittest import TestCase
+from collections import OrderedDict
+import asyncio
+import os
+import tempfile
+import time
+
+from chat_transformer.profiling import Profiler
+
+
+def handle(value):
+    return transform(value) + transform(value)
+
+
+def transform(value):
+    return sum(range(value))
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def create_profiler(self, mode):
+        stages = OrderedDict([
+            ('handle', [handle.__code__]),
+            ('transform', [transform.__code__]),
+        ])
+
+        return Profiler(
+            mode=mode, output=os.path.join(self.directory.name, 'profile'), sample_interval=0.001,
+            stages=lambda: stages, loop=self.loop,
+        )
+
+    def test_cprofile(self):
+        """
+        cProfile mode should write stats, and a report with calls to each stage,
+        counting calls between functions of the same stage once
+        """
+        profiler = self.create_profiler('cprofile')
+
+        self.assertIsNone(profiler.toggle())
+        self.assertTrue(profiler.running)
+
+        for value in range(100):
+            handle(value)
+
+        report = self.loop.run_until_complete(profiler.toggle())
+        self.assertFalse(profiler.running)
+        self.assertTrue(os.path.exists(report.replace('.txt', '.prof')))
+
+        with open(report) as report_file:
+            lines = report_file.read().splitlines()
+
+        self.assertIn('chat_transformer profile (cprofile)', lines[0])
+        self.assertEqual(lines[3].split()[:2], ['handle', '100'])
+        self.assertEqual(lines[4].split()[:2], ['transform', '200'])
+
+    def test_sampling(self):
+        """
+        Sampling mode should write folded stacks, and the share of samples in each stage
+        """
+        profiler = self.create_profiler('sampling')
+        profiler.start()
+
+        finish = time.monotonic() + 0.1
+        while time.monotonic() < finish:
+            handle(1000)
+
+        report = self.loop.run_until_complete(profiler.stop())
+
+        with open(report.replace('.txt', '.folded')) as folded:
+            self.assertIn('test_profiling.py:handle;test_profiling.py:transform', folded.read())
+
+        with open(report) as report_file:
+            lines = report_file.read().splitlines()
+
+        self.assertEqual(lines[3].split()[0], 'handle')
+        self.assertGreater(int(lines[3].split()[1]), 0)
+
+    def test_window_ends(self):
+        """
+        Profiling should stop by itself once the window is over
+        """
+        profiler = self.create_profiler('cprofile')
+        profiler.start(duration=0.01)
+
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.assertFalse(profiler.running)
+
+        # The results are written in a worker thread
+        for _ in range(100):
+            if len(os.listdir(self.directory.name)) == 2:
+                break
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            Profiler(mode='perf', loop=self.loop)
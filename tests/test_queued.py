@@ -0,0 +1,252 @@
+from unittest import TestCase
+import asyncio
+import os
+import tempfile
+import time
+
+from chat_transformer.outputs.base import BaseOutput
+from chat_transformer.outputs.queued import QueuedOutput
+from chat_transformer.tracing import Tracer
+
+
+class RecordingOutput(BaseOutput):
+    """
+    Output that records every value it's sent
+    """
+    def __init__(self):
+        self.sent = []
+
+    def send(self, value, **kwargs):
+        self.sent.append((value, kwargs))
+
+
+class BatchingOutput(BaseOutput):
+    batching = True
+
+    def __init__(self):
+        self.batches = []
+        self.flushes = 0
+
+    async def send_many(self, updates):
+        self.batches.append([update.value for update in updates])
+
+    async def flush(self):
+        self.flushes += 1
+
+
+class FailingOutput(BaseOutput):
+    def send(self, value, **kwargs):
+        raise RuntimeError('output is down')
+
+
+class SlowOutput(BaseOutput):
+    async def _send(self):
+        await asyncio.sleep(1)
+
+    def send(self, value, **kwargs):
+        return self._send()
+
+
+class BlockingOutput(RecordingOutput):
+    def send(self, value, **kwargs):
+        time.sleep(0.01)
+        super().send(value, **kwargs)
+
+
+class TracedOutput(RecordingOutput):
+    """
+    Output that records the current trace when it's sent to
+    """
+    def send(self, value, **kwargs):
+        super().send(value, trace=self.tracer.current)
+
+
+class QueuedOutputTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def drain(self, output):
+        self.loop.run_until_complete(output.queue.join())
+
+    def test_updates_pass_through_to_wrapped_output(self):
+        """
+        `send` and `send_full` should be queued and then handed to the wrapped output
+        in order by the worker
+        """
+        wrapped = RecordingOutput()
+        output = QueuedOutput(wrapped, loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        output.send(0.5, address='/a')
+        output.send_full(0.75, address='/b', min=0.0, max=1.0)
+        self.assertEqual(wrapped.sent, [])
+
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual(wrapped.sent, [
+            (0.5, {'address': '/a'}),
+            (0.75, {'address': '/b', 'min': 0.0, 'max': 1.0}),
+        ])
+        self.assertEqual(output.stats['sent'], 2)
+        self.assertEqual(output.stats['depth'], 0)
+        self.assertIsNotNone(output.stats['avg_latency'])
+
+    def test_drop_oldest_overflow(self):
+        """
+        When full, the `drop_oldest` policy should discard the oldest queued update
+        """
+        wrapped = RecordingOutput()
+        output = QueuedOutput(wrapped, maxsize=2, loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        for value in (1, 2, 3):
+            output.send(value)
+
+        self.assertEqual(output.depth, 2)
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual([value for value, _ in wrapped.sent], [2, 3])
+        self.assertEqual(output.stats['dropped'], 1)
+
+    def test_drop_newest_overflow(self):
+        """
+        When full, the `drop_newest` policy should discard the incoming update
+        """
+        wrapped = RecordingOutput()
+        output = QueuedOutput(wrapped, maxsize=2, overflow='drop_newest', loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        for value in (1, 2, 3):
+            output.send(value)
+
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual([value for value, _ in wrapped.sent], [1, 2])
+        self.assertEqual(output.stats['dropped'], 1)
+
+    def test_error_overflow(self):
+        """
+        When full, the `error` policy should reject the incoming update and log it,
+        without raising
+        """
+        wrapped = RecordingOutput()
+        output = QueuedOutput(wrapped, maxsize=2, overflow='error', loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        with self.assertLogs('chat_transformer.outputs.queued', level='ERROR'):
+            for value in (1, 2, 3):
+                output.send(value)
+
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual([value for value, _ in wrapped.sent], [1, 2])
+        self.assertEqual(output.stats['rejected'], 1)
+        self.assertEqual(output.stats['dropped'], 0)
+
+    def test_invalid_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            QueuedOutput(RecordingOutput(), overflow='explode', loop=self.loop)
+
+    def test_errors_are_isolated(self):
+        """
+        An exception raised by the wrapped output should be logged and counted,
+        without stopping the worker
+        """
+        output = QueuedOutput(FailingOutput(), loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        with self.assertLogs('chat_transformer.outputs.queued', level='ERROR'):
+            output.send(1)
+            output.send(2)
+            self.drain(output)
+
+        self.assertEqual(output.stats['errors'], 2)
+        self.assertFalse(output._worker.done())
+        output.cleanup()
+
+    def test_slow_output_times_out(self):
+        """
+        Awaitable sends that run longer than `timeout` should be cancelled and counted
+        """
+        output = QueuedOutput(SlowOutput(), timeout=0.01, loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        with self.assertLogs('chat_transformer.outputs.queued', level='ERROR'):
+            output.send(1)
+            self.drain(output)
+
+        self.assertEqual(output.stats['timeouts'], 1)
+        output.cleanup()
+
+    def test_threaded_output(self):
+        """
+        Blocking outputs can be run in the default executor with `threaded`
+        """
+        wrapped = BlockingOutput()
+        output = QueuedOutput(wrapped, threaded=True, loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        output.send(1)
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual(wrapped.sent, [(1, {})])
+
+    def test_batching_output_receives_batches(self):
+        """
+        Outputs that support batching should be handed everything queued, up to
+        `batch_size`, in a single `send_many` call followed by a `flush`
+        """
+        wrapped = BatchingOutput()
+        output = QueuedOutput(wrapped, batch_size=3, loop=self.loop)
+        self.loop.run_until_complete(output.connect())
+
+        for value in range(5):
+            output.send(value)
+
+        self.drain(output)
+        output.cleanup()
+
+        self.assertEqual(wrapped.batches, [[0, 1, 2], [3, 4]])
+        self.assertEqual(wrapped.flushes, 2)
+        self.assertEqual(output.stats['sent'], 5)
+
+    def test_traced_updates(self):
+        """
+        A traced update should keep its trace open while it's queued, be the current
+        trace while it's delivered, and get `queue` and `send` stages.  Dropping an
+        update releases its trace
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            tracer = Tracer(sample_rate=1, output=os.path.join(directory, 'trace.json'))
+            wrapped = TracedOutput()
+            wrapped.tracer = tracer
+            output = QueuedOutput(wrapped, maxsize=1, name='traced', loop=self.loop)
+            output.tracer = tracer
+            self.loop.run_until_complete(output.connect())
+
+            dropped, trace = tracer.begin('volume set 0.1'), tracer.begin('volume set 0.2')
+            for value, tracer.current in ((0.1, dropped), (0.2, trace)):
+                output.send(value)
+
+            tracer.current = None
+            tracer.end(dropped)
+            tracer.end(trace)
+            self.assertEqual(tracer.traced, 1)
+
+            self.drain(output)
+            output.cleanup()
+            tracer.close()
+
+        self.assertEqual(wrapped.sent, [(0.2, {'trace': trace})])
+        self.assertEqual(tracer.traced, 2)
+        self.assertEqual([span[0] for span in trace.spans], ['queue (traced)', 'send (traced)', 'total'])
@@ -0,0 +1,153 @@
+from unittest import TestCase
+import asyncio
+import glob
+import os
+import tempfile
+
+from chat_transformer.inputs.replay import ReplayInput
+from chat_transformer.recorder import Recorder, read_recording, INBOUND, ACTION, SEND
+
+
+class RecorderTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session')
+
+    def tearDown(self):
+        for filename in glob.glob(self.path + '*'):
+            os.remove(filename)
+        os.rmdir(self.directory)
+        self.loop.close()
+
+    def test_round_trip(self):
+        """
+        Records written by the recorder should stream back out in order
+        """
+        recorder = Recorder(self.path, loop=self.loop)
+        recorder.record_inbound('alice', 'volume set 0.5')
+        recorder.record_action('volume', 'set', '0.5')
+        recorder.record_send('osc', 'volume', 0.5)
+        recorder.record_inbound(None, 'volume get')
+        recorder.close()
+
+        records = list(read_recording(recorder.filename))
+
+        self.assertEqual(
+            [(record.kind, record.fields) for record in records],
+            [
+                (INBOUND, ['alice', 'volume set 0.5']),
+                (ACTION, ['volume', 'set', '0.5']),
+                (SEND, ['osc', 'volume', '0.5']),
+                (INBOUND, ['', 'volume get']),
+            ]
+        )
+        self.assertTrue(all(record.timestamp > 0 for record in records))
+
+    def test_rotation(self):
+        """
+        A new file should be started once `max_bytes` has been written to the current one
+        """
+        recorder = Recorder(self.path, max_bytes=10, loop=self.loop)
+
+        recorder.record_inbound('alice', 'volume increment')
+        recorder.flush().result()
+        recorder.record_inbound('bob', 'volume decrement')
+        recorder.close()
+
+        filenames = sorted(glob.glob(self.path + '*'))
+        self.assertEqual(len(filenames), 2)
+        self.assertEqual(
+            [record.fields for filename in filenames for record in read_recording(filename)],
+            [['alice', 'volume increment'], ['bob', 'volume decrement']],
+        )
+
+    def test_read_unclosed_recording(self):
+        """
+        A recording that's still being written to should be read up to its last
+        complete record
+        """
+        recorder = Recorder(self.path, loop=self.loop)
+        recorder.record_inbound('alice', 'volume increment')
+        recorder.flush().result()
+        complete = os.path.getsize(recorder.filename)
+        recorder.record_inbound('bob', 'volume get ' * 20)
+        recorder.flush().result()
+
+        self.assertEqual(
+            [record.fields for record in read_recording(recorder.filename)],
+            [['alice', 'volume increment'], ['bob', 'volume get ' * 20]],
+        )
+
+        # Cut off partway through the last record, as after a crash
+        with open(recorder.filename, 'rb') as recording:
+            data = recording.read()
+
+        with open(recorder.filename, 'wb') as recording:
+            recording.write(data[:complete + (len(data) - complete) // 2])
+
+        self.assertEqual(
+            [record.fields for record in read_recording(recorder.filename)],
+            [['alice', 'volume increment']],
+        )
+        recorder.close()
+
+    def test_buffer_is_bounded(self):
+        """
+        Once `max_buffer` records are waiting to be written, new ones should be
+        dropped and counted
+        """
+        recorder = Recorder(self.path, max_buffer=2, loop=self.loop)
+
+        with self.assertLogs('chat_transformer.recorder', level='WARNING'):
+            for value in range(3):
+                recorder.record_action('volume', 'set', value)
+
+        self.assertEqual(len(recorder.buffer), 2)
+        self.assertEqual(recorder.dropped, 1)
+
+        recorder.flush().result()
+        recorder.record_action('volume', 'set', 3)
+        recorder.close()
+
+        self.assertEqual(
+            [record.fields[2] for record in read_recording(recorder.filename)], ['0', '1', '3']
+        )
+
+    def test_write_errors_are_logged(self):
+        """
+        An error writing a recording should be logged, rather than silently
+        stopping the recording
+        """
+        blocker = os.path.join(self.directory, 'blocker')
+        open(blocker, 'w').close()
+
+        recorder = Recorder(os.path.join(blocker, 'session'), loop=self.loop)
+        recorder.record_inbound('alice', 'volume increment')
+
+        with self.assertRaises(OSError):
+            recorder.flush().result()
+
+        with self.assertLogs('chat_transformer.recorder', level='ERROR'):
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+        recorder.close()
+        os.remove(blocker)
+
+    def test_replay_recording(self):
+        """
+        The replay input should replay the inbound messages from a recording
+        """
+        recorder = Recorder(self.path, loop=self.loop)
+        recorder.record_inbound('alice', 'volume increment')
+        recorder.record_action('volume', 'increment', '')
+        recorder.record_inbound(None, 'volume get')
+        recorder.close()
+
+        batches = []
+        replay = ReplayInput(recorder.filename, speed=0, loop=self.loop)
+        self.loop.run_until_complete(replay.start(batches.append))
+        self.loop.run_until_complete(asyncio.wait_for(replay.task, 1))
+
+        self.assertEqual(batches, [[('alice', 'volume increment'), (None, 'volume get')]])
@@ -0,0 +1,90 @@
+from unittest import TestCase, skipIf
+import json
+import os
+
+from chat_transformer.registry import CommandRegistry, import_numpy
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class CommandRegistryTests(TestCase):
+    backend = 'array'
+
+    def setUp(self):
+        with open(os.path.join(TEST_DIR, 'test_commands_file.json')) as commands_file:
+            self.commands_data = json.loads(commands_file.read())
+
+        self.registry = CommandRegistry(self.commands_data, backend=self.backend)
+
+    def test_only_number_commands(self):
+        with self.assertRaises(ValueError):
+            CommandRegistry({'color': {'type': 'vector', 'initial': [0.0, 0.0, 0.0]}}, backend=self.backend)
+
+    def test_mapping_interface(self):
+        """
+        The registry should act as a mapping of lower-cased names to commands
+        """
+        self.assertEqual(len(self.registry), 3)
+        self.assertEqual(list(self.registry), ['volume', 'brightness', '!commands'])
+        self.assertIn('volume', self.registry)
+        self.assertIsNone(self.registry.get('foo'))
+
+    def test_commands_are_views_over_arrays(self):
+        """
+        Commands should read and write their values through the registry's arrays
+        """
+        volume = self.registry['volume']
+        self.assertAlmostEqual(volume.current, 0.5)
+        self.assertAlmostEqual(volume.delta, 0.05)
+
+        response = volume.run_action('increment')
+        self.assertAlmostEqual(response.value, 0.55)
+        self.assertAlmostEqual(self.registry.current[0], 0.55)
+        self.assertEqual(response.irc_message, 'VOLUME is at 0.55 (Max 1.0)')
+
+        self.registry.current[0] = 0.25
+        self.assertAlmostEqual(volume.current, 0.25)
+
+    def test_current_values_carry_over(self):
+        registry = CommandRegistry(self.commands_data, backend=self.backend, current_values={'volume': 0.9})
+        self.assertAlmostEqual(registry['volume'].current, 0.9)
+        self.assertAlmostEqual(registry['brightness'].current, 0)
+
+    def test_set_many_clamps(self):
+        """
+        `set_many` should set several values at once, clamped to each command's range
+        """
+        names = self.registry.set_many({'volume': 1.5, 'brightness': -50, 'foo': 1.0})
+
+        self.assertEqual(names, ['volume', 'brightness'])
+        self.assertAlmostEqual(self.registry['volume'].current, 1.0)
+        self.assertAlmostEqual(self.registry['brightness'].current, -50)
+
+    def test_snapshot_and_restore(self):
+        snapshot = self.registry.snapshot()
+        self.registry.set_many({'volume': 0.1})
+
+        self.registry.restore(snapshot)
+        self.assertAlmostEqual(self.registry['volume'].current, 0.5)
+
+    def test_full_updates(self):
+        """
+        `full_updates` should return one update per command with the given output,
+        including its min/max
+        """
+        updates = self.registry.full_updates('osc')
+
+        self.assertEqual([name for name, _ in updates], ['volume', 'brightness'])
+        name, update = updates[0]
+        self.assertAlmostEqual(update.value, 0.5)
+        self.assertEqual(update.params, {'address': '/audio/volume', 'min': 0.0, 'max': 1.0})
+        self.assertTrue(update.full)
+        self.assertEqual(self.registry.full_updates('http'), [])
+
+
+@skipIf(import_numpy() is None, 'NumPy is not installed')
+class NumpyCommandRegistryTests(CommandRegistryTests):
+    backend = 'numpy'
+
+    def test_uses_numpy(self):
+        self.assertEqual(self.registry.backend, 'numpy')
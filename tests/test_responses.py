@@ -40,3 +40,8 @@ class ActionResponseTests(TestCase):
             {'osc': {'address': '/this/is/an/osc/address'}},
         )
         self.assertTrue(full_response.has_output)
+
+    def test_no_instance_dict(self):
+        response = ActionResponse('This message goes to IRC')
+        with self.assertRaises(AttributeError):
+            response.__dict__
@@ -0,0 +1,101 @@
+from unittest import TestCase
+import asyncio
+
+from chat_transformer.scheduler import TimerWheel
+
+
+class TimerWheelTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.wheel = TimerWheel(tick=0.01, slots=8, loop=self.loop)
+        self.calls = []
+
+    def tearDown(self):
+        self.wheel.stop()
+        self.loop.close()
+
+    def run_for(self, seconds):
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def test_call_later(self):
+        self.wheel.call_later(0.03, self.calls.append, 'a')
+        self.wheel.call_later(0.001, self.calls.append, 'b')
+
+        self.run_for(0.015)
+        self.assertEqual(self.calls, ['b'])
+
+        self.run_for(0.05)
+        self.assertEqual(self.calls, ['b', 'a'])
+
+        # Nothing left, so the wheel stops ticking
+        self.assertIsNone(self.wheel._handle)
+
+    def test_delays_longer_than_a_revolution(self):
+        self.wheel.call_later(0.2, self.calls.append, 'a')
+
+        self.run_for(0.15)
+        self.assertEqual(self.calls, [])
+
+        self.run_for(0.1)
+        self.assertEqual(self.calls, ['a'])
+
+    def test_cancel(self):
+        timer = self.wheel.call_later(0.02, self.calls.append, 'a')
+        timer.cancel()
+
+        self.run_for(0.05)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.wheel.pending, 0)
+
+    def test_call_every(self):
+        timer = self.wheel.call_every(0.02, self.calls.append, 'a')
+
+        self.run_for(0.11)
+        timer.cancel()
+        count = len(self.calls)
+        self.assertGreaterEqual(count, 4)
+
+        self.run_for(0.05)
+        self.assertEqual(len(self.calls), count)
+
+    def test_one_loop_callback_for_many_timers(self):
+        for index in range(1000):
+            self.wheel.call_later(0.01 * (index % 5 + 1), self.calls.append, index)
+
+        scheduled = len(self.loop._scheduled)
+        self.assertEqual(scheduled, 1)
+
+        self.run_for(0.1)
+        self.assertEqual(sorted(self.calls), list(range(1000)))
+
+    def test_errors_dont_stop_the_wheel(self):
+        def fail():
+            raise ValueError('Oops')
+
+        self.wheel.call_later(0.01, fail)
+        self.wheel.call_later(0.02, self.calls.append, 'a')
+
+        with self.assertLogs('chat_transformer.scheduler', level='ERROR'):
+            self.run_for(0.05)
+
+        self.assertEqual(self.calls, ['a'])
+
+    def test_never_fires_early_when_scheduled_mid_tick(self):
+        """
+        A timer scheduled partway through a tick should still wait out its whole delay
+        """
+        wheel = TimerWheel(tick=0.1, slots=8, loop=self.loop)
+        self.addCleanup(wheel.stop)
+        fired = []
+
+        # Keep the wheel ticking, then schedule 95ms into a tick
+        wheel.call_every(0.1, lambda: None)
+        self.run_for(0.195)
+
+        scheduled = self.loop.time()
+        wheel.call_later(0.1, lambda: fired.append(self.loop.time()))
+        self.run_for(0.25)
+
+        self.assertEqual(len(fired), 1)
+        self.assertGreaterEqual(fired[0] - scheduled, 0.1)
@@ -0,0 +1,105 @@
+from unittest import TestCase
+import os
+import tempfile
+
+from chat_transformer.outputs.spool import HEADER, Spool
+
+
+class SpoolTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'spool', 'http')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_and_read(self):
+        spool = Spool(self.path, segment_bytes=64)
+
+        for index in range(10):
+            spool.append('https://test.url/update/', 'brightness', '{{"value":{}}}'.format(index).encode('utf-8'))
+
+        self.assertGreater(len(spool.segments()), 1)
+        self.assertEqual(spool.stats['segments'], len(spool.segments()))
+        self.assertEqual(
+            [body for _, _, body in spool.read()],
+            ['{{"value":{}}}'.format(index).encode('utf-8') for index in range(10)],
+        )
+        spool.close()
+
+    def test_compacts_to_latest_values(self):
+        spool = Spool(self.path, max_bytes=400, segment_bytes=100)
+
+        for index in range(20):
+            spool.append('https://test.url/', 'brightness', str(index).encode('utf-8'))
+            spool.append('https://test.url/', 'volume', str(index * 2).encode('utf-8'))
+
+        self.assertGreater(spool.compactions, 0)
+        self.assertLessEqual(spool.size, 400)
+        self.assertEqual(spool.stats['segments'], len(spool.segments()))
+        self.assertEqual(list(spool.latest().items()), [
+            (('https://test.url/', 'brightness'), b'19'),
+            (('https://test.url/', 'volume'), b'38'),
+        ])
+        spool.close()
+
+    def test_compaction_drops_least_recently_updated(self):
+        spool = Spool(self.path, max_bytes=100)
+
+        for index in range(10):
+            spool.append('https://test.url/', 'command{}'.format(index), b'0.5')
+
+        self.assertGreater(spool.dropped, 0)
+        self.assertLessEqual(spool.size, 100)
+        self.assertIn(('https://test.url/', 'command9'), spool.latest())
+        spool.close()
+
+    def test_drain_and_reopen(self):
+        spool = Spool(self.path)
+        spool.append('https://test.url/', 'brightness', b'0.1')
+        spool.append('https://test.url/', 'brightness', b'0.2')
+        spool.close()
+
+        # Picks up where the last run left off
+        spool = Spool(self.path)
+        self.assertFalse(spool.empty)
+        self.assertEqual(spool.stats['segments'], 1)
+        spool.append('https://test.url/', 'volume', b'0.3')
+
+        self.assertEqual(list(spool.drain().values()), [b'0.2', b'0.3'])
+        self.assertTrue(spool.empty)
+        self.assertEqual(spool.stats['segments'], 0)
+        self.assertEqual(spool.segments(), [])
+        spool.close()
+
+    def test_partly_written_request(self):
+        """
+        A request cut off part way through should be ignored, along with any that can't be
+        decoded, keeping the rest, and draining should still empty the spool
+        """
+        spool = Spool(self.path)
+        spool.append('https://test.url/', 'brightness', b'{"value":0.1}')
+        spool.close()
+
+        # Not utf-8
+        with open(spool.segments()[0], 'ab') as spool_file:
+            spool_file.write(HEADER.pack(1, 1, 1) + b'\xff' + b'x' + b'0')
+
+        spool = Spool(self.path)
+        spool.append('https://test.url/', 'volume', b'{"value":0.2}')
+        spool.append('https://test.url/', 'contrast', b'{"value":0.3}')
+        spool.close()
+
+        segment = spool.segments()[-1]
+        with open(segment, 'r+b') as spool_file:
+            spool_file.truncate(os.path.getsize(segment) - 5)
+
+        spool = Spool(self.path)
+
+        with self.assertLogs('chat_transformer.outputs.spool', level='WARNING') as logs:
+            self.assertEqual(list(spool.drain().values()), [b'{"value":0.1}', b'{"value":0.2}'])
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertTrue(spool.empty)
+        self.assertEqual(spool.segments(), [])
+        spool.close()
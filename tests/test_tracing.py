@@ -0,0 +1,78 @@
+from unittest import TestCase
+import json
+import os
+import tempfile
+
+from chat_transformer.tracing import Histogram, Tracer
+
+from .utils import FakeClock
+
+
+class HistogramTests(TestCase):
+    def test_percentiles(self):
+        histogram = Histogram()
+
+        for _ in range(90):
+            histogram.record(0.000003)
+        for _ in range(10):
+            histogram.record(0.0005)
+
+        self.assertEqual(histogram.stats['count'], 100)
+        self.assertEqual(histogram.stats['p50_us'], 4.0)
+        self.assertEqual(histogram.stats['p99_us'], 500.0)
+        self.assertEqual(histogram.stats['max_us'], 500.0)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().stats, {'count': 0})
+
+
+class TracerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.output = os.path.join(directory.name, 'trace.json')
+        self.clock = FakeClock()
+
+    def test_sampling(self):
+        tracer = Tracer(sample_rate=0.25, output=self.output, clock=self.clock)
+        traces = [tracer.begin('volume up') for _ in range(8)]
+
+        self.assertEqual([trace is not None for trace in traces], [True, False, False, False] * 2)
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            Tracer(sample_rate=0)
+
+    def test_trace_is_written_once_background_stages_finish(self):
+        """
+        Stages should be timed from the end of the last one, and the trace written out
+        in the Chrome trace format once every stage has finished
+        """
+        tracer = Tracer(sample_rate=1, output=self.output, clock=self.clock)
+
+        trace = tracer.begin('volume set 0.5', received=-0.001)
+        self.clock.advance(0.002)
+        tracer.mark(trace, 'lookup')
+
+        tracer.hold(trace)
+        tracer.end(trace)
+        self.assertEqual(tracer.traced, 0)
+
+        self.clock.advance(0.01)
+        tracer.span(trace, 'http', 0.002, self.clock())
+        tracer.release(trace)
+        tracer.close()
+
+        self.assertEqual(tracer.traced, 1)
+        self.assertEqual(list(tracer.stats), ['receive', 'lookup', 'http', 'total'])
+        self.assertEqual(tracer.stats['lookup']['max_us'], 2000.0)
+
+        with open(self.output) as trace_file:
+            events = json.load(trace_file)
+
+        self.assertEqual([event['name'] for event in events], ['receive', 'lookup', 'http', 'total'])
+        self.assertEqual(events[3]['ts'], -1000.0)
+        self.assertEqual(events[3]['dur'], 13000.0)
+        self.assertEqual(events[3]['args'], {'message': 'volume set 0.5'})
+        self.assertEqual({event['ph'] for event in events}, {'X'})
@@ -0,0 +1,34 @@
+import asyncio
+from unittest import TestCase, skipIf
+
+from chat_transformer.utils import create_event_loop
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+class CreateEventLoopTests(TestCase):
+    def tearDown(self):
+        asyncio.get_event_loop().close()
+        asyncio.set_event_loop_policy(None)
+
+    def test_default_loop(self):
+        loop = create_event_loop()
+
+        self.assertIsInstance(loop, asyncio.SelectorEventLoop)
+        self.assertIs(asyncio.get_event_loop(), loop)
+
+    @skipIf(uvloop is None, 'uvloop is not installed')
+    def test_uvloop(self):
+        loop = create_event_loop('uvloop')
+
+        self.assertIsInstance(loop, uvloop.Loop)
+        self.assertIs(asyncio.get_event_loop(), loop)
+
+    def test_invalid_loop(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+        with self.assertRaises(ValueError):
+            create_event_loop('twisted')
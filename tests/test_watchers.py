@@ -0,0 +1,51 @@
+from unittest import TestCase
+import asyncio
+import os
+import tempfile
+
+from chat_transformer.watchers import FileWatcher
+
+
+class FileWatcherTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        with tempfile.NamedTemporaryFile('w', delete=False) as watched_file:
+            watched_file.write('{}')
+
+        self.filename = watched_file.name
+        self.changes = []
+        self.watcher = FileWatcher(self.filename, lambda: self.changes.append(True), loop=self.loop)
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.loop.close()
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_check_runs_change_func_on_change(self):
+        """
+        Checks run in a worker thread, and call the change function once per change
+        """
+        self.loop.run_until_complete(self.watcher.check_watched_file())
+        self.assertEqual(self.changes, [])
+
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + 1))
+
+        self.loop.run_until_complete(self.watcher.check_watched_file())
+        self.loop.run_until_complete(self.watcher.check_watched_file())
+        self.assertEqual(self.changes, [True])
+
+    def test_check_survives_missing_file(self):
+        """
+        A file that's gone missing (e.g. mid-save) is logged, not raised
+        """
+        os.remove(self.filename)
+
+        with self.assertLogs('chat_transformer.watchers', level='WARNING'):
+            self.loop.run_until_complete(asyncio.wait([self.watcher.check_watched_file()]))
+
+        self.assertEqual(self.changes, [])
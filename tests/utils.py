@@ -0,0 +1,12 @@
+class FakeClock:
+    """
+    Clock for code that takes a `clock` function, which only moves when told to
+    """
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds